@@ -1,29 +1,106 @@
 import os
 import re
 import json
+import time
+import asyncio
 from typing import Tuple, List, Dict
 from gomoku.agents.base import Agent
 from gomoku.core.models import GameState, Player
-from gomoku.llm.openai_client import OpenAIGomokuClient
+from engine.linecodes import OPEN_FOUR, flags_at
 
 class YSV7(Agent):
 
+    # Bump when the prompt text changes, so memoized prompts are not reused
+    PROMPT_VERSION = "ysv7-1"
+
     # # Initialize agent
     # def __init__(self, agent_id: str):
     #     super().__init__(agent_id)
     #     print(f"🎓 Created: {agent_id}")
 
-    # Setup agent
+    # Setup agent (cheap: agent discovery constructs agents it never plays)
     def _setup(self):
+        # Fail when the agent is loaded, not on its first move, if the LLM cannot be configured
+        missing = [key for key in ("OPENAI_API_KEY", "OPENAI_BASE_URL") if key not in os.environ]
+        if missing:
+            raise KeyError(f"YSV7 needs the environment variables {', '.join(missing)}")
+        self.move_history = []
+        self.invalid_moves = 0
+        self.config = self._load_config()
+        self._ready = False
+
+    # Build the LLM clients and engines on the first move, importing them only then
+    def _prepare(self):
+        if self._ready:
+            return
         print("⚙️  Setting up LLM agent...")
-        self.llm_client = OpenAIGomokuClient(
+        from gomoku.llm.openai_client import OpenAIGomokuClient
+        from engine.cascade import ModelCascade
+        from engine.gating import LLMGate
+        from engine.lifecycle import GameTracker
+        from engine.llm import coalesce
+        from engine.prompts import BoardRenderer, PromptCache
+        from engine.timeman import TimeManager
+
+        # Identical in-flight requests (e.g. shared openings across games) share one call
+        self.llm_client = coalesce(OpenAIGomokuClient(
             model="gemma2-9b-it",
             api_key=os.environ["OPENAI_API_KEY"],
             endpoint=os.environ["OPENAI_BASE_URL"]
-        )
+        ))
+        # Lazy SMP search over worker processes when GOMOKU_SEARCH_WORKERS > 1; more workers than
+        # cores only split one core between them (python -m engine.parallel measures the gain)
+        workers = min(int(os.environ.get("GOMOKU_SEARCH_WORKERS", "1")), os.cpu_count() or 1)
+        if workers > 1:
+            from engine.parallel import ParallelSearcher
+            self.searcher = ParallelSearcher(workers)
+            # Spawned here, on the loop's thread, rather than on the first search's executor thread
+            self.searcher.start()
+        else:
+            from engine.search import Searcher
+            self.searcher = Searcher()
+        self.gate = LLMGate.from_config(self.config["gating"]) if "gating" in self.config else None
+        self.cascade = None
+        if "cascade" in self.config:
+            self.cascade = ModelCascade.from_config(self.config["cascade"], lambda model: coalesce(OpenAIGomokuClient(
+                model=model,
+                api_key=os.environ["OPENAI_API_KEY"],
+                endpoint=os.environ["OPENAI_BASE_URL"]
+            )))
+        self.timer = TimeManager.from_config(self.config.get("time"))
+        # Game boundaries, detected from the move history of each game state
+        self.tracker = GameTracker()
+        # Board text kept up to date per stone, and the prompts already built per position
+        self.renderer = BoardRenderer()
+        self.prompts = PromptCache()
+        self._ready = True
+        print("✅ Agent setup complete!")
+
+    # New-game hook: reset everything kept for one game
+    def new_game(self):
         self.move_history = []
         self.invalid_moves = 0
-        print("✅ Agent setup complete!")
+        self.searcher.new_game()
+        self.timer.new_game()
+
+    # End-game hook: free the per-game tables and trim the global caches to their budgets
+    def end_game(self):
+        if not self._ready:
+            return
+        from engine.lifecycle import trim_caches
+        self.searcher.new_game()
+        self.tracker.end()
+        trim_caches()
+
+    # Load agent.json from the agent's directory
+    def _load_config(self) -> Dict:
+        try:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.json")
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read agent.json: {e}")
+            return {}
 
     # Get winning moves, and oppoenent's winning moves and threats
     def _get_critical_moves(self, game_state: GameState) -> Dict:
@@ -65,6 +142,13 @@ class YSV7(Agent):
 
         return analysis
 
+    # Critical moves for many positions at once (GameStates or raw boards), the same buckets as
+    # _get_critical_moves; like it, analysed for this agent's colour unless `player` is given
+    def analyze_batch(self, game_states: List, player: str = None) -> List[Dict]:
+        from engine.batch import batch_critical_moves
+        player = player or self.player.value
+        return batch_critical_moves(game_states, [player] * len(game_states))
+
     # Check consecutive pieces
     def _check_lines(self, game_state: GameState, row: int, col: int, player: str, max_count: int) -> bool:
         board_size = game_state.board_size
@@ -121,61 +205,12 @@ class YSV7(Agent):
         return False
     
     # Check for specific defuse patterns: ._xxx., .xxx_., .xx_x., .x_xx.
+    # (each completes an open four .xxxx., looked up from the line-code table)
     def _check_threats(self, game_state: GameState, row: int, col: int, opponent: str) -> bool:
-        board_size = game_state.board_size
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        
-        for dr, dc in directions:
-            # Check all 4 patterns in this direction
-            patterns_to_check = [
-                # Pattern ._xxx. where _ is at position 1 (0-indexed)
-                ['.', '_', opponent, opponent, opponent, '.'],
-                # Pattern .xxx_. where _ is at position 4 (0-indexed) 
-                ['.', opponent, opponent, opponent, '_', '.'],
-                # Pattern .xx_x. where _ is at position 3 (0-indexed)
-                ['.', opponent, opponent, '_', opponent, '.'],
-                # Pattern .x_xx. where _ is at position 2 (0-indexed)
-                ['.', opponent, '_', opponent, opponent, '.']
-            ]
-            
-            for pattern in patterns_to_check:
-                d_position = pattern.index('_')
-                
-                # Check if current position matches
-                start_row = row - d_position * dr
-                start_col = col - d_position * dc
-                
-                # Verify the entire pattern matches
-                if self._matches_pattern(game_state, start_row, start_col, dr, dc, pattern, row, col):
-                    return True         
-        return False
+        if game_state.board[row][col] != '.':
+            return False
+        return bool(flags_at(game_state.board, row, col, opponent) & OPEN_FOUR)
 
-    # Helper method to check if a pattern matches at a given position
-    def _matches_pattern(self, game_state: GameState, start_row: int, start_col: int, 
-                        dr: int, dc: int, pattern: List[str], target_row: int, target_col: int) -> bool:
-        board_size = game_state.board_size
-        
-        for i, expected in enumerate(pattern):
-            curr_row = start_row + i * dr
-            curr_col = start_col + i * dc
-            
-            # Check bounds
-            if not (0 <= curr_row < board_size and 0 <= curr_col < board_size):
-                return False
-            
-            if expected == '_':
-                # This should be our target position (empty)
-                if curr_row != target_row or curr_col != target_col:
-                    return False
-                if game_state.board[curr_row][curr_col] != '.':
-                    return False
-            else:
-                # Check if the actual board position matches expected
-                actual = game_state.board[curr_row][curr_col]
-                if actual != expected:
-                    return False
-        return True
-    
     # Check for fork opportunities - moves that create intersecting lines
     def _check_fork_opportunity(self, game_state: GameState, row: int, col: int, player: str) -> bool:
         board_size = game_state.board_size
@@ -226,390 +261,56 @@ class YSV7(Agent):
                     count += 1
         return count
 
-    # Sort moves by number of adjacent own pieces, then by distance to center
-    def _sort_moves(self, move_list: List, game_state: GameState):
-        n = game_state.board_size
-        center = n // 2
-        player = self.player.value
-        
-        if move_list:
-            cx, cy = center, center
-            def sort_key(move):
-                r, c = move
-                # Primary sort: number of adjacent own pieces (descending)
-                adjacent_count = self._count_adjacent_pieces(game_state, r, c, player)
-                # Secondary sort: distance to center (ascending)
-                dr, dc = r - cx, c - cy
-                center_dist = dr * dr + dc * dc
-                # Return tuple: (-adjacent_count, center_dist)
-                # Negative adjacent_count for descending order
-                return (-adjacent_count, center_dist)
-            move_list.sort(key=sort_key)
-        return move_list
-
-    async def get_move(self, game_state: GameState) -> Tuple[int, int]:
-        print(f"\n🧠 {self.agent_id} is thinking...")
-
+    # Look the position up in the endgame tablebase (solved on demand when few cells are left)
+    def _get_tablebase_move(self, game_state: GameState):
+        from engine.tablebase import default_tablebase
         try:
-            board_size = game_state.board_size
-            player = self.player.value
-            opponent = (Player.WHITE if self.player == Player.BLACK else Player.BLACK).value
-
-            # If critical moves exist, perform those first
-            analysis = self._get_critical_moves(game_state)
-            if analysis['to_win']:
-                print(f"🏆 Win at: {analysis['to_win']}")
-                return analysis['to_win'][0]
-            elif analysis['to_defend']:
-                print(f"🛡️ Defend at: {analysis['to_defend']}")
-                return analysis['to_defend'][0]
-            elif analysis['to_defuse']:
-                print(f"💣 Defuse at: {analysis['to_defuse']}")
-                analysis['to_defuse'] = self._sort_moves(analysis['to_defuse'], game_state)
-                return analysis['to_defuse'][0]
-            elif analysis['to_attack']:
-                print(f"🗡️ Attack at: {analysis['to_attack']}")
-                analysis['to_attack'] = self._sort_moves(analysis['to_attack'], game_state)
-                return analysis['to_attack'][0]
-            elif analysis['to_fork']:
-                print(f"⚔️ Fork at: {analysis['to_fork']}")
-                analysis['to_fork'] = self._sort_moves(analysis['to_fork'], game_state)
-                # Let LLM decide where to fork
-
-            # Otherwise, use LLM to strategize
-            system_prompt = f"""
-### Instruction:
-You are an expert Gomoku player.\
-You will be playing on a {board_size}x{board_size} board where rows and columns are indexed 0 to 7.\
-Your pieces will be marked by '{player}', and your opponent's pieces will be marked by '{opponent}'.\
-Your goal is to be the first to place 5 consecutive '{player}' horiontally, vertically, or diagionally.
-
-### Strategy:
-Before making any move, you must first analyze the board and apply these strategies.
-- Build intersecting forks with open ends from multiple directions.
-- Make use of diagonal attacks.
-- Take control of the center of the board.
-- Predict your opponent's moves, intercept, and surround them.
-
-### Response:
-Respond with a valid JSON using a ```json wrapper.\
-Do not output any intermediate thinking, explanation, or additional remark.
-
-```json
-{{
-    "analysis": "<brief analysis of the board state>",
-    "strategy": "<which strategy you're applying>",
-    "move": {{"row": <row_number>, "col": <col_number>}}
-}}
-```
-""".strip()
-
-            board_str = game_state.format_board(formatter="standard")
-            unoccupied_pos = []
-            for row in range(game_state.board_size):
-                for col in range(game_state.board_size):
-                    if game_state.board[row][col] not in [player, opponent]:
-                        unoccupied_pos.append((row, col))
-
-            board_prompt = f"Current board state:\n{board_str}\n"
-            board_prompt += f"You are playing as: {player}\n"
-            if game_state.move_history:
-                last_move = game_state.move_history[-1]
-                board_prompt += f"Your last move was: ({last_move.row}, {last_move.col})\n"
-            board_prompt += f"You can make moves at: {', '.join(f'({r},{c})' for r, c in unoccupied_pos)}\n"
-            if analysis["to_fork"]:
-                board_prompt += f"Consider fork opportunities at: {analysis['to_fork']}\n"
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"{board_prompt}Best move in JSON: "},
-            ]
-
-            print("💡 Full Prompt:\n\n")
-            print(json.dumps(messages, indent=2, ensure_ascii=False))
-            print()
-
-            response = await self.llm_client.complete(messages)
-
-            print("💡 Response:\n\n")
-            print(response)
-            print()
-
-            move = self._parse_move_response(response, game_state, analysis)
-            return move
-
-        # Use fallback if there are errors
+            hit = default_tablebase(game_state.board_size).probe(game_state.board, self.player.value, time_limit=1.0)
         except Exception as e:
-            print(f"🚫 LLM error for agent {self.agent_id}: {e}")
-            self.invalid_moves += 1
-            return self._get_fallback_move(game_state)
-
-    # Parse LLM response
-    def _parse_move_response(self, response: str, game_state: GameState, analysis: Dict) -> Tuple[int, int]:
+            print(f"🚫 Tablebase error for agent {self.agent_id}: {e}")
+            return None
+        if hit is None or hit[0] == "loss" or hit[1] is None or not game_state.is_valid_move(*hit[1]):
+            return None
+        print(f"📚 Tablebase {hit[0]}, playing: {hit[1]}")
+        return hit[1]
+
+    # Solve the position with the proof-number solver
+    def _get_solved_move(self, game_state: GameState):
+        from engine.pns import solve_position
         try:
-            json_match = re.search(r"```json([^`]+)```", response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1).strip()
-                data = json.loads(json_str)
-
-                if "move" in data:
-                    move = data["move"]
-                    row, col = move["row"], move["col"]
-
-                    if game_state.is_valid_move(row, col):
-                        return (row, col)
-
-                    # Use fallback if move is invalid
-                    else:
-                        print(f"⚠️ Invalid move by {self.agent_id}: ({row}, {col})")
-                        self.invalid_moves += 1
-                        return self._get_fallback_move(game_state)
-
-        # Use fallback if there are parsing errors
+            solved = solve_position(game_state.board, self.player.value, time_limit=1.0)
         except Exception as e:
-            print(f"❌ JSON parsing error: {e}")
-            return self._get_fallback_move(game_state)
-
-    # Fallback moves
-    def _get_fallback_move(self, game_state: GameState) -> Tuple[int, int]:
-
-        # Try center first if board is empty or nearly empty
-        n = game_state.board_size
-        center = n // 2
-        if game_state.is_valid_move(center, center):
-            # Count total pieces on board
-            total_pieces = sum(1 for row in range(n) for col in range(n) 
-                             if game_state.board[row][col] != '.')
-            # Use center if very few pieces on board
-            if total_pieces <= 2:
-                return (center, center)
-
-        # Otherwise, get all legal moves and sort by adjacency + center distance
-        legal_moves = game_state.get_legal_moves()
-        legal_moves = self._sort_moves(legal_moves, game_state)
-        return legal_moves[0]
-    import re
-import json
-from typing import Tuple, List, Dict
-from gomoku.agents.base import Agent
-from gomoku.core.models import GameState, Player
-from gomoku.llm.openai_client import OpenAIGomokuClient
-
-class GoGomoku(Agent):
-
-    # # Initialize agent
-    # def __init__(self, agent_id: str):
-    #     super().__init__(agent_id)
-    #     print(f"🎓 Created: {agent_id}")
-
-    # Setup agent
-    def _setup(self):
-        print("⚙️  Setting up LLM agent...")
-        self.llm_client = OpenAIGomokuClient(model="glm-4-9b-0414")
-        self.move_history = []
-        self.invalid_moves = 0
-        print("✅ Agent setup complete!")
-
-    # Get winning moves, and oppoenent's winning moves and threats
-    def _get_critical_moves(self, game_state: GameState) -> Dict:
-        board_size = game_state.board_size
-        player = self.player.value
-        opponent = (Player.WHITE if self.player == Player.BLACK else Player.BLACK).value
-
-        analysis = {
-            'to_win': [],
-            'to_defend': [],
-            'to_defuse': [],
-            'to_attack': [],
-            'to_fork': []
-        }
-
-        for row in range(board_size):
-            for col in range(board_size):
-                if game_state.board[row][col] == '.':
-
-                    # Get list of moves to win
-                    if self._check_lines(game_state, row, col, player, 5):
-                        analysis['to_win'].append((row, col))
-
-                    # Get list of moves to defend (prevent opponent from winning in the next turn)
-                    if self._check_lines(game_state, row, col, opponent, 5):
-                        analysis['to_defend'].append((row, col))
-
-                    # Get list of moves to defend (prevent opponent from winning in the next 2 turns)
-                    if self._check_threats(game_state, row, col, opponent):
-                        analysis['to_defuse'].append((row, col))
-
-                    # Get list of moves to win in the next turn
-                    if self._check_threats(game_state, row, col, opponent):
-                        analysis['to_attack'].append((row, col))
-
-                    # Get list of moves to fork (create two diagonal adjacencies)
-                    if self._check_fork_opportunity(game_state, row, col, player):
-                        analysis['to_fork'].append((row, col))
-
-        return analysis
-
-    # Check consecutive pieces
-    def _check_lines(self, game_state: GameState, row: int, col: int, player: str, max_count: int) -> bool:
-        board_size = game_state.board_size
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-
-        for dr, dc in directions:
-            count = 1
-            open = 0
-
-            # Count in positive direction
-            r, c = row + dr, col + dc
-            while (0 <= r < board_size and
-                   0 <= c < board_size and
-                   game_state.board[r][c] == player):
-                count += 1
-                r, c = r + dr, c + dc
-
-            # Count in negative direction
-            r, c = row - dr, col - dc
-            while (0 <= r < board_size and
-                   0 <= c < board_size and
-                   game_state.board[r][c] == player):
-                count += 1
-                r, c = r - dr, c - dc
-
-            if count >= max_count:
-                return True
-        return False
-
-    # Check open ends
-    def _check_open(self, game_state: GameState, row: int, col: int) -> bool:
-        board_size = game_state.board_size
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-
-        for dr, dc in directions:
-            open = 0
-
-            # Check in positive direction
-            r, c = row + dr, col + dc
-            if (0 <= r < board_size and
-                0 <= c < board_size and
-                game_state.board[r][c] == "."):
-                open += 1
-
-            # Count in negative direction
-            r, c = row - dr, col - dc
-            if (0 <= r < board_size and
-                0 <= c < board_size and
-                game_state.board[r][c] == "."):
-                open += 1
-
-            if open == 2:
-                return True
-        return False
-    
-    # Check for specific defuse patterns: ._xxx., .xxx_., .xx_x., .x_xx.
-    def _check_threats(self, game_state: GameState, row: int, col: int, opponent: str) -> bool:
-        board_size = game_state.board_size
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        
-        for dr, dc in directions:
-            # Check all 4 patterns in this direction
-            patterns_to_check = [
-                # Pattern ._xxx. where _ is at position 1 (0-indexed)
-                ['.', '_', opponent, opponent, opponent, '.'],
-                # Pattern .xxx_. where _ is at position 4 (0-indexed) 
-                ['.', opponent, opponent, opponent, '_', '.'],
-                # Pattern .xx_x. where _ is at position 3 (0-indexed)
-                ['.', opponent, opponent, '_', opponent, '.'],
-                # Pattern .x_xx. where _ is at position 2 (0-indexed)
-                ['.', opponent, '_', opponent, opponent, '.']
-            ]
-            
-            for pattern in patterns_to_check:
-                d_position = pattern.index('_')
-                
-                # Check if current position matches
-                start_row = row - d_position * dr
-                start_col = col - d_position * dc
-                
-                # Verify the entire pattern matches
-                if self._matches_pattern(game_state, start_row, start_col, dr, dc, pattern, row, col):
-                    return True         
-        return False
-
-    # Helper method to check if a pattern matches at a given position
-    def _matches_pattern(self, game_state: GameState, start_row: int, start_col: int, 
-                        dr: int, dc: int, pattern: List[str], target_row: int, target_col: int) -> bool:
-        board_size = game_state.board_size
-        
-        for i, expected in enumerate(pattern):
-            curr_row = start_row + i * dr
-            curr_col = start_col + i * dc
-            
-            # Check bounds
-            if not (0 <= curr_row < board_size and 0 <= curr_col < board_size):
-                return False
-            
-            if expected == '_':
-                # This should be our target position (empty)
-                if curr_row != target_row or curr_col != target_col:
-                    return False
-                if game_state.board[curr_row][curr_col] != '.':
-                    return False
-            else:
-                # Check if the actual board position matches expected
-                actual = game_state.board[curr_row][curr_col]
-                if actual != expected:
-                    return False
-        return True
-    
-    # Check for fork opportunities - moves that create intersecting lines
-    def _check_fork_opportunity(self, game_state: GameState, row: int, col: int, player: str) -> bool:
-        board_size = game_state.board_size
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        
-        lines_count = 0
-        
-        # Check each direction
-        for dr, dc in directions:
-            line_length = 1
-            
-            # Count in positive direction
-            r, c = row + dr, col + dc
-            while (0 <= r < board_size and 
-                   0 <= c < board_size and 
-                   game_state.board[r][c] == player):
-                line_length += 1
-                r, c = r + dr, c + dc
-            
-            # Count in negative direction
-            r, c = row - dr, col - dc
-            while (0 <= r < board_size and 
-                   0 <= c < board_size and 
-                   game_state.board[r][c] == player):
-                line_length += 1
-                r, c = r - dr, c - dc
-            
-            # If this direction would create a line of 2 or more pieces, count it
-            if line_length >= 2:
-                lines_count += 1
-        
-        # A fork exists if placing here creates 2 or more intersecting lines
-        return lines_count >= 2
-    
-    # Count adjacent own pieces for a given position
-    def _count_adjacent_pieces(self, game_state: GameState, row: int, col: int, player: str) -> int:
-        board_size = game_state.board_size
-        count = 0
-        # Check all 8 adjacent positions
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = row + dr, col + dc
-                if (0 <= r < board_size and 
-                    0 <= c < board_size and 
-                    game_state.board[r][c] == player):
-                    count += 1
-        return count
+            print(f"🚫 Solver error for agent {self.agent_id}: {e}")
+            return None
+        if solved is None:
+            return None
+        outcome, move, result = solved
+        if not game_state.is_valid_move(*move):
+            return None
+        print(f"🧮 Proven {outcome} in {result.depth} plies ({result.nodes} nodes), playing: {move}")
+        return move
+
+    # Await an LLM call within the move's remaining budget, and track its latency
+    async def _timed_llm(self, call):
+        start = time.perf_counter()
+        timeout = max(self.timer.remaining(), self.timer.min_budget)
+        try:
+            result = await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timer.record_llm_latency(time.perf_counter() - start)
+            raise
+        self.timer.record_llm_latency(time.perf_counter() - start)
+        return result
+
+    # Ask the confidence gate whether the LLM call can be skipped
+    def _assess_gate(self, game_state: GameState):
+        if getattr(self, "gate", None) is None:
+            return None
+        try:
+            return self.gate.assess(game_state.board, self.player.value)
+        except Exception as e:
+            print(f"🚫 Gate error for agent {self.agent_id}: {e}")
+            return None
 
     # Sort moves by number of adjacent own pieces, then by distance to center
     def _sort_moves(self, move_list: List, game_state: GameState):
@@ -632,7 +333,33 @@ class GoGomoku(Agent):
             move_list.sort(key=sort_key)
         return move_list
 
+    # Charge every move to the game's time bank and log the allocation
     async def get_move(self, game_state: GameState) -> Tuple[int, int]:
+        try:
+            self._prepare()
+        except Exception as e:
+            print(f"🚫 Setup error for agent {self.agent_id}: {e}")
+            return self._get_engine_move(game_state, "setup error")
+        # A different game than the last move: close the previous one and start afresh
+        if self.tracker.observe(game_state.move_history):
+            if self.tracker.games > 1:
+                from engine.lifecycle import trim_caches
+                print(f"🔁 New game #{self.tracker.games} (freed {trim_caches() / 2 ** 20:.1f} MiB of caches)")
+            self.new_game()
+        self.timer.start_move(len(game_state.move_history))
+        start = time.perf_counter()
+        move = None
+        try:
+            move = await self._think(game_state)
+            return move
+        finally:
+            print(f"⏱️ {self.timer.end_move()}")
+            # One telemetry line per move (engine.telemetry, when GOMOKU_TELEMETRY is set)
+            from engine.telemetry import emit
+            emit("move", agent=type(self).__name__, id=self.agent_id, ply=len(game_state.move_history),
+                 move=list(move) if move else None, seconds=time.perf_counter() - start)
+
+    async def _think(self, game_state: GameState) -> Tuple[int, int]:
         print(f"\n🧠 {self.agent_id} is thinking...")
 
         try:
@@ -648,7 +375,20 @@ class GoGomoku(Agent):
             elif analysis['to_defend']:
                 print(f"🛡️ Defend at: {analysis['to_defend']}")
                 return analysis['to_defend'][0]
-            elif analysis['to_defuse']:
+
+            # Late positions: play the tablebase's exact win or draw
+            # (solves run on a worker thread, so other games in the event loop keep playing)
+            from engine.timeman import offload
+            tablebase_move = await offload(self._get_tablebase_move, game_state)
+            if tablebase_move is not None:
+                return tablebase_move
+
+            # Play proven wins instantly, and resist proven losses without the LLM
+            solved_move = await offload(self._get_solved_move, game_state)
+            if solved_move is not None:
+                return solved_move
+
+            if analysis['to_defuse']:
                 print(f"💣 Defuse at: {analysis['to_defuse']}")
                 analysis['to_defuse'] = self._sort_moves(analysis['to_defuse'], game_state)
                 return analysis['to_defuse'][0]
@@ -661,8 +401,26 @@ class GoGomoku(Agent):
                 analysis['to_fork'] = self._sort_moves(analysis['to_fork'], game_state)
                 # Let LLM decide where to fork
 
+            # Skip the LLM when the engine is confident about the move
+            decision = self._assess_gate(game_state)
+            if decision is not None and decision.skip_llm and game_state.is_valid_move(*decision.move):
+                print(f"🚦 Gated move ({decision.confidence:.2f} confidence): {decision.move}")
+                return decision.move
+
+            # Budget this move from the time bank; search instead if an LLM call does not fit
+            allocation = self.timer.allocate(game_state.board, player)
+            if not allocation.use_llm:
+                print(f"⏱️ No time for the LLM ({allocation.budget:.2f}s budget), searching")
+                return await self._get_fallback_move(game_state, "no time")
+
             # Otherwise, use LLM to strategize
-            system_prompt = f"""
+            # (the board rows and free cells are updated per stone; a position asked again reuses its prompt)
+            self.renderer.sync(game_state)
+            last_move = game_state.move_history[-1] if game_state.move_history else None
+            forks = str(analysis["to_fork"]) if analysis["to_fork"] else ""
+
+            def build_messages():
+                system_prompt = f"""
 ### Instruction:
 You are an expert Gomoku player.\
 You will be playing on a {board_size}x{board_size} board where rows and columns are indexed 0 to 7.\
@@ -689,48 +447,57 @@ Do not output any intermediate thinking, explanation, or additional remark.
 ```
 """.strip()
 
-            board_str = game_state.format_board(formatter="standard")
-            unoccupied_pos = []
-            for row in range(game_state.board_size):
-                for col in range(game_state.board_size):
-                    if game_state.board[row][col] not in [player, opponent]:
-                        unoccupied_pos.append((row, col))
-
-            board_prompt = f"Current board state:\n{board_str}\n"
-            board_prompt += f"You are playing as: {player}\n"
-            if game_state.move_history:
-                last_move = game_state.move_history[-1]
-                board_prompt += f"Your last move was: ({last_move.row}, {last_move.col})\n"
-            board_prompt += f"You can make moves at: {', '.join(f'({r},{c})' for r, c in unoccupied_pos)}\n"
-            if analysis["to_fork"]:
-                board_prompt += f"Consider fork opportunities at: {analysis['to_fork']}\n"
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"{board_prompt}Best move in JSON: "},
-            ]
+                board_prompt = (f"Current board state:\n{self.renderer.board_text()}\n"
+                                f"You are playing as: {player}\n")
+                if last_move is not None:
+                    board_prompt += f"Your last move was: ({last_move.row}, {last_move.col})\n"
+                board_prompt += f"You can make moves at: {self.renderer.free_text()}\n"
+                if forks:
+                    board_prompt += f"Consider fork opportunities at: {forks}\n"
+
+                return [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"{board_prompt}Best move in JSON: "},
+                ]
+
+            messages = self.prompts.get(
+                (self.PROMPT_VERSION, board_size, player, self.renderer.board_text(),
+                 (last_move.row, last_move.col) if last_move is not None else None, forks),
+                build_messages)
 
             print("💡 Full Prompt:\n\n")
             print(json.dumps(messages, indent=2, ensure_ascii=False))
             print()
 
-            response = await self.llm_client.complete(messages)
+            # Cheap model first, larger models only if its move is unsound or disputed
+            if getattr(self, "cascade", None) is not None:
+                move = await self._timed_llm(self.cascade.choose(messages, game_state.board, player))
+                if move is None:
+                    self.invalid_moves += 1
+                    move = await self._get_fallback_move(game_state, "cascade rejected")
+                if decision is not None:
+                    self.gate.record_llm_move(decision, move)
+                return move
+
+            response = await self._timed_llm(self.llm_client.complete(messages))
 
             print("💡 Response:\n\n")
             print(response)
             print()
 
-            move = self._parse_move_response(response, game_state, analysis)
+            move = await self._parse_move_response(response, game_state, analysis)
+            if decision is not None:
+                self.gate.record_llm_move(decision, move)
             return move
 
         # Use fallback if there are errors
         except Exception as e:
             print(f"🚫 LLM error for agent {self.agent_id}: {e}")
             self.invalid_moves += 1
-            return self._get_fallback_move(game_state)
+            return await self._get_fallback_move(game_state, "llm error")
 
     # Parse LLM response
-    def _parse_move_response(self, response: str, game_state: GameState, analysis: Dict) -> Tuple[int, int]:
+    async def _parse_move_response(self, response: str, game_state: GameState, analysis: Dict) -> Tuple[int, int]:
         try:
             json_match = re.search(r"```json([^`]+)```", response, re.DOTALL)
             if json_match:
@@ -748,15 +515,25 @@ Do not output any intermediate thinking, explanation, or additional remark.
                     else:
                         print(f"⚠️ Invalid move by {self.agent_id}: ({row}, {col})")
                         self.invalid_moves += 1
-                        return self._get_fallback_move(game_state)
+                        return await self._get_fallback_move(game_state, "invalid move")
 
         # Use fallback if there are parsing errors
         except Exception as e:
             print(f"❌ JSON parsing error: {e}")
-            return self._get_fallback_move(game_state)
+            return await self._get_fallback_move(game_state, "parse error")
+
+    # Rule-only move (engine.policies' copy of the critical-move buckets) for when the agent
+    # could not be set up; tried again on the next move
+    def _get_engine_move(self, game_state: GameState, reason: str) -> Tuple[int, int]:
+        from engine.policies import make_policy
+        from engine.telemetry import fallback
+        fallback(agent=type(self).__name__, id=self.agent_id, ply=len(game_state.move_history), reason=reason)
+        return make_policy("ysv7")(game_state.board, self.player.value)
 
-    # Fallback moves
-    def _get_fallback_move(self, game_state: GameState) -> Tuple[int, int]:
+    # Fallback moves (reported to the telemetry stream with the reason)
+    async def _get_fallback_move(self, game_state: GameState, reason: str = "fallback") -> Tuple[int, int]:
+        from engine.telemetry import fallback
+        fallback(agent=type(self).__name__, id=self.agent_id, ply=len(game_state.move_history), reason=reason)
 
         # Try center first if board is empty or nearly empty
         n = game_state.board_size
@@ -767,10 +544,22 @@ Do not output any intermediate thinking, explanation, or additional remark.
                              if game_state.board[row][col] != '.')
             # Use center if very few pieces on board
             if total_pieces <= 2:
+                self.timer.allocate(game_state.board, self.player.value, book=True)
                 return (center, center)
 
-        # Otherwise, get all legal moves and sort by adjacency + center distance
+        # Otherwise, search the position within the move's budget (ordered by TT, tactics, killers and history)
+        # on a worker thread, so other games and LLM calls keep running meanwhile
+        try:
+            result = await self.timer.search_async(self.searcher, game_state.board, self.player.value, max_depth=8)
+            stats = result.stats
+            print(f"🔎 Search: {result.move} score {result.score}, depth {stats.depth}, "
+                  f"{stats.nodes} nodes ({stats.nodes_per_depth}), {stats.nps:.0f} nps")
+            if result.move is not None and game_state.is_valid_move(*result.move):
+                return result.move
+        except Exception as e:
+            print(f"🚫 Search error for agent {self.agent_id}: {e}")
+
+        # Last resort: get all legal moves and sort by adjacency + center distance
         legal_moves = game_state.get_legal_moves()
         legal_moves = self._sort_moves(legal_moves, game_state)
         return legal_moves[0]
-    
\ No newline at end of file
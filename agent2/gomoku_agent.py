@@ -1,13 +1,18 @@
 import os
 import re
 import json
+import asyncio
+import time
 from gomoku.agents.base import Agent
-from gomoku.llm import OpenAIGomokuClient
 from gomoku.core.models import GameState, Player
 from typing import Tuple, Optional, List
 import random
+from engine.linecodes import FIVE, OPEN_THREE, flags_at
 
 class SZT4(Agent):
+    # 提示词版本：修改提示词文本时递增，避免复用旧的缓存提示
+    PROMPT_VERSION = "szt4-1"
+
     def __init__(self, agent_id: str):
         super().__init__(agent_id)
         self.llm_client = None
@@ -27,19 +32,87 @@ class SZT4(Agent):
         except Exception as e:
             print(f"_setup skipped: {e}")
 
+    # 发现 / 列出智能体时也会构造实例：这里只做轻量初始化
     def _setup(self):
         self.invalid_moves = 0
+        self.system_prompt = self._get_default_system_prompt()
+        self.config = self._load_config()
+        self._ready = False
+        # 加载时就提示缺少的环境变量（不需要重量级导入）；缺少时只走引擎路径
+        missing = [key for key in ("OPENAI_API_KEY", "OPENAI_BASE_URL") if key not in os.environ]
+        if missing:
+            print(f"LLM client not available: missing {', '.join(missing)}")
+
+    # 首次落子时才导入并创建 LLM 客户端与引擎组件
+    def _prepare(self):
+        if self._ready:
+            return
+        from engine.cascade import ModelCascade
+        from engine.gating import LLMGate
+        from engine.lifecycle import GameTracker
+        from engine.llm import coalesce
+        from engine.prompts import BoardRenderer, PromptCache
+        from engine.timeman import TimeManager
+
         try:
-            if OpenAIGomokuClient is not None:
-                self.llm_client = OpenAIGomokuClient(
-                    model="gemma2-9b-it",
-                    api_key=os.environ["OPENAI_API_KEY"],
-                    endpoint=os.environ["OPENAI_BASE_URL"]
-                )
+            from gomoku.llm import OpenAIGomokuClient
+            # 相同的在途请求（如多局共享的开局）只发一次
+            self.llm_client = coalesce(OpenAIGomokuClient(
+                model="gemma2-9b-it",
+                api_key=os.environ["OPENAI_API_KEY"],
+                endpoint=os.environ["OPENAI_BASE_URL"]
+            ))
         except Exception as e:
             print(f"LLM client not available: {e}")
             self.llm_client = None
-        self.system_prompt = self._get_default_system_prompt()
+        # 置信度门控：引擎足够确定时跳过 LLM（配置见 agent.json 的 "gating"）
+        self.gate = LLMGate.from_config(self.config["gating"]) if "gating" in self.config else None
+        # 全局时间银行：按局面关键程度分配思考时间
+        self.timer = TimeManager.from_config(self.config.get("time"))
+        # 对局边界：根据 move_history 判断是否开始了新的一局
+        self.tracker = GameTracker()
+        # 棋盘文本按落子增量更新；同一局面再次询问时复用已构建的提示
+        self.renderer = BoardRenderer()
+        self.prompts = PromptCache()
+        # 模型级联：先问小模型，引擎校验不通过或意见不一致时再升级到大模型
+        self.cascade = None
+        if self.llm_client is not None and "cascade" in self.config:
+            try:
+                self.cascade = ModelCascade.from_config(self.config["cascade"], lambda model: coalesce(OpenAIGomokuClient(
+                    model=model,
+                    api_key=os.environ["OPENAI_API_KEY"],
+                    endpoint=os.environ["OPENAI_BASE_URL"]
+                )))
+            except Exception as e:
+                print(f"Cascade not available: {e}")
+        # 全部组件就绪后才置位：初始化中途出错时，下一步会重新初始化
+        self._ready = True
+
+    # 新局钩子：重置所有单局状态（阵法、非法步计数、时间银行）
+    def new_game(self):
+        self.invalid_moves = 0
+        self.formation_active = True
+        self.formation_plan_abs = None
+        self.formation_progress_idx = 0
+        self.formation_anchor = None
+        self.timer.new_game()
+
+    # 终局钩子：把全局缓存修剪回各自的字节预算
+    def end_game(self):
+        if not self._ready:
+            return
+        from engine.lifecycle import trim_caches
+        self.tracker.end()
+        trim_caches()
+
+    def _load_config(self) -> dict:
+        try:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.json")
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"agent.json not available: {e}")
+            return {}
 
     def _get_default_system_prompt(self) -> str:
         return (
@@ -75,66 +148,16 @@ class SZT4(Agent):
         return abs(a[0]-b[0]) + abs(a[1]-b[1])
 
     # ===== 基础判断 =====
+    # 查表判断（engine.linecodes）：不再临时改写棋盘
     def _has_five_if_place(self, board, r: int, c: int, ch: str) -> bool:
-        n = len(board)
-        original = board[r][c]
-        board[r][c] = ch
-        dirs = [(0, 1), (1, 0), (1, 1), (1, -1)]
-
-        def count_line(rr, cc, dr, dc):
-            cnt = 0
-            i, j = rr, cc
-            while 0 <= i < n and 0 <= j < n and board[i][j] == ch:
-                cnt += 1
-                i += dr
-                j += dc
-            return cnt
-
-        for dr, dc in dirs:
-            i, j = r, c
-            while 0 <= i - dr < n and 0 <= j - dc < n and board[i - dr][j - dc] == ch:
-                i -= dr
-                j -= dc
-            total = count_line(i, j, dr, dc)
-            if total >= 5:
-                board[r][c] = original
-                return True
-
-        board[r][c] = original
-        return False
+        return bool(flags_at(board, r, c, ch) & FIVE)
 
     def _is_open_three_if_place(self, board, r: int, c: int, ch: str) -> bool:
         """
-        活三：三连，两端是空格，或跳三（中间一个空）
+        活三：落子后在 5 格窗口内形成 .XXX.
         仅用于“我方造活三”的评估；不会用于对手的预判式拦截。
         """
-        n = len(board)
-        original = board[r][c]
-        board[r][c] = ch
-        dirs = [(0, 1), (1, 0), (1, 1), (1, -1)]
-        found_open_three = False
-
-        for dr, dc in dirs:
-            line = []
-            for step in range(-4, 5):
-                rr, cc = r + dr * step, c + dc * step
-                if 0 <= rr < n and 0 <= cc < n:
-                    line.append(board[rr][cc])
-                else:
-                    line.append('#')
-            for i in range(len(line) - 4):
-                window = "".join(line[i:i+5])
-                if window == f".{ch}{ch}{ch}.":  # .XXX.
-                    found_open_three = True
-                if window == f".{ch}{ch}.{ch}." or window == f".{ch}.{ch}{ch}.":  # .XX.X. / .X.XX.
-                    found_open_three = True
-                if found_open_three:
-                    break
-            if found_open_three:
-                break
-
-        board[r][c] = original
-        return found_open_three
+        return bool(flags_at(board, r, c, ch) & OPEN_THREE)
 
     # ===== 查找落子点（强优先） =====
     def _find_immediate_winning_move(self, game_state: GameState, player_char: str) -> Optional[Tuple[int, int]]:
@@ -210,6 +233,16 @@ class SZT4(Agent):
         center = game_state.board_size // 2
         return sorted(candidate_blocks, key=lambda m: (m[0]-center)**2 + (m[1]-center)**2)[0]
 
+    # ===== 批量分析 =====
+    def analyze_batch(self, game_states: List, player: Optional[str] = None) -> List[dict]:
+        """
+        批量计算关键点（GameState 列表或原始棋盘），一次 NumPy 运算完成。
+        返回格式与 YSV7._get_critical_moves 相同；未指定 player 时按各局面轮到的一方。
+        """
+        from engine.batch import batch_critical_moves
+        players = [player] * len(game_states) if player else None
+        return batch_critical_moves(game_states, players)
+
     # ===== 阵法：模板与旋转/镜像 =====
     def _formation_templates(self) -> List[List[Tuple[int,int]]]:
         """
@@ -376,6 +409,42 @@ class SZT4(Agent):
 
     # ===== 核心接口 =====
     async def get_move(self, game_state: GameState) -> Tuple[int, int]:
+        try:
+            self._prepare()
+        except Exception as e:
+            # 初始化失败：本步只用规则引擎（engine.policies 的 SZT4 规则链），下一步重试初始化
+            print(f"Setup failed, engine-only move: {e}")
+            from engine.policies import make_policy
+            from engine.telemetry import fallback
+            fallback(agent=type(self).__name__, id=self.agent_id, ply=len(game_state.move_history),
+                     reason="setup error")
+            return make_policy("szt4")(game_state.board, game_state.current_player.value)
+        # 与上一步不是同一局：结束上一局并重置单局状态
+        if self.tracker.observe(game_state.move_history):
+            if self.tracker.games > 1:
+                from engine.lifecycle import trim_caches
+                trim_caches()
+            self.new_game()
+        # 每步计入时间银行，并记录分配决策；每步写一行实时遥测
+        from engine.telemetry import emit
+        timer = getattr(self, "timer", None)
+        start = time.perf_counter()
+        move = None
+        try:
+            if timer is None:
+                move = await self._decide(game_state)
+                return move
+            timer.start_move(len(game_state.move_history))
+            try:
+                move = await self._decide(game_state)
+                return move
+            finally:
+                print(f"Time: {timer.end_move()}")
+        finally:
+            emit("move", agent=type(self).__name__, id=self.agent_id, ply=len(game_state.move_history),
+                 move=list(move) if move else None, seconds=time.perf_counter() - start)
+
+    async def _decide(self, game_state: GameState) -> Tuple[int, int]:
         try:
             me = game_state.current_player.value
             rival = 'O' if me == 'X' else 'X'
@@ -390,6 +459,27 @@ class SZT4(Agent):
             if block_win:
                 return block_win
 
+            # 2.4) 残局库：空位不多时查表（缺失则当场穷举求解），必胜或和棋直接下
+            # （求解放到工作线程上跑，同一事件循环里的其他对局不被卡住）
+            from engine.timeman import offload
+            try:
+                from engine.tablebase import default_tablebase
+                hit = await offload(default_tablebase(game_state.board_size).probe, game_state.board, me,
+                                    time_limit=0.5)
+                if hit is not None and hit[0] != "loss" and hit[1] is not None and game_state.is_valid_move(*hit[1]):
+                    return hit[1]
+            except Exception as te:
+                print(f"Tablebase failed: {te}")
+
+            # 2.5) 证明数搜索：已证必胜直接下；已证必败则走最顽强的防守，不调用 LLM
+            try:
+                from engine.pns import solve_position
+                solved = await offload(solve_position, game_state.board, me, time_limit=0.5)
+                if solved is not None and game_state.is_valid_move(*solved[1]):
+                    return solved[1]
+            except Exception as se:
+                print(f"Solver failed: {se}")
+
             # 3) 只在“当前棋面已有活三”时拦截（取消一切预判式拦截）
             block_existing_open3 = self._find_block_for_existing_open_three(game_state, rival)
             if block_existing_open3:
@@ -407,40 +497,79 @@ class SZT4(Agent):
             if create_open3:
                 return create_open3
 
+            # 4.5) 置信度门控：引擎把握足够时直接落子，不调用 LLM
+            decision = None
+            if self.llm_client is not None and getattr(self, "gate", None) is not None:
+                try:
+                    decision = self.gate.assess(game_state.board, me)
+                    if decision.skip_llm and game_state.is_valid_move(*decision.move):
+                        return decision.move
+                except Exception as ge:
+                    print(f"Gate failed: {ge}")
+
+            # 4.8) 时间预算：预算内放不下一次 LLM 调用时直接走 fallback
+            timeout = None
+            if self.llm_client is not None and getattr(self, "timer", None) is not None:
+                allocation = self.timer.allocate(game_state.board, me)
+                if not allocation.use_llm:
+                    return self._get_fallback_move(game_state, "no time")
+                timeout = max(allocation.budget, self.timer.min_budget)
+
             # 5) LLM 决策（若可用）
             if self.llm_client is not None:
                 try:
-                    board_str = game_state.format_board(formatter="standard")
-                    board_prompt = f"Current board state:\n{board_str}\n"
-                    board_prompt += f"Current player: {me}\n"
-                    board_prompt += f"Move count: {len(game_state.move_history)}\n"
-                    if game_state.move_history:
-                        last = game_state.move_history[-1]
-                        board_prompt += f"Last move: {last.player.value} at ({last.row}, {last.col})\n"
+                    self.renderer.sync(game_state)
+                    last = game_state.move_history[-1] if game_state.move_history else None
                     # 可加 allowed_moves（将阵法剩余推荐也传给 LLM 作为参考，非必须）
+                    rest = []
                     if self.formation_active and self.formation_plan_abs is not None:
                         rest = [p for p in self.formation_plan_abs[self.formation_progress_idx:]
                                 if game_state.is_valid_move(*p)]
+
+                    def build_messages():
+                        board_prompt = f"Current board state:\n{self.renderer.board_text()}\n"
+                        board_prompt += f"Current player: {me}\n"
+                        board_prompt += f"Move count: {len(game_state.move_history)}\n"
+                        if last is not None:
+                            board_prompt += f"Last move: {last.player.value} at ({last.row}, {last.col})\n"
                         if rest:
                             board_prompt += f"Recommended opening cells: {rest[:6]}\n"
-
-                    messages = [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": f"{board_prompt}\n\nPlease provide your next move as JSON."},
-                    ]
-                    response = await self.llm_client.complete(messages)
-                    move = self._parse_move_response(response, game_state)
+                        return [
+                            {"role": "system", "content": self.system_prompt},
+                            {"role": "user", "content": f"{board_prompt}\n\nPlease provide your next move as JSON."},
+                        ]
+
+                    messages = self.prompts.get(
+                        (self.PROMPT_VERSION, me, self.renderer.board_text(), len(game_state.move_history),
+                         (last.player.value, last.row, last.col) if last is not None else None, tuple(rest[:6])),
+                        build_messages)
+                    started = asyncio.get_running_loop().time()
+                    try:
+                        if getattr(self, "cascade", None) is not None:
+                            move = await asyncio.wait_for(self.cascade.choose(messages, game_state.board, me), timeout)
+                            if move is None:
+                                move = self._get_fallback_move(game_state, "cascade rejected")
+                        else:
+                            response = await asyncio.wait_for(self.llm_client.complete(messages), timeout)
+                            move = self._parse_move_response(response, game_state)
+                    except asyncio.TimeoutError:
+                        self.timer.record_llm_latency(asyncio.get_running_loop().time() - started)
+                        raise
+                    if timeout is not None:
+                        self.timer.record_llm_latency(asyncio.get_running_loop().time() - started)
+                    if decision is not None:
+                        self.gate.record_llm_move(decision, move)
                     return move
                 except Exception as le:
                     print(f"LLM failed, fallback: {le}")
 
             # 6) fallback
-            return self._get_fallback_move(game_state)
+            return self._get_fallback_move(game_state, "llm error" if self.llm_client is not None else "no llm")
 
         except Exception as e:
             print(f"get_move error: {e}")
             self.invalid_moves += 1
-            return self._get_fallback_move(game_state)
+            return self._get_fallback_move(game_state, "error")
 
     # ===== 解析 LLM 输出 =====
     def _extract_json_block(self, text: str) -> Optional[str]:
@@ -471,13 +600,16 @@ class SZT4(Agent):
             row, col = move.get("row"), move.get("col")
             if isinstance(row, int) and isinstance(col, int) and game_state.is_valid_move(row, col):
                 return (row, col)
-            return self._get_fallback_move(game_state)
+            return self._get_fallback_move(game_state, "invalid move")
         except Exception as e:
             print(f"Parse error: {e}")
-            return self._get_fallback_move(game_state)
+            return self._get_fallback_move(game_state, "parse error")
 
     # ===== fallback =====
-    def _get_fallback_move(self, game_state: GameState) -> Tuple[int, int]:
+    def _get_fallback_move(self, game_state: GameState, reason: str = "fallback") -> Tuple[int, int]:
+        # 实时遥测：记录每次 fallback 及原因
+        from engine.telemetry import fallback
+        fallback(agent=type(self).__name__, id=self.agent_id, ply=len(game_state.move_history), reason=reason)
         n = game_state.board_size
         center = n // 2
 
@@ -0,0 +1,8 @@
+"""
+Shared, framework-independent Gomoku engine used by the agents.
+
+Everything here works on a raw board (a list of rows holding '.', 'X'
+and 'O'), so it can be reused outside of the Gomoku AI Framework, e.g.
+for self-play or offline analysis. Submodules are imported explicitly by
+the agents; nothing heavy is pulled in by importing the package itself.
+"""
@@ -0,0 +1,403 @@
+"""
+Columnar move table for analytics over many game logs.
+
+Game logs (runs/*.json, framework or engine.match layout) are flattened
+into one row per move and written as NumPy `.npz` shards
+(`moves-00000.npz`, ...), one array per column:
+
+  game               int32    game id, unique over the whole table
+  ply                int16    0 for the first move
+  agent              int16    index into the shard's `agents` names (the log's player name)
+  row, col           int8     the move played
+  time               float32  seconds charged to the agent
+  illegal            bool     the move lost the game as illegal
+  fallback           bool     the agent fell back to its engine (engine.match logs)
+  llm_calls          int16    LLM requests made for the move (engine.match logs)
+  prompt_tokens      int32    estimated prompt tokens of those requests
+  completion_tokens  int32    estimated completion tokens
+  instrumented       bool     the log carried fallback and token counts
+
+Each shard also holds `game_ids` and `game_files`, the log behind every
+game. Ingestion keeps an index of the logs already read, saved after
+every shard it writes (and completed from the shards themselves), so
+re-running it after a tournament, or after a crash, only adds the new
+games.
+
+    python -m engine.analytics ingest runs --out data/moves
+
+Queries load every shard into one table and group with sorts and
+bincounts instead of Python loops, so millions of moves take seconds.
+Besides the stored columns, `phase` (engine.review.PHASES, by ply) and
+`color` can be used as keys and filters:
+
+    moves = load("data/moves").where(agent="SZT4")
+    for row in moves.group_by(["phase"], "time", ["count", "p50", "p95"]):
+        print(row)
+
+    python -m engine.analytics query data/moves --by agent,phase --value time --stats count,mean,p95
+    python -m engine.analytics query data/moves --by agent --value fallback --stats mean --where phase=opening
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .review import PHASES, log_files
+
+COLUMNS = {
+    "game": np.int32,
+    "ply": np.int16,
+    "agent": np.int16,
+    "row": np.int8,
+    "col": np.int8,
+    "time": np.float32,
+    "illegal": np.bool_,
+    "fallback": np.bool_,
+    "llm_calls": np.int16,
+    "prompt_tokens": np.int32,
+    "completion_tokens": np.int32,
+    "instrumented": np.bool_,
+}
+# Columns computed from stored ones, with the labels of their codes
+DERIVED = {
+    "phase": tuple(name for _, name in PHASES),
+    "color": ("X", "O"),
+}
+SHARD = "moves-{:05d}.npz"
+INDEX = "index.json"
+STATS = ("count", "sum", "mean", "min", "max", "p50", "p90", "p95", "p99")
+
+
+# ===== Ingestion =====
+
+def game_rows(log: Dict) -> List[tuple]:
+    """One tuple per move of a game log: (ply, player, row, col, time, illegal, fallback, llm, prompt, completion, instrumented)."""
+    rows = []
+    for ply, entry in enumerate(log["game_result"].get("game_log", [])):
+        r, c = entry.get("position", (-1, -1))
+        rows.append((ply, entry.get("player", ""), r, c, entry.get("time", 0.0), bool(entry.get("illegal")),
+                     bool(entry.get("fallback")), entry.get("llm_calls", 0), entry.get("prompt_tokens", 0),
+                     entry.get("completion_tokens", 0), "fallback" in entry))
+    return rows
+
+
+class ShardBuilder:
+    """Collects game rows and writes them as .npz shards of up to `shard_rows` moves."""
+
+    def __init__(self, out_dir: str, shard_rows: int = 1_000_000):
+        self.out_dir = out_dir
+        self.shard_rows = shard_rows
+        os.makedirs(out_dir, exist_ok=True)
+        self.shard_index = len(glob.glob(os.path.join(out_dir, "moves-*.npz")))
+        self.next_game = _next_game_id(out_dir)
+        self.rows_written = 0
+        self._rows: List[tuple] = []   # (game, *game_rows)
+        self._games: List[tuple] = []  # (game id, file)
+
+    def add(self, rows: List[tuple], file: str) -> int:
+        game = self.next_game
+        self.next_game += 1
+        self._games.append((game, file))
+        self._rows.extend((game,) + row for row in rows)
+        if len(self._rows) >= self.shard_rows:
+            self.flush()
+        return game
+
+    def flush(self):
+        if not self._games:
+            return
+        game, ply, player, row, col, spent, illegal, fell_back, calls, prompt, completion, instrumented = \
+            zip(*self._rows) if self._rows else [()] * 12
+        agents = sorted(set(player))
+        codes = {name: i for i, name in enumerate(agents)}
+        columns = {
+            "game": game, "ply": ply, "agent": [codes[p] for p in player], "row": row, "col": col,
+            "time": spent, "illegal": illegal, "fallback": fell_back, "llm_calls": calls,
+            "prompt_tokens": prompt, "completion_tokens": completion, "instrumented": instrumented,
+        }
+        arrays = {name: np.asarray(values, dtype=COLUMNS[name]) for name, values in columns.items()}
+        ids, files = zip(*self._games)
+        path = os.path.join(self.out_dir, SHARD.format(self.shard_index))
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, agents=np.asarray(agents, dtype=str), game_ids=np.asarray(ids, dtype=np.int32),
+                 game_files=np.asarray(files, dtype=str), **arrays)
+        os.replace(tmp, path)
+        self.shard_index += 1
+        self.rows_written += len(self._rows)
+        self._rows, self._games = [], []
+
+
+def _next_game_id(out_dir: str) -> int:
+    last = -1
+    for path in glob.glob(os.path.join(out_dir, "moves-*.npz")):
+        with np.load(path) as shard:
+            if len(shard["game_ids"]):
+                last = max(last, int(shard["game_ids"].max()))
+    return last + 1
+
+
+# Games written to shards but missing from the index (a run stopped between the two writes)
+def _shard_games(out_dir: str) -> Dict[str, int]:
+    games = {}
+    for path in sorted(glob.glob(os.path.join(out_dir, "moves-*.npz"))):
+        with np.load(path) as shard:
+            games.update((os.path.abspath(f), int(g)) for g, f in zip(shard["game_ids"], shard["game_files"]))
+    return games
+
+
+def _load_index(out_dir: str) -> Dict[str, list]:
+    try:
+        with open(os.path.join(out_dir, INDEX), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(out_dir: str, index: Dict[str, list]):
+    tmp = os.path.join(out_dir, INDEX + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, os.path.join(out_dir, INDEX))
+
+
+def ingest(paths: Iterable[str], out_dir: str, shard_rows: int = 1_000_000, rebuild: bool = False) -> Dict:
+    """Add the game logs under `paths` that are not in the table yet."""
+    if rebuild:
+        for path in glob.glob(os.path.join(out_dir, "moves-*.npz")) + [os.path.join(out_dir, INDEX)]:
+            if os.path.exists(path):
+                os.remove(path)
+    builder = ShardBuilder(out_dir, shard_rows)
+    index = _load_index(out_dir)
+    for key, game in _shard_games(out_dir).items():
+        index.setdefault(key, game)
+    pending: Dict[str, int] = {}  # games still in the builder's buffer
+    summary = {"files": 0, "games": 0, "moves": 0, "skipped": 0, "elapsed": 0.0}
+    start = time.perf_counter()
+    for path in log_files(paths):
+        summary["files"] += 1
+        key = os.path.abspath(path)
+        # Logs are written once, when their game ends
+        if key in index:
+            summary["skipped"] += 1
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                log = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if "game_result" not in log:
+            continue
+        rows = game_rows(log)
+        shard = builder.shard_index
+        pending[key] = builder.add(rows, path)
+        summary["games"] += 1
+        summary["moves"] += len(rows)
+        # A shard was written: its games go into the index at once, so a crash cannot ingest them twice
+        if builder.shard_index != shard:
+            index.update(pending)
+            pending.clear()
+            _save_index(out_dir, index)
+    builder.flush()
+    index.update(pending)
+    _save_index(out_dir, index)
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+# ===== Queries =====
+
+class MoveTable:
+    """Columns of many moves; where() filters rows and group_by() aggregates them."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], agents: Sequence[str], game_files: Dict[int, str]):
+        self.columns = columns
+        self.agents = list(agents)
+        self.game_files = game_files
+
+    def __len__(self) -> int:
+        return len(self.columns["game"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name == "phase":
+            limits = np.asarray([limit for limit, _ in PHASES[:-1]])
+            return np.searchsorted(limits, self.columns["ply"], side="right").astype(np.int8)
+        if name == "color":
+            return (self.columns["ply"] % 2).astype(np.int8)
+        return self.columns[name]
+
+    # Names of the codes of a key column (None for plain numeric columns)
+    def labels(self, name: str) -> Optional[Sequence[str]]:
+        if name == "agent":
+            return self.agents
+        return DERIVED.get(name)
+
+    def _code(self, name: str, value):
+        labels = self.labels(name)
+        if labels is None:
+            return value
+        if value not in labels:
+            return -1
+        return labels.index(value)
+
+    def filter(self, mask: np.ndarray) -> "MoveTable":
+        return MoveTable({name: column[mask] for name, column in self.columns.items()}, self.agents,
+                         self.game_files)
+
+    def where(self, **conditions) -> "MoveTable":
+        """Rows where every column equals its value (or one of a list of values), by label for key columns."""
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in conditions.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= np.isin(self[name], [self._code(name, v) for v in values])
+        return self.filter(mask)
+
+    def group_by(self, keys: Sequence[str], value: str = "time",
+                 stats: Sequence[str] = ("count", "mean", "p50", "p95")) -> List[Dict]:
+        """One dict per group: the key labels and each statistic of `value` (pNN: nearest-rank percentile)."""
+        for stat in stats:
+            if stat not in STATS and not (stat.startswith("p") and stat[1:].replace(".", "", 1).isdigit()):
+                raise ValueError(f"unknown statistic {stat!r}")
+        n = len(self)
+        # Mixed-radix code of the key columns: one int64 per row
+        code = np.zeros(n, dtype=np.int64)
+        key_columns = []
+        for key in keys:
+            column = self[key].astype(np.int64)
+            low = int(column.min()) if n else 0
+            span = int(column.max()) - low + 1 if n else 1
+            code = code * span + (column - low)
+            key_columns.append(column)
+        # Few possible codes (the usual case): count them directly instead of sorting
+        if n and int(code.max()) < 1 << 20:
+            present = np.bincount(code)
+            groups = np.flatnonzero(present)
+            dense = np.full(len(present), -1, dtype=np.int64)
+            dense[groups] = np.arange(len(groups))
+            inverse = dense[code]
+            first = np.zeros(len(groups), dtype=np.int64)
+            first[inverse] = np.arange(n)  # any row of the group: they share the key
+        else:
+            groups, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(groups))
+        column = self[value]
+        results = {}
+        if any(s in ("sum", "mean") for s in stats):
+            sums = np.bincount(inverse, weights=column, minlength=len(groups))
+            results["sum"], results["mean"] = sums, sums / np.maximum(counts, 1)
+        if any(s not in ("count", "sum", "mean") for s in stats):
+            # Sorted by value, then stably by group: every group is one sorted run of `ordered`
+            order = np.argsort(column, kind="stable")
+            group_dtype = np.int16 if len(groups) < 1 << 15 else np.int64
+            order = order[np.argsort(inverse[order].astype(group_dtype), kind="stable")]
+            ordered = column[order].astype(np.float64)
+            starts = np.cumsum(counts) - counts
+            results["min"] = ordered[starts]
+            results["max"] = ordered[starts + counts - 1]
+            for stat in stats:
+                if stat.startswith("p"):
+                    rank = np.ceil(float(stat[1:]) / 100 * counts).astype(np.int64) - 1
+                    results[stat] = ordered[starts + np.clip(rank, 0, counts - 1)]
+        results["count"] = counts
+
+        rows = []
+        for g in range(len(groups)):
+            row = {}
+            for key, column in zip(keys, key_columns):
+                code_value = int(column[first[g]])
+                labels = self.labels(key)
+                row[key] = labels[code_value] if labels is not None else code_value
+            for stat in stats:
+                row[stat] = int(counts[g]) if stat == "count" else float(results[stat][g])
+            rows.append(row)
+        return rows
+
+
+def load(path: str, columns: Optional[Sequence[str]] = None) -> MoveTable:
+    """Every shard under `path` (or one shard file) as one table, agent codes merged over shards."""
+    files = sorted(glob.glob(os.path.join(path, "moves-*.npz"))) if os.path.isdir(path) else [path]
+    names = list(columns or COLUMNS)
+    if "agent" not in names:
+        names.append("agent")
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+    shard_agents, game_files = [], {}
+    for file in files:
+        with np.load(file) as shard:
+            agents = [str(a) for a in shard["agents"]]
+            shard_agents.append(agents)
+            for name in names:
+                parts[name].append(shard[name])
+            game_files.update(zip(shard["game_ids"].tolist(), shard["game_files"].tolist()))
+    agents = sorted({a for names_ in shard_agents for a in names_})
+    codes = {name: i for i, name in enumerate(agents)}
+    # Shard-local agent codes to the merged dictionary
+    for i, local in enumerate(shard_agents):
+        remap = np.asarray([codes[a] for a in local] or [0], dtype=COLUMNS["agent"])
+        parts["agent"][i] = remap[parts["agent"][i]]
+    table = {name: np.concatenate(chunks) if chunks else np.zeros(0, dtype=COLUMNS[name])
+             for name, chunks in parts.items()}
+    return MoveTable(table, agents, game_files)
+
+
+def format_rows(rows: List[Dict], keys: Sequence[str], stats: Sequence[str]) -> str:
+    lines = ["".join(f"{k:<14}" for k in keys) + "".join(f"{s:>12}" for s in stats)]
+    for row in rows:
+        lines.append("".join(f"{str(row[k]):<14}" for k in keys)
+                     + "".join(f"{row[s]:>12}" if s == "count" else f"{row[s]:>12.4g}" for s in stats))
+    return "\n".join(lines)
+
+
+def _parse_where(items: List[str]) -> Dict[str, list]:
+    conditions: Dict[str, list] = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        values = []
+        for v in value.split(","):
+            try:
+                values.append(int(v))
+            except ValueError:
+                values.append(v)
+        conditions[name] = values
+    return conditions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar move table: ingest game logs and query it.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="add new game logs to the table")
+    p.add_argument("logs", nargs="+", help="game log files or directories (runs/*.json)")
+    p.add_argument("--out", default="data/moves")
+    p.add_argument("--shard-rows", type=int, default=1_000_000)
+    p.add_argument("--rebuild", action="store_true", help="drop the table and ingest every log again")
+
+    q = sub.add_parser("query", help="group-by over the table")
+    q.add_argument("table", nargs="?", default="data/moves")
+    q.add_argument("--by", default="agent", help="comma-separated key columns (agent, phase, color, ply, ...)")
+    q.add_argument("--value", default="time", help="column to aggregate")
+    q.add_argument("--stats", default="count,mean,p50,p95", help=f"from {', '.join(STATS)} or any pNN")
+    q.add_argument("--where", action="append", default=[], help="column=value[,value...] (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        summary = ingest(args.logs, args.out, args.shard_rows, args.rebuild)
+        print(f"✅ {summary['games']} games ({summary['moves']} moves) added in {summary['elapsed']:.1f}s, "
+              f"{summary['skipped']} already in the table")
+        return
+
+    start = time.perf_counter()
+    keys = [k for k in args.by.split(",") if k]
+    stats = [s for s in args.stats.split(",") if s]
+    table = load(args.table)
+    loaded = time.perf_counter()
+    table = table.where(**_parse_where(args.where))
+    rows = table.group_by(keys, args.value, stats)
+    print(format_rows(rows, keys, stats))
+    print(f"{len(table)} moves, loaded in {loaded - start:.2f}s, queried in {time.perf_counter() - loaded:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
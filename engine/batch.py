@@ -0,0 +1,177 @@
+"""
+Batched tactical classification with NumPy.
+
+Many positions (GameStates, raw boards or encoded board strings) are
+stacked into one (N, n, n) int8 array, and the critical-move buckets of
+engine.tactics.critical_moves are computed for all of them at once with
+shifted boolean masks, one direction at a time. The buckets are YSV7's
+exactly, including 'to_attack', which YSV7 builds from the opponent's
+open-four cells and so always equals 'to_defuse'.
+
+    python -m engine.batch --logs runs --data data/selfplay   # benchmark vs. a Python loop
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .tactics import DIRECTIONS, EMPTY
+
+Move = Tuple[int, int]
+
+BUCKETS = ('to_win', 'to_defend', 'to_defuse', 'to_attack', 'to_fork')
+CODES = {EMPTY: 0, 'X': 1, 'O': 2}
+
+
+def _raw_board(item):
+    if isinstance(item, str):
+        n = int(round(len(item) ** 0.5))
+        return [item[r * n:(r + 1) * n] for r in range(n)]
+    return getattr(item, "board", item)
+
+
+def stack_boards(items: Sequence) -> np.ndarray:
+    """Stack GameStates / raw boards / board strings into an (N, n, n) int8 array."""
+    boards = [_raw_board(item) for item in items]
+    n = len(boards[0]) if boards else 0
+    out = np.zeros((len(boards), n, n), dtype=np.int8)
+    for i, board in enumerate(boards):
+        for r, row in enumerate(board):
+            out[i, r] = [CODES[cell] for cell in row]
+    return out
+
+
+# Side to move for each position: the GameState's current player, or 'X'
+# when both colours have the same number of stones
+def players_to_move(items: Sequence, arr: np.ndarray) -> List[str]:
+    players = []
+    for item, board in zip(items, arr):
+        current = getattr(item, "current_player", None)
+        if current is not None:
+            players.append(current.value)
+        else:
+            players.append('X' if (board == 1).sum() == (board == 2).sum() else 'O')
+    return players
+
+
+# shifted[..., r, c] = mask[..., r + k*dr, c + k*dc], False outside the board
+def _shift(mask: np.ndarray, k: int, dr: int, dc: int) -> np.ndarray:
+    n = mask.shape[-1]
+    out = np.zeros_like(mask)
+    sr, sc = k * dr, k * dc
+    if abs(sr) >= n or abs(sc) >= n:
+        return out
+    r0, r1 = max(0, -sr), min(n, n - sr)
+    c0, c1 = max(0, -sc), min(n, n - sc)
+    out[..., r0:r1, c0:c1] = mask[..., r0 + sr:r1 + sr, c0 + sc:c1 + sc]
+    return out
+
+
+def _runs(stones: np.ndarray, dr: int, dc: int) -> np.ndarray:
+    # Length of the line through each cell if a stone was placed there
+    total = np.ones(stones.shape, dtype=np.int8)
+    for sign in (1, -1):
+        alive = np.ones(stones.shape, dtype=bool)
+        for k in range(1, 5):
+            alive &= _shift(stones, sign * k, dr, dc)
+            total += alive
+    return total
+
+
+def _open_four(stones: np.ndarray, empty: np.ndarray, dr: int, dc: int) -> np.ndarray:
+    # .xxxx. with the cell itself at one of the four inner positions
+    found = np.zeros(stones.shape, dtype=bool)
+    for offset in range(1, 5):
+        hit = _shift(empty, -offset, dr, dc) & _shift(empty, 5 - offset, dr, dc)
+        for i in range(1, 5):
+            if i != offset:
+                hit &= _shift(stones, i - offset, dr, dc)
+        found |= hit
+    return found
+
+
+def critical_masks(arr: np.ndarray, players: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Boolean (N, n, n) masks for every bucket of engine.tactics.critical_moves."""
+    me = np.array([CODES[p] for p in players], dtype=np.int8)[:, None, None]
+    rival = 3 - me
+    empty = arr == 0
+    own = arr == me
+    opp = arr == rival
+
+    win = np.zeros(arr.shape, dtype=bool)
+    defend = np.zeros(arr.shape, dtype=bool)
+    defuse = np.zeros(arr.shape, dtype=bool)
+    lines = np.zeros(arr.shape, dtype=np.int8)
+    for dr, dc in DIRECTIONS:
+        own_runs = _runs(own, dr, dc)
+        win |= own_runs >= 5
+        defend |= _runs(opp, dr, dc) >= 5
+        defuse |= _open_four(opp, empty, dr, dc)
+        lines += own_runs >= 2
+    return {
+        'to_win': win & empty,
+        'to_defend': defend & empty,
+        'to_defuse': defuse & empty,
+        'to_attack': defuse & empty,   # YSV7 checks the opponent's open fours here too
+        'to_fork': (lines >= 2) & empty,
+    }
+
+
+def batch_critical_moves(items: Sequence, players: Optional[Sequence[str]] = None) -> List[Dict[str, List[Move]]]:
+    """Critical moves for every position, each in the shape of YSV7._get_critical_moves."""
+    if not len(items):
+        return []
+    arr = stack_boards(items)
+    if players is None:
+        players = players_to_move(items, arr)
+    masks = critical_masks(arr, players)
+    results = [{bucket: [] for bucket in BUCKETS} for _ in range(len(arr))]
+    for bucket in BUCKETS:
+        idx, rows, cols = np.nonzero(masks[bucket])
+        for i, r, c in zip(idx.tolist(), rows.tolist(), cols.tolist()):
+            results[i][bucket].append((r, c))
+    return results
+
+
+def main(argv=None):
+    from .records import iter_game_logs, iter_records, log_records
+    from .tactics import critical_moves
+
+    parser = argparse.ArgumentParser(description="Benchmark batched vs. per-position critical-move scans.")
+    parser.add_argument("--logs", action="append", default=[])
+    parser.add_argument("--data", action="append", default=[])
+    parser.add_argument("--limit", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    boards, players = [], []
+    for path in args.logs:
+        for log in iter_game_logs(path):
+            for record in log_records(log):
+                boards.append(record["board"])
+                players.append(record["to_move"])
+    for path in args.data:
+        for record in iter_records(path):
+            if len(boards) >= args.limit:
+                break
+            boards.append(record["board"])
+            players.append(record["to_move"])
+    boards, players = boards[:args.limit], players[:args.limit]
+    if not boards:
+        raise SystemExit("No positions found")
+
+    start = time.perf_counter()
+    batched = batch_critical_moves(boards, players)
+    t_batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    looped = [critical_moves(_raw_board(b), p) for b, p in zip(boards, players)]
+    t_loop = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(batched, looped) if a != b)
+    print(f"{len(boards)} positions: batch {t_batch:.3f}s, loop {t_loop:.3f}s "
+          f"({t_loop / t_batch:.1f}x), mismatches {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
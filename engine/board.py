@@ -0,0 +1,255 @@
+"""
+Mutable search board with make / unmake.
+
+Cells live in a flat array('b') (0 empty, 1 'X', 2 'O'); moves are flat
+indices (row * n + col). make() and unmake() update, in O(1) amortized:
+
+  - the stones and the side to move,
+  - the Zobrist hash (side to move included),
+  - the line-pattern threat counters (engine.features.FeatureCounts),
+  - the frontier: empty cells next to at least one stone,
+  - after track_symmetry(), one Zobrist hash per board symmetry
+    (engine.symmetry), whose minimum is the same for all eight images of
+    the position.
+
+A search copies the root position into one SearchBoard and then only
+makes and unmakes moves on it, so no GameState or board copies are made
+per node.
+"""
+import random
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .features import FeatureCounts
+from .linecodes import DIRECTIONS, EMPTY, SPAN, line_flags
+
+CHARS = (EMPTY, 'X', 'O')
+COLOUR = {EMPTY: 0, 'X': 1, 'O': 2}
+
+_GEOMETRY: Dict[int, "_Geometry"] = {}
+
+
+class _Geometry:
+    """Per-board-size tables shared by every SearchBoard of that size."""
+
+    def __init__(self, n: int, seed: int = 20250821):
+        rng = random.Random(seed)
+        self.n = n
+        # zobrist[idx * 3 + colour]; colour 0 is unused
+        self.zobrist = [0] * (n * n * 3)
+        for idx in range(n * n):
+            self.zobrist[idx * 3 + 1] = rng.getrandbits(64)
+            self.zobrist[idx * 3 + 2] = rng.getrandbits(64)
+        self.side_key = rng.getrandbits(64)
+        self._sym_zobrist: Optional[List[List[int]]] = None
+        self.neighbours: List[Tuple[int, ...]] = []
+        # rays[idx][d] = (indices walking forward, indices walking backward)
+        self.rays: List[Tuple[Tuple[Tuple[int, ...], Tuple[int, ...]], ...]] = []
+        for r in range(n):
+            for c in range(n):
+                self.neighbours.append(tuple(
+                    rr * n + cc
+                    for rr in range(max(0, r - 1), min(n, r + 2))
+                    for cc in range(max(0, c - 1), min(n, c + 2))
+                    if (rr, cc) != (r, c)
+                ))
+                rays = []
+                for dr, dc in DIRECTIONS:
+                    fwd, bwd = [], []
+                    for k in range(1, 5):
+                        rr, cc = r + k * dr, c + k * dc
+                        if 0 <= rr < n and 0 <= cc < n:
+                            fwd.append(rr * n + cc)
+                        rr, cc = r - k * dr, c - k * dc
+                        if 0 <= rr < n and 0 <= cc < n:
+                            bwd.append(rr * n + cc)
+                    rays.append((tuple(fwd), tuple(bwd)))
+                self.rays.append(tuple(rays))
+        # Line-code weights per cell and direction (engine.linecodes layout):
+        # a constant for the off-board cells plus (index, 3**k) pairs
+        self.codes = []
+        for idx in range(n * n):
+            per_dir = []
+            for fwd, bwd in self.rays[idx]:
+                edge = 0
+                pairs = []
+                for k, cells in ((1, fwd), (-1, bwd)):
+                    for step in range(1, SPAN + 1):
+                        weight = 3 ** (SPAN + k * step)
+                        if step <= len(cells):
+                            pairs.append((cells[step - 1], weight))
+                        else:
+                            edge += 2 * weight
+                per_dir.append((edge, tuple(pairs)))
+            self.codes.append(tuple(per_dir))
+
+
+    # sym_zobrist[t][idx * 3 + colour]: the key of the cell that symmetry t moves idx to
+    @property
+    def sym_zobrist(self) -> List[List[int]]:
+        if self._sym_zobrist is None:
+            from .symmetry import symmetry
+            self._sym_zobrist = [[self.zobrist[perm[i // 3] * 3 + i % 3] for i in range(len(self.zobrist))]
+                                 for perm in symmetry(self.n).perms]
+        return self._sym_zobrist
+
+
+def geometry(n: int) -> _Geometry:
+    geo = _GEOMETRY.get(n)
+    if geo is None:
+        geo = _GEOMETRY[n] = _Geometry(n)
+    return geo
+
+
+class SearchBoard:
+
+    __slots__ = ("n", "cells", "side", "hash", "counts", "frontier", "near", "stack", "geo", "sym")
+
+    def __init__(self, n: int = 8, side: int = 1):
+        self.n = n
+        self.geo = geometry(n)
+        self.cells = array('b', [0] * (n * n))
+        self.side = side
+        self.hash = self.geo.side_key if side == 2 else 0
+        self.near = array('b', [0] * (n * n))   # stones around each cell
+        self.frontier = set()
+        self.stack: List[int] = []
+        self.counts = FeatureCounts([[EMPTY] * n for _ in range(n)])
+        self.sym: Optional[List[int]] = None
+
+    @classmethod
+    def from_rows(cls, board: Sequence[Sequence[str]], to_move: str) -> "SearchBoard":
+        """Build from a raw board (rows of '.', 'X', 'O') with `to_move` to play."""
+        n = len(board)
+        sb = cls(n, COLOUR[to_move])
+        for r in range(n):
+            for c in range(n):
+                cell = board[r][c]
+                if cell != EMPTY:
+                    sb._put(r * n + c, COLOUR[cell])
+        sb.stack.clear()
+        return sb
+
+    def index(self, row: int, col: int) -> int:
+        return row * self.n + col
+
+    def coords(self, idx: int) -> Tuple[int, int]:
+        return divmod(idx, self.n)
+
+    def to_rows(self) -> List[List[str]]:
+        n = self.n
+        return [[CHARS[self.cells[r * n + c]] for c in range(n)] for r in range(n)]
+
+    # Candidate moves: the frontier, or the centre on an empty board
+    def moves(self) -> List[int]:
+        if self.frontier:
+            return list(self.frontier)
+        centre = (self.n // 2) * self.n + self.n // 2
+        if not any(self.cells):
+            return [centre]
+        return [i for i, v in enumerate(self.cells) if v == 0]
+
+    def is_full(self) -> bool:
+        return 0 not in self.cells
+
+    # Placing `colour` at `idx` completes five (or more) in a row
+    def makes_five(self, idx: int, colour: int) -> bool:
+        cells = self.cells
+        for fwd, bwd in self.geo.rays[idx]:
+            count = 1
+            for i in fwd:
+                if cells[i] != colour:
+                    break
+                count += 1
+            for i in bwd:
+                if cells[i] != colour:
+                    break
+                count += 1
+            if count >= 5:
+                return True
+        return False
+
+    # Pattern flags (engine.linecodes) of placing `colour` at `idx`
+    def flags(self, idx: int, colour: int) -> int:
+        cells = self.cells
+        table = line_flags()
+        flags = 0
+        for edge, pairs in self.geo.codes[idx]:
+            code = edge
+            for i, weight in pairs:
+                v = cells[i]
+                if v:
+                    code += weight if v == colour else 2 * weight
+            flags |= table[code]
+        return flags
+
+    def own_neighbours(self, idx: int, colour: int) -> int:
+        cells = self.cells
+        return sum(1 for i in self.geo.neighbours[idx] if cells[i] == colour)
+
+    def track_symmetry(self):
+        """Keep one hash per symmetry from now on (costs eight XORs per make / unmake)."""
+        tables = self.geo.sym_zobrist
+        self.sym = [0] * 8
+        for idx, colour in enumerate(self.cells):
+            if colour:
+                for t in range(8):
+                    self.sym[t] ^= tables[t][idx * 3 + colour]
+
+    # Side-independent hash of the position shared by its eight images: the smallest symmetry hash
+    def canonical_hash(self, child: Optional[int] = None) -> int:
+        if child is None:
+            return min(self.sym)
+        k = child * 3 + self.side
+        return min([h ^ table[k] for h, table in zip(self.sym, self.geo.sym_zobrist)])
+
+    def make(self, idx: int):
+        """Play the side to move at `idx`."""
+        self._put(idx, self.side)
+        self.side = 3 - self.side
+        self.hash ^= self.geo.side_key
+
+    def unmake(self):
+        """Take back the last move."""
+        idx = self.stack.pop()
+        colour = self.cells[idx]
+        geo = self.geo
+        self.cells[idx] = 0
+        self.hash ^= geo.zobrist[idx * 3 + colour] ^ geo.side_key
+        self.side = colour
+        if self.sym is not None:
+            self._sym_toggle(idx, colour)
+        r, c = divmod(idx, self.n)
+        self.counts.update(r, c, EMPTY)
+        near, frontier = self.near, self.frontier
+        for nb in geo.neighbours[idx]:
+            near[nb] -= 1
+            if near[nb] == 0:
+                frontier.discard(nb)
+        if near[idx] > 0:
+            frontier.add(idx)
+
+    def _put(self, idx: int, colour: int):
+        geo = self.geo
+        self.cells[idx] = colour
+        self.hash ^= geo.zobrist[idx * 3 + colour]
+        self.stack.append(idx)
+        if self.sym is not None:
+            self._sym_toggle(idx, colour)
+        r, c = divmod(idx, self.n)
+        self.counts.update(r, c, CHARS[colour])
+        near, frontier, cells = self.near, self.frontier, self.cells
+        frontier.discard(idx)
+        for nb in geo.neighbours[idx]:
+            near[nb] += 1
+            if cells[nb] == 0:
+                frontier.add(nb)
+
+    def _sym_toggle(self, idx: int, colour: int):
+        k = idx * 3 + colour
+        sym = self.sym
+        for t, table in enumerate(self.geo.sym_zobrist):
+            sym[t] ^= table[k]
+
+    def last_move(self) -> Optional[int]:
+        return self.stack[-1] if self.stack else None
@@ -0,0 +1,151 @@
+"""
+Model cascade: a cheap model first, larger models only when needed.
+
+Tiers are tried in order. Each tier's move is checked by the tactical
+engine before it is accepted:
+
+  - it parses, and is a legal move,
+  - it does not miss an immediate win, or ignore a forced block,
+  - it is among the engine's top candidates (engine.gating.rank_moves);
+    a move outside them is a disagreement and goes to the next tier.
+
+The last tier's move is accepted if it is legal and tactically sound,
+even when the engine disagrees. Calls, accepted moves and latency are
+recorded per tier.
+
+Configured in agent.json:
+
+    "cascade": {
+        "tiers": [{"name": "fast", "model": "gemma2-9b-it"},
+                  {"name": "large", "model": "llama-3.3-70b-versatile"}],
+        "agree_top_k": 5
+    }
+"""
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from .evaluator import default_evaluator
+from .gating import rank_moves
+from .tactics import forced_blocks, winning_moves
+
+Move = Tuple[int, int]
+
+
+# The move of a JSON reply ({"move": {"row": r, "col": c}}), in a ```json block or bare
+def extract_move(text: str) -> Optional[Move]:
+    if not text:
+        return None
+    m = re.search(r"```json\s*(\{[\s\S]*?\})\s*```", text, re.IGNORECASE)
+    candidates = [m.group(1)] if m else re.findall(r"\{[\s\S]*\}", text)
+    for block in candidates:
+        try:
+            move = json.loads(block).get("move", {})
+            row, col = move.get("row"), move.get("col")
+        except (ValueError, AttributeError):
+            continue
+        if isinstance(row, int) and isinstance(col, int):
+            return (row, col)
+    return None
+
+
+# Why `move` is not acceptable for `me`, or None when it is
+def check_move(board, me: str, move: Optional[Move]) -> Optional[str]:
+    if move is None:
+        return "unparsable"
+    n = len(board)
+    row, col = move
+    if not (0 <= row < n and 0 <= col < n) or board[row][col] != '.':
+        return "illegal"
+    wins = winning_moves(board, me)
+    if wins:
+        return None if move in wins else "missed win"
+    blocks = forced_blocks(board, me)
+    if blocks and move not in blocks:
+        return "ignored block"
+    return None
+
+
+@dataclass
+class TierStats:
+    name: str
+    model: str
+    calls: int = 0
+    accepted: int = 0
+    errors: int = 0
+    latency: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.accepted / self.calls if self.calls else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency / self.calls if self.calls else 0.0
+
+
+class ModelCascade:
+
+    def __init__(self, tiers: List[dict], client_factory: Callable[[str], object],
+                 agree_top_k: int = 5, log_every: int = 10):
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.clients = [client_factory(tier["model"]) for tier in tiers]
+        self.stats = [TierStats(tier.get("name", tier["model"]), tier["model"]) for tier in tiers]
+        self.agree_top_k = agree_top_k
+        self.log_every = log_every
+        self.moves = 0
+        self._evaluator = None
+
+    @classmethod
+    def from_config(cls, config: dict, client_factory: Callable[[str], object]) -> "ModelCascade":
+        """Build from the "cascade" section of an agent.json."""
+        return cls(config["tiers"], client_factory,
+                   agree_top_k=int(config.get("agree_top_k", 5)),
+                   log_every=int(config.get("log_every", 10)))
+
+    def _engine_moves(self, board, me: str) -> List[Move]:
+        if self._evaluator is None:
+            self._evaluator = default_evaluator()
+        return [move for _, move in rank_moves(board, me, self._evaluator)[:self.agree_top_k]]
+
+    async def choose(self, messages, board, me: str) -> Optional[Move]:
+        """Move for `me`, escalating through the tiers; None if no tier gave a sound move."""
+        self.moves += 1
+        engine_moves = None
+        chosen = None
+        last = len(self.clients) - 1
+        for i, (client, stats) in enumerate(zip(self.clients, self.stats)):
+            start = time.perf_counter()
+            stats.calls += 1
+            try:
+                response = await client.complete(messages)
+            except Exception as e:
+                stats.latency += time.perf_counter() - start
+                stats.errors += 1
+                print(f"⚠️ Cascade tier {stats.name} failed: {e}")
+                continue
+            stats.latency += time.perf_counter() - start
+
+            move = extract_move(response)
+            problem = check_move(board, me, move)
+            if problem is None and i < last and self.agree_top_k:
+                if engine_moves is None:
+                    engine_moves = self._engine_moves(board, me)
+                if engine_moves and move not in engine_moves:
+                    problem = "disagrees with engine"
+            if problem is None:
+                stats.accepted += 1
+                chosen = move
+                break
+            print(f"🔼 Tier {stats.name} move {move}: {problem}, escalating")
+
+        if self.log_every and self.moves % self.log_every == 0:
+            print(f"🪜 {self.summary()}")
+        return chosen
+
+    def summary(self) -> str:
+        parts = [f"{s.name} {s.accepted}/{s.calls} ({s.hit_rate:.0%}, {s.mean_latency:.2f}s)" for s in self.stats]
+        return "Cascade: " + ", ".join(parts)
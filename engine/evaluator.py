@@ -0,0 +1,81 @@
+"""
+Learned pattern-weight evaluator.
+
+The evaluation of a position is one dot product between a small weight
+vector and the line-pattern feature counts (engine.features), seen from
+the side to move. Weights are fitted offline by engine.train_eval and
+stored as JSON next to this module.
+"""
+import json
+import os
+from typing import List, Optional
+
+from .features import FEATURES, NUM_FEATURES
+
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "pattern_weights.json")
+
+# Logit units -> search score units; stays far below the search's win score
+SCORE_SCALE = 1000
+SCORE_LIMIT = 500_000
+
+
+def feature_names() -> List[str]:
+    return [f"own_{f}" for f in FEATURES] + [f"opp_{f}" for f in FEATURES]
+
+
+class PatternEvaluator:
+
+    def __init__(self, weights: List[float], bias: float = 0.0, meta: Optional[dict] = None):
+        if len(weights) != 2 * NUM_FEATURES:
+            raise ValueError(f"Expected {2 * NUM_FEATURES} weights, got {len(weights)}")
+        self.weights = [float(w) for w in weights]
+        self.bias = float(bias)
+        self.meta = meta or {}
+        # Same weights, reordered for counts given as ('X' features, 'O' features)
+        self._as_x = [w * SCORE_SCALE for w in self.weights]
+        self._as_o = self._as_x[NUM_FEATURES:] + self._as_x[:NUM_FEATURES]
+
+    # Score of `counts` (FeatureCounts.totals) for the side `ch` to move
+    def evaluate(self, counts: List[int], ch: str) -> int:
+        weights = self._as_x if ch == 'X' else self._as_o
+        score = self.bias * SCORE_SCALE
+        for w, x in zip(weights, counts):
+            score += w * x
+        if score > SCORE_LIMIT:
+            return SCORE_LIMIT
+        if score < -SCORE_LIMIT:
+            return -SCORE_LIMIT
+        return int(score)
+
+    def save(self, path: str = DEFAULT_WEIGHTS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "features": feature_names(),
+                "weights": [round(w, 6) for w in self.weights],
+                "bias": round(self.bias, 6),
+                "meta": self.meta,
+            }, fh, indent=2)
+            fh.write("\n")
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_WEIGHTS) -> "PatternEvaluator":
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        if data.get("features") != feature_names():
+            raise ValueError(f"Weight file {path} does not match the current feature set")
+        return cls(data["weights"], data.get("bias", 0.0), data.get("meta"))
+
+
+_default: Optional[PatternEvaluator] = None
+
+
+# Shipped evaluator, or None if the weight file is missing or stale
+def default_evaluator() -> Optional[PatternEvaluator]:
+    global _default
+    if _default is None and os.path.exists(DEFAULT_WEIGHTS):
+        try:
+            _default = PatternEvaluator.load(DEFAULT_WEIGHTS)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Pattern weights not loaded: {e}")
+    return _default
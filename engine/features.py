@@ -0,0 +1,135 @@
+"""
+Line-pattern features, maintained incrementally.
+
+Every line of the board (rows, columns and both diagonals, length >= 5)
+is split into runs of stones. A run of 2-4 stones is "open" when both
+neighbouring cells are empty and "closed" when only one is; runs that
+can no longer grow into five (not enough room between the opponent's
+stones and the edge) are ignored. Placing or removing a stone only
+touches the four lines through that cell, so FeatureCounts keeps a
+per-line vector and updates the totals by difference.
+"""
+from typing import Dict, List, Tuple
+
+from .tactics import EMPTY
+
+FEATURES = ("open2", "closed2", "open3", "closed3", "open4", "closed4", "five")
+NUM_FEATURES = len(FEATURES)
+
+# Index of the (length, open ends) pair in FEATURES
+_INDEX: Dict[Tuple[int, int], int] = {
+    (2, 2): 0, (2, 1): 1,
+    (3, 2): 2, (3, 1): 3,
+    (4, 2): 4, (4, 1): 5,
+}
+_FIVE = 6
+
+_LINE_CACHE: Dict[int, Tuple[List[List[Tuple[int, int]]], List[List[Tuple[int, int]]]]] = {}
+
+
+# All lines of length >= 5 and, for every cell, the (line id, index) pairs through it
+def board_lines(n: int):
+    if n in _LINE_CACHE:
+        return _LINE_CACHE[n]
+    lines = []
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for r in range(n):
+            for c in range(n):
+                # Only start at the first cell of each line
+                pr, pc = r - dr, c - dc
+                if 0 <= pr < n and 0 <= pc < n:
+                    continue
+                cells = []
+                rr, cc = r, c
+                while 0 <= rr < n and 0 <= cc < n:
+                    cells.append((rr, cc))
+                    rr, cc = rr + dr, cc + dc
+                if len(cells) >= 5:
+                    lines.append(cells)
+    through = [[] for _ in range(n * n)]
+    for line_id, cells in enumerate(lines):
+        for i, (r, c) in enumerate(cells):
+            through[r * n + c].append((line_id, i))
+    _LINE_CACHE[n] = (lines, through)
+    return lines, through
+
+
+# Feature vector of one line: NUM_FEATURES counts for 'X' followed by 'O'
+def line_features(cells: List[str]) -> List[int]:
+    vec = [0] * (2 * NUM_FEATURES)
+    length = len(cells)
+    i = 0
+    while i < length:
+        ch = cells[i]
+        if ch == EMPTY:
+            i += 1
+            continue
+        j = i
+        while j < length and cells[j] == ch:
+            j += 1
+        run = j - i
+        # Room available to this run: stretch over empties and own stones
+        lo = i
+        while lo > 0 and cells[lo - 1] != _other(ch):
+            lo -= 1
+        hi = j
+        while hi < length and cells[hi] != _other(ch):
+            hi += 1
+        base = 0 if ch == 'X' else NUM_FEATURES
+        if run >= 5:
+            vec[base + _FIVE] += 1
+        elif run >= 2 and hi - lo >= 5:
+            ends = (i > 0 and cells[i - 1] == EMPTY) + (j < length and cells[j] == EMPTY)
+            if ends:
+                vec[base + _INDEX[(run, ends)]] += 1
+        i = j
+    return vec
+
+
+def _other(ch: str) -> str:
+    return 'O' if ch == 'X' else 'X'
+
+
+def board_features(board) -> List[int]:
+    lines, _ = board_lines(len(board))
+    total = [0] * (2 * NUM_FEATURES)
+    for cells in lines:
+        vec = line_features([board[r][c] for r, c in cells])
+        for k in range(len(total)):
+            total[k] += vec[k]
+    return total
+
+
+# Features from the point of view of `ch`: own counts first, then the opponent's
+def relative(counts: List[int], ch: str) -> List[int]:
+    if ch == 'X':
+        return counts
+    return counts[NUM_FEATURES:] + counts[:NUM_FEATURES]
+
+
+class FeatureCounts:
+    """Incrementally maintained feature totals for a board that is edited in place."""
+
+    __slots__ = ("n", "lines", "through", "line_cells", "line_vecs", "totals")
+
+    def __init__(self, board):
+        self.n = len(board)
+        self.lines, self.through = board_lines(self.n)
+        self.line_cells = [[board[r][c] for r, c in cells] for cells in self.lines]
+        self.line_vecs = [line_features(cells) for cells in self.line_cells]
+        self.totals = [0] * (2 * NUM_FEATURES)
+        for vec in self.line_vecs:
+            for k in range(len(vec)):
+                self.totals[k] += vec[k]
+
+    # Update after board[r][c] has been set to `ch` (a stone or EMPTY)
+    def update(self, r: int, c: int, ch: str):
+        totals = self.totals
+        for line_id, i in self.through[r * self.n + c]:
+            cells = self.line_cells[line_id]
+            cells[i] = ch
+            old = self.line_vecs[line_id]
+            new = line_features(cells)
+            for k in range(len(new)):
+                totals[k] += new[k] - old[k]
+            self.line_vecs[line_id] = new
@@ -0,0 +1,145 @@
+"""
+Confidence gating for LLM calls.
+
+Before an agent asks the LLM, LLMGate ranks the candidate moves with a
+two-ply lookahead (the agent's move, the opponent's best reply, then the
+pattern evaluator) and estimates how sure the engine is of its best move:
+
+    confidence = margin / (margin + margin_scale) / (1 + threat_weight * threats)
+
+where margin is the score gap between the two best candidates and
+threats the number of cells where either side could make a three or
+four (tactical positions are left to the LLM). When the confidence
+clears the threshold the engine's move is played and the call skipped.
+
+In shadow mode nothing is skipped: the LLM is still asked, and the gate
+only records whether its own move would have agreed, which is what the
+threshold should be tuned on.
+
+    gate = LLMGate.from_config({"threshold": 0.4, "shadow": True})
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .board import CHARS, COLOUR, SearchBoard
+from .evaluator import PatternEvaluator, default_evaluator
+from .linecodes import FOUR, OPEN_THREE, SPLIT_THREE
+from .search import WIN
+
+Move = Tuple[int, int]
+
+THREAT_FLAGS = FOUR | OPEN_THREE | SPLIT_THREE
+
+
+# Two-ply scores of every candidate for `me` (own move, then the opponent's
+# best reply, then the evaluator), best first
+def rank_moves(board, me: str, evaluator: PatternEvaluator) -> List[Tuple[int, Move]]:
+    sb = SearchBoard.from_rows(board, me)
+    colour = COLOUR[me]
+    ranked = []
+    for move in sb.moves():
+        if sb.makes_five(move, colour):
+            ranked.append((WIN, sb.coords(move)))
+            continue
+        sb.make(move)
+        worst = WIN
+        for reply in sb.moves():
+            if sb.makes_five(reply, sb.side):
+                worst = -WIN
+                break
+            sb.make(reply)
+            score = evaluator.evaluate(sb.counts.totals, CHARS[colour])
+            sb.unmake()
+            if score < worst:
+                worst = score
+        sb.unmake()
+        ranked.append((worst, sb.coords(move)))
+    ranked.sort(key=lambda item: -item[0])
+    return ranked
+
+
+@dataclass
+class GateDecision:
+    move: Optional[Move]     # the engine's best move
+    confidence: float
+    margin: int
+    threats: int
+    skip_llm: bool           # play `move` without asking the LLM
+
+
+@dataclass
+class GateStats:
+    assessed: int = 0
+    gated: int = 0           # confident decisions (skipped calls, or would-skip in shadow mode)
+    shadow_compared: int = 0
+    shadow_agreed: int = 0
+
+    @property
+    def gate_rate(self) -> float:
+        return self.gated / self.assessed if self.assessed else 0.0
+
+    @property
+    def agreement_rate(self) -> float:
+        return self.shadow_agreed / self.shadow_compared if self.shadow_compared else 0.0
+
+
+class LLMGate:
+
+    def __init__(self, threshold: float = 0.4, shadow: bool = False, margin_scale: int = 300,
+                 threat_weight: float = 0.1, evaluator: Optional[PatternEvaluator] = None,
+                 log_every: int = 10):
+        self.threshold = threshold
+        self.shadow = shadow
+        self.margin_scale = margin_scale
+        self.threat_weight = threat_weight
+        self.evaluator = evaluator or default_evaluator()
+        self.log_every = log_every
+        self.stats = GateStats()
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "LLMGate":
+        """Build from the "gating" section of an agent.json."""
+        config = config or {}
+        return cls(threshold=float(config.get("threshold", 0.4)),
+                   shadow=bool(config.get("shadow", False)),
+                   margin_scale=int(config.get("margin_scale", 300)),
+                   threat_weight=float(config.get("threat_weight", 0.1)),
+                   log_every=int(config.get("log_every", 10)))
+
+    def rank_moves(self, board, me: str) -> List[Tuple[int, Move]]:
+        return rank_moves(board, me, self.evaluator)
+
+    @staticmethod
+    def count_threats(board, me: str) -> int:
+        sb = SearchBoard.from_rows(board, me)
+        return sum(1 for i in range(len(sb.cells)) if sb.cells[i] == 0
+                   and (sb.flags(i, 1) | sb.flags(i, 2)) & THREAT_FLAGS)
+
+    def assess(self, board, me: str) -> GateDecision:
+        ranked = self.rank_moves(board, me)
+        threats = self.count_threats(board, me)
+        if not ranked:
+            return GateDecision(None, 0.0, 0, threats, False)
+        margin = ranked[0][0] - ranked[1][0] if len(ranked) > 1 else WIN
+        confidence = margin / (margin + self.margin_scale) / (1 + self.threat_weight * threats)
+        confident = confidence >= self.threshold
+        stats = self.stats
+        stats.assessed += 1
+        stats.gated += confident
+        if self.log_every and stats.assessed % self.log_every == 0:
+            print(f"🚦 {self.summary()}")
+        return GateDecision(ranked[0][1], confidence, margin, threats, confident and not self.shadow)
+
+    # Shadow mode: compare a would-be-gated decision with the LLM's move
+    def record_llm_move(self, decision: GateDecision, llm_move: Optional[Move]):
+        if decision.confidence < self.threshold or llm_move is None:
+            return
+        self.stats.shadow_compared += 1
+        self.stats.shadow_agreed += tuple(llm_move) == decision.move
+
+    def summary(self) -> str:
+        s = self.stats
+        text = f"LLM gate: {s.gated}/{s.assessed} confident ({s.gate_rate:.0%}) at threshold {self.threshold}"
+        if s.shadow_compared:
+            text += f", shadow agreement {s.shadow_agreed}/{s.shadow_compared} ({s.agreement_rate:.0%})"
+        return text
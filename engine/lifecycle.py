@@ -0,0 +1,185 @@
+"""
+Agent lifecycle: game boundaries and byte-capped global caches.
+
+The framework never tells an agent that a game has ended, and instances
+may be reused across games (the warm server, long tournaments). Agents
+call GameTracker.observe() at the start of every get_move: it detects a
+new game from game_state.move_history, when the history is shorter than
+the last one seen or starts with a different first move. The agent then
+runs its end-game hook for the previous game and resets its per-game
+state (move history, search tables, formation plans, time bank). Runners
+that know a game is over (engine.match, engine.server) call the agent's
+end_game() directly.
+
+Caches shared by every game in the process (solver proofs, the endgame
+tablebase) register here with a budget in bytes. Every end of game
+flushes their pending writes and trims them back under their budget, and
+cache_report() lists their sizes. A cache that cannot be trimmed (the
+tablebase stops growing at its budget instead) says so in the report:
+
+    from engine.lifecycle import cache_report, format_cache_report
+    print(format_cache_report(cache_report()))
+
+The soak benchmark plays many games with the same agent instances and
+prints the process RSS as it goes, which should stay flat:
+
+    python -m engine.lifecycle agent1 agent2 --games 10000 --every 500
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Budget in bytes of each global cache (by registered name)
+CACHE_LIMITS = {
+    "proofs": 32 << 20,
+    "tablebase": 64 << 20,
+}
+
+
+class GameTracker:
+    """Detects game boundaries from the move history handed to get_move."""
+
+    def __init__(self):
+        self.games = 0
+        self._plies = -1
+        self._first: Optional[Tuple[int, int]] = None
+
+    # True when `move_history` belongs to a different game than the last call
+    def observe(self, move_history) -> bool:
+        plies = len(move_history)
+        first = (move_history[0].row, move_history[0].col) if plies else None
+        new = (self._plies < 0 or plies < self._plies
+               or (self._first is not None and first != self._first))
+        if new:
+            self.games += 1
+        self._plies = plies
+        self._first = first
+        return new
+
+    # The game is known to be over: the next call starts a new one
+    def end(self):
+        self._plies = -1
+        self._first = None
+
+
+@dataclass
+class CacheInfo:
+    name: str
+    entries: int
+    bytes: int
+    limit: Optional[int]
+    note: str = ""
+
+
+_caches: Dict[str, Tuple[object, Optional[int]]] = {}
+
+
+# `cache` needs __len__, nbytes() and trim(max_bytes) -> bytes freed; it may have flush(),
+# run before trimming, and a `budget_note` saying how the budget is enforced instead
+def register_cache(name: str, cache, max_bytes: Optional[int] = None):
+    _caches[name] = (cache, max_bytes if max_bytes is not None else CACHE_LIMITS.get(name))
+
+
+def trim_caches() -> int:
+    """Flush and trim every registered cache to its budget; returns the bytes freed."""
+    freed = 0
+    for cache, limit in _caches.values():
+        if hasattr(cache, "flush"):
+            cache.flush()
+        if limit is not None and cache.nbytes() > limit:
+            freed += cache.trim(limit)
+    return freed
+
+
+def cache_report() -> List[CacheInfo]:
+    return [CacheInfo(name, len(cache), cache.nbytes(), limit, getattr(cache, "budget_note", ""))
+            for name, (cache, limit) in sorted(_caches.items())]
+
+
+def format_cache_report(report: List[CacheInfo]) -> str:
+    lines = []
+    for info in report:
+        limit = f"{info.limit / 2 ** 20:.0f} MiB" if info.limit is not None else "no limit"
+        note = f", {info.note}" if info.note else ""
+        lines.append(f"{info.name}: {info.entries} entries, {info.bytes / 2 ** 20:.1f} MiB (budget {limit}{note})")
+    return "\n".join(lines) or "no global caches"
+
+
+# Resident set size of this process in bytes (Linux /proc, else the peak from getrusage)
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def soak(agent_dirs: List[str], games: int, every: int = 500, board_size: int = 8,
+         time_limit: float = 30.0, game_time: Optional[float] = None, stub_llm: bool = True,
+         out=None) -> List[Tuple[int, int]]:
+    """Play `games` games between one pair of agent instances; (games, RSS bytes) samples."""
+    from .match import load_agent_class, play_game
+    from .puzzles import prepare_stubbed, stub_env
+
+    (cls_a, name_a), (cls_b, name_b) = [load_agent_class(d) for d in agent_dirs]
+    with stub_env() if stub_llm else contextlib.nullcontext():
+        agents = (cls_a(f"{name_a}-soak"), cls_b(f"{name_b}-soak"))
+    for agent in agents:
+        # A small time bank keeps thousands of games affordable
+        if game_time is not None and hasattr(agent, "config"):
+            agent.config["time"] = {"game_time": game_time, "move_limit": game_time / 4}
+        if stub_llm:
+            prepare_stubbed(agent)
+    samples = [(0, rss_bytes())]
+
+    async def run():
+        start = time.perf_counter()
+        for g in range(1, games + 1):
+            a, b = (0, 1) if g % 2 else (1, 0)
+            await play_game(g, agents[a], agents[b], ((name_a, name_b)[a], (name_a, name_b)[b]),
+                            board_size, time_limit)
+            if g % every == 0 or g == games:
+                samples.append((g, rss_bytes()))
+                rate = g / (time.perf_counter() - start)
+                print(f"📈 {g} games: RSS {samples[-1][1] / 2 ** 20:.1f} MiB ({rate:.1f} games/s)",
+                      file=out or sys.stdout, flush=True)
+
+    asyncio.run(run())
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test: RSS over many games with the same agent instances.")
+    parser.add_argument("agents", nargs=2, help="two agent directories (with agent.json)")
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--every", type=int, default=500, help="games between RSS samples")
+    parser.add_argument("--time-limit", type=float, default=30.0)
+    parser.add_argument("--game-time", type=float, default=2.0, help="thinking seconds per game for each agent")
+    parser.add_argument("--llm", choices=("stub", "live"), default="stub")
+    parser.add_argument("--verbose", action="store_true", help="show the agents' own output")
+    args = parser.parse_args(argv)
+
+    # The agents print every move; only the samples are shown unless --verbose
+    out = sys.stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(out if args.verbose else devnull):
+        samples = soak(args.agents, args.games, args.every, time_limit=args.time_limit,
+                       game_time=args.game_time, stub_llm=args.llm == "stub", out=out)
+
+    # Growth after warm-up: from the first interval's sample to the last one
+    base = samples[1] if len(samples) > 2 else samples[0]
+    growth = samples[-1][1] - base[1]
+    print(f"✅ {samples[-1][0]} games, RSS {samples[0][1] / 2 ** 20:.1f} -> {samples[-1][1] / 2 ** 20:.1f} MiB "
+          f"({growth / 2 ** 20:+.1f} MiB after the first {base[0]} games)")
+    # The caches registered themselves with engine.lifecycle, not with this __main__ module
+    from . import lifecycle
+    print(format_cache_report(lifecycle.cache_report()))
+
+
+if __name__ == "__main__":
+    main()
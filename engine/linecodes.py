@@ -0,0 +1,202 @@
+"""
+Ternary line codes and threat lookup tables.
+
+The nine cells centred on a point along one direction are encoded as a
+base-3 integer, cell k (offset k - 4) contributing digit * 3**k:
+
+    0 = empty, 1 = own stone, 2 = blocked (opponent stone or off the board)
+
+LINE_FLAGS[code] holds every pattern the line would contain if an own
+stone was placed on the centre, and LINE_CLASS[code] the strongest one,
+so classifying a point is one table index per direction. Walking along a
+line, the next code is one integer update: code // 3 + digit * 3**8.
+The tables take about 0.1s to build, so they are built on first use
+(line_flags() / line_class(), or the LINE_FLAGS / LINE_CLASS attributes)
+rather than when the module is imported.
+"""
+from typing import List, Optional
+
+EMPTY = '.'
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+SPAN = 4
+WIDTH = 2 * SPAN + 1
+TOP = 3 ** (WIDTH - 1)
+SIZE = 3 ** WIDTH
+
+# Pattern flags (a point can have several in the same direction)
+PAIR = 1 << 0          # an own stone right next to the point
+TWO = 1 << 1           # a five-cell window with two own stones and three empties
+SPLIT_THREE = 1 << 2   # .xx.x. / .x.xx.
+OPEN_THREE = 1 << 3    # .xxx.
+FOUR = 1 << 4          # a five-cell window one stone short of five
+OPEN_FOUR = 1 << 5     # .xxxx.
+FIVE = 1 << 6          # five or more in a row
+
+# Threat classes, weakest to strongest
+NONE, CLASS_TWO, CLASS_SPLIT_THREE, CLASS_OPEN_THREE, CLASS_FOUR, CLASS_OPEN_FOUR, CLASS_FIVE = range(7)
+CLASS_NAMES = ("none", "two", "split three", "open three", "four", "open four", "five")
+_CLASS_OF_FLAG = (
+    (FIVE, CLASS_FIVE),
+    (OPEN_FOUR, CLASS_OPEN_FOUR),
+    (FOUR, CLASS_FOUR),
+    (OPEN_THREE, CLASS_OPEN_THREE),
+    (SPLIT_THREE, CLASS_SPLIT_THREE),
+    (TWO, CLASS_TWO),
+)
+
+
+def _classify(code: int) -> int:
+    cells = []
+    for _ in range(WIDTH):
+        cells.append('.xo'[code % 3])
+        code //= 3
+    cells[SPAN] = 'x'
+    s = "".join(cells)
+
+    flags = 0
+    if s[SPAN - 1] == 'x' or s[SPAN + 1] == 'x':
+        flags |= PAIR
+    lo = SPAN
+    while lo > 0 and s[lo - 1] == 'x':
+        lo -= 1
+    hi = SPAN
+    while hi < WIDTH - 1 and s[hi + 1] == 'x':
+        hi += 1
+    if hi - lo + 1 >= 5:
+        flags |= FIVE
+    # Every window below contains the centre
+    for i in range(WIDTH - 5):
+        w6 = s[i:i + 6]
+        if w6 == '.xxxx.':
+            flags |= OPEN_FOUR
+        elif w6 in ('.xx.x.', '.x.xx.'):
+            flags |= SPLIT_THREE
+    for i in range(WIDTH - 4):
+        w5 = s[i:i + 5]
+        if w5 == '.xxx.':
+            flags |= OPEN_THREE
+        own, empty = w5.count('x'), w5.count('.')
+        if own == 4 and empty == 1:
+            flags |= FOUR
+        elif own == 2 and empty == 3:
+            flags |= TWO
+    return flags
+
+
+def _strongest(flags: int) -> int:
+    for flag, cls in _CLASS_OF_FLAG:
+        if flags & flag:
+            return cls
+    return NONE
+
+
+_LINE_FLAGS: Optional[List[int]] = None
+_LINE_CLASS: Optional[List[int]] = None
+
+
+def _build():
+    global _LINE_FLAGS, _LINE_CLASS
+    flags = [_classify(code) for code in range(SIZE)]
+    _LINE_CLASS = [_strongest(f) for f in flags]
+    _LINE_FLAGS = flags
+
+
+def line_flags() -> List[int]:
+    if _LINE_FLAGS is None:
+        _build()
+    return _LINE_FLAGS
+
+
+def line_class() -> List[int]:
+    if _LINE_CLASS is None:
+        _build()
+    return _LINE_CLASS
+
+
+# LINE_FLAGS / LINE_CLASS as module attributes, built on first access
+def __getattr__(name: str):
+    if name == "LINE_FLAGS":
+        return line_flags()
+    if name == "LINE_CLASS":
+        return line_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _digit(cell: str, ch: str) -> int:
+    if cell == EMPTY:
+        return 0
+    return 1 if cell == ch else 2
+
+
+# Code of the line through (row, col) along (dr, dc), from the point of view of `ch`
+def encode_at(board, row: int, col: int, ch: str, dr: int, dc: int) -> int:
+    n = len(board)
+    code = 0
+    weight = 1
+    for k in range(-SPAN, SPAN + 1):
+        r, c = row + k * dr, col + k * dc
+        if 0 <= r < n and 0 <= c < n:
+            cell = board[r][c]
+            if cell != EMPTY:
+                code += weight * (1 if cell == ch else 2)
+        else:
+            code += weight * 2
+        weight *= 3
+    return code
+
+
+# All pattern flags of (row, col) for `ch`, over the four directions
+def flags_at(board, row: int, col: int, ch: str) -> int:
+    table = _LINE_FLAGS or line_flags()
+    flags = 0
+    for dr, dc in DIRECTIONS:
+        flags |= table[encode_at(board, row, col, ch, dr, dc)]
+    return flags
+
+
+# Strongest threat class of (row, col) for `ch`
+def class_at(board, row: int, col: int, ch: str) -> int:
+    table = _LINE_CLASS or line_class()
+    best = NONE
+    for dr, dc in DIRECTIONS:
+        cls = table[encode_at(board, row, col, ch, dr, dc)]
+        if cls > best:
+            best = cls
+    return best
+
+
+# Codes for every cell of a line (a list of cell values), rolling one cell at a time
+def line_codes(cells: List[str], ch: str) -> List[int]:
+    length = len(cells)
+    digits = [2] * SPAN + [_digit(cell, ch) for cell in cells] + [2] * SPAN
+    code = 0
+    weight = 1
+    for k in range(WIDTH):
+        code += digits[k] * weight
+        weight *= 3
+    codes = [code]
+    for i in range(1, length):
+        code = code // 3 + digits[i + WIDTH - 1] * TOP
+        codes.append(code)
+    return codes
+
+
+def scan(board, ch: str) -> List[int]:
+    """Pattern flags of every empty cell for `ch` (row-major list of n*n ints, 0 for stones).
+
+    Lines shorter than five cells cannot hold a threat and are skipped, so
+    PAIR is only reported along lines of length five or more.
+    """
+    from .features import board_lines  # features imports tactics, which imports this module
+
+    table = _LINE_FLAGS or line_flags()
+    n = len(board)
+    lines, _ = board_lines(n)
+    flags = [0] * (n * n)
+    for cells in lines:
+        values = [board[r][c] for r, c in cells]
+        for (r, c), code in zip(cells, line_codes(values, ch)):
+            if board[r][c] == EMPTY:
+                flags[r * n + c] |= table[code]
+    return flags
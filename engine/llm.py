@@ -0,0 +1,176 @@
+"""
+Single-flight coalescing of identical LLM requests.
+
+Concurrent games (and pondering) often send byte-identical messages for
+the same position and colour. CoalescingClient wraps any client with an
+async complete(messages) (OpenAIGomokuClient) and keys in-flight requests
+by a hash of the model and the messages: the first caller sends the
+request, later callers with the same key wait on the same future and get
+the same response (or the same exception). Nothing is cached once the
+response has arrived.
+
+All wrappers share one SingleFlight by default, so two agents using the
+same model also coalesce.
+
+set_concurrency_limit(n) caps the number of requests in flight across
+every wrapped client, and engine.ratelimit.set_scheduler() paces them
+under per-model RPM / TPM limits. Time spent waiting for either is added
+to the QueueClock in `queue_clock`, if the caller's context has set one
+(the match runner uses this to keep queueing out of each game's clock).
+
+Every call is reported to the telemetry stream (engine.telemetry), when
+one is configured, as an llm_request and an llm_response event.
+
+    self.llm_client = coalesce(OpenAIGomokuClient(model=..., api_key=..., endpoint=...))
+"""
+import asyncio
+import hashlib
+import json
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from .ratelimit import CHARS_PER_TOKEN, estimate_tokens, get_scheduler
+from .telemetry import get_telemetry, move_stats
+
+
+def request_key(model: Optional[str], messages) -> str:
+    payload = json.dumps([model, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FlightStats:
+    calls: int = 0       # complete() calls made by agents
+    sent: int = 0        # requests actually sent
+    coalesced: int = 0   # calls answered by a request already in flight
+    errors: int = 0
+
+    @property
+    def saved_rate(self) -> float:
+        return self.coalesced / self.calls if self.calls else 0.0
+
+
+class SingleFlight:
+    """At most one in-flight call per key; later callers share its result."""
+
+    def __init__(self):
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.stats = FlightStats()
+
+    async def do(self, key: str, call: Callable[[], Awaitable]):
+        self.stats.calls += 1
+        future = self.pending.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self.stats.coalesced += 1
+            return await asyncio.shield(future)
+
+        # The call runs as its own task, so a cancelled caller does not cancel the others
+        self.stats.sent += 1
+        future = asyncio.ensure_future(call())
+        self.pending[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return await asyncio.shield(future)
+
+    def _done(self, key: str, future: asyncio.Future):
+        if self.pending.get(key) is future:
+            del self.pending[key]
+        if not future.cancelled() and future.exception() is not None:
+            self.stats.errors += 1
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"LLM single-flight: {s.calls} calls, {s.sent} sent, "
+                f"{s.coalesced} coalesced ({s.saved_rate:.0%} saved), {s.errors} errors")
+
+
+_flight: Optional[SingleFlight] = None
+
+
+def shared_flight() -> SingleFlight:
+    global _flight
+    if _flight is None:
+        _flight = SingleFlight()
+    return _flight
+
+
+@dataclass
+class QueueClock:
+    queued: float = 0.0  # seconds spent waiting for a request slot
+
+
+queue_clock: ContextVar[Optional[QueueClock]] = ContextVar("queue_clock", default=None)
+
+_limit: Optional[asyncio.Semaphore] = None
+
+
+# Cap on concurrent requests over all wrapped clients (None: unlimited)
+def set_concurrency_limit(limit: Optional[int]):
+    global _limit
+    _limit = asyncio.Semaphore(limit) if limit else None
+
+
+# Wait for the rate-limit scheduler (engine.ratelimit) and a request slot, then send
+async def _limited(client, messages):
+    scheduler = get_scheduler()
+    limit = _limit
+    if scheduler is None and limit is None:
+        return await client.complete(messages)
+    start = time.perf_counter()
+    if scheduler is not None:
+        await scheduler.acquire(getattr(client, "model", None) or "default", estimate_tokens(messages))
+    if limit is not None:
+        await limit.acquire()
+    try:
+        clock = queue_clock.get()
+        if clock is not None:
+            clock.queued += time.perf_counter() - start
+        return await client.complete(messages)
+    finally:
+        if limit is not None:
+            limit.release()
+
+
+class CoalescingClient:
+    """Wraps an LLM client; identical concurrent complete() calls share one request."""
+
+    def __init__(self, client, flight: Optional[SingleFlight] = None):
+        self.client = client
+        self.flight = flight or shared_flight()
+
+    async def complete(self, messages):
+        # Without a model name, only calls through this client are coalesced
+        model = getattr(self.client, "model", None) or f"client-{id(self.client)}"
+        key = request_key(model, messages)
+        telemetry = get_telemetry()
+        stats = move_stats.get()
+        if telemetry is None and stats is None:
+            return await self.flight.do(key, lambda: _limited(self.client, messages))
+        if stats is not None:
+            stats.llm_calls += 1
+            stats.prompt_tokens += estimate_tokens(messages, completion_tokens=0)
+        if telemetry is not None:
+            telemetry.emit("llm_request", model=model, key=key[:12], tokens=estimate_tokens(messages))
+        start = time.perf_counter()
+        try:
+            response = await self.flight.do(key, lambda: _limited(self.client, messages))
+        except BaseException as e:
+            if telemetry is not None:
+                telemetry.emit("llm_response", model=model, key=key[:12], seconds=time.perf_counter() - start,
+                               error=(str(e) or type(e).__name__)[:200])
+            raise
+        chars = len(response) if isinstance(response, str) else 0
+        if stats is not None:
+            stats.completion_tokens += chars // CHARS_PER_TOKEN
+        if telemetry is not None:
+            telemetry.emit("llm_response", model=model, key=key[:12], seconds=time.perf_counter() - start,
+                           chars=chars)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def coalesce(client, flight: Optional[SingleFlight] = None) -> CoalescingClient:
+    return client if isinstance(client, CoalescingClient) else CoalescingClient(client, flight)
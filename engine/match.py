@@ -0,0 +1,269 @@
+"""
+Asyncio match runner: many games at once in one event loop.
+
+Games are LLM-bound, so instead of one process per game the runner drives
+every game as a coroutine that awaits each agent's `get_move` directly.
+A global cap on in-flight LLM requests (engine.llm.set_concurrency_limit)
+keeps the endpoint within its concurrency, and each game's clock only
+counts thinking time: time spent queueing for a request slot is measured
+by engine.llm and subtracted from the move's time. With --rpm / --tpm,
+requests are also paced by engine.ratelimit, most urgent game first.
+The clock is wall time, so it is only fair while no game holds the loop:
+agents run their searches, solver and tablebase probes on worker threads
+(engine.timeman.offload), where each stays within its own time limit.
+
+Agents are loaded from their directories (agent.json "agent_class") and
+a fresh instance is made for every game. Games are written in the same
+JSON layout as runs/*.json when --out is given.
+
+    python -m engine.match agent1 agent2 --games 24 --concurrency 24 --llm-limit 8 --out runs/arena
+"""
+import argparse
+import asyncio
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import List, Optional, Tuple
+
+from .llm import QueueClock, queue_clock, set_concurrency_limit, shared_flight
+from .ratelimit import RateLimitScheduler, get_scheduler, move_deadline, set_scheduler
+from .tactics import EMPTY, makes_five
+from .telemetry import MoveStats, emit, move_stats
+
+try:
+    from gomoku.core.models import Player
+except ImportError:  # the runner itself does not need the framework
+    class Player(Enum):
+        BLACK = 'X'
+        WHITE = 'O'
+
+
+@dataclass
+class PlayedMove:
+    row: int
+    col: int
+    player: Player
+
+
+class MatchState:
+    """The parts of the framework's GameState that the agents use."""
+
+    def __init__(self, board_size: int = 8):
+        self.board_size = board_size
+        self.board = [[EMPTY] * board_size for _ in range(board_size)]
+        self.current_player = Player.BLACK
+        self.move_history: List[PlayedMove] = []
+
+    def is_valid_move(self, row: int, col: int) -> bool:
+        n = self.board_size
+        return 0 <= row < n and 0 <= col < n and self.board[row][col] == EMPTY
+
+    def get_legal_moves(self) -> List[Tuple[int, int]]:
+        n = self.board_size
+        return [(r, c) for r in range(n) for c in range(n) if self.board[r][c] == EMPTY]
+
+    def format_board(self, formatter: str = "standard") -> str:
+        n = self.board_size
+        lines = ["  " + "".join(f"{c:3d}" for c in range(n)) + " "]
+        for r in range(n):
+            lines.append(f"{r:2d}" + "".join(f"  {cell}" for cell in self.board[r]) + " ")
+        return "\n".join(lines) + "\n"
+
+    # Copy handed to the agents, so they cannot change the game's board
+    def snapshot(self) -> "MatchState":
+        state = MatchState(self.board_size)
+        state.board = [row[:] for row in self.board]
+        state.current_player = self.current_player
+        state.move_history = list(self.move_history)
+        return state
+
+    def play(self, row: int, col: int):
+        self.board[row][col] = self.current_player.value
+        self.move_history.append(PlayedMove(row, col, self.current_player))
+        self.current_player = Player.WHITE if self.current_player == Player.BLACK else Player.BLACK
+
+
+@dataclass
+class GameRecord:
+    game_id: int
+    black: str
+    white: str
+    winner: Optional[str] = None
+    reason: str = ""
+    moves: List[dict] = field(default_factory=list)
+    final_board: List[List[str]] = field(default_factory=list)
+    thinking: float = 0.0   # seconds charged to the agents' clocks
+    queued: float = 0.0     # seconds spent waiting for an LLM slot
+    wall: float = 0.0
+
+    def to_log(self, board_size: int, time_limit: float) -> dict:
+        """The game in the layout of runs/*.json."""
+        if self.winner is None:
+            result, code, loser = "draw", "D", None
+        elif self.winner == self.black:
+            result, code, loser = "black_win", "BW", self.white
+        else:
+            result, code, loser = "white_win", "WW", self.black
+        history = "\n".join(f"{i + 1}. {'Black(X)' if i % 2 == 0 else 'White(O)'}: ({m['position'][0]}, {m['position'][1]})"
+                            for i, m in enumerate(self.moves))
+        return {
+            "game_metadata": {"agent1": self.black, "agent2": self.white, "board_size": board_size,
+                              "time_limit": time_limit, "timestamp": time.time()},
+            "game_result": {"winner": self.winner, "loser": loser, "result": result, "result_code": code,
+                            "reason": self.reason, "moves": len(self.moves), "game_log": self.moves,
+                            "final_board": self.final_board, "move_history": history,
+                            "total_time": self.thinking, "queued_time": self.queued},
+        }
+
+
+# Agent class named by agent.json in `agent_dir`
+def load_agent_class(agent_dir: str):
+    with open(os.path.join(agent_dir, "agent.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    module_name, class_name = config["agent_class"].rsplit(".", 1)
+    path = os.path.join(agent_dir, module_name + ".py")
+    unique = f"_match_{os.path.basename(os.path.abspath(agent_dir))}_{module_name}"
+    module = sys.modules.get(unique)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(unique, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[unique] = module
+        spec.loader.exec_module(module)
+    return getattr(module, class_name), config.get("name", class_name)
+
+
+async def play_game(game_id: int, black, white, names: Tuple[str, str],
+                    board_size: int = 8, time_limit: float = 30.0) -> GameRecord:
+    """Play one game; an illegal move or an over-time move loses it."""
+    clock = QueueClock()
+    queue_clock.set(clock)
+    state = MatchState(board_size)
+    record = GameRecord(game_id, names[0], names[1])
+    start = time.perf_counter()
+    agents = {Player.BLACK: (black, names[0]), Player.WHITE: (white, names[1])}
+    black.player, white.player = Player.BLACK, Player.WHITE
+
+    while True:
+        me = state.current_player
+        agent, name = agents[me]
+        queued = clock.queued
+        t0 = time.perf_counter()
+        # Rate-limited requests are served earliest deadline first
+        move_deadline.set(time.monotonic() + time_limit)
+        stats = MoveStats()
+        move_stats.set(stats)
+        try:
+            row, col = await agent.get_move(state.snapshot())
+            error = None
+        except Exception as e:
+            row, col, error = -1, -1, e
+        waited = clock.queued - queued
+        spent = time.perf_counter() - t0 - waited
+        record.thinking += spent
+        illegal = error is not None or not state.is_valid_move(row, col)
+        record.moves.append({"move_number": len(record.moves) + 1, "player": name, "position": [row, col],
+                             "time": spent, "queued": waited, "illegal": illegal, "fallback": stats.fallback,
+                             "llm_calls": stats.llm_calls, "prompt_tokens": stats.prompt_tokens,
+                             "completion_tokens": stats.completion_tokens})
+        opponent = agents[Player.WHITE if me == Player.BLACK else Player.BLACK][1]
+        if illegal:
+            record.winner, record.reason = opponent, f"Illegal move by {name}" + (f": {error}" if error else "")
+            break
+        if spent > time_limit:
+            record.winner, record.reason = opponent, f"{name} exceeded the time limit"
+            break
+        wins = makes_five(state.board, row, col, me.value)
+        state.play(row, col)
+        if wins:
+            record.winner, record.reason = name, "Five in a row"
+            break
+        if not state.get_legal_moves():
+            record.reason = "Board full"
+            break
+
+    record.final_board = [row[:] for row in state.board]
+    record.queued = clock.queued
+    emit("game", game=game_id, black=names[0], white=names[1], winner=record.winner, reason=record.reason,
+         moves=len(record.moves))
+    for agent in (black, white):
+        await end_game(agent)
+    record.wall = time.perf_counter() - start
+    return record
+
+
+# Run the agent's end-game hook, if it has one (sync or async)
+async def end_game(agent):
+    hook = getattr(agent, "end_game", None)
+    if hook is None:
+        return
+    try:
+        result = hook()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        print(f"🚫 end_game failed for {getattr(agent, 'agent_id', agent)}: {e}")
+
+
+async def run_match(agent_dirs: Tuple[str, str], games: int, concurrency: int = 16,
+                    llm_limit: Optional[int] = 8, board_size: int = 8,
+                    time_limit: float = 30.0) -> List[GameRecord]:
+    """Play `games` games (colours alternating), at most `concurrency` at a time."""
+    set_concurrency_limit(llm_limit)
+    classes = [load_agent_class(d) for d in agent_dirs]
+    running = asyncio.Semaphore(concurrency)
+
+    async def one(game_id: int) -> GameRecord:
+        a, b = (0, 1) if game_id % 2 == 0 else (1, 0)
+        async with running:
+            (cls_a, name_a), (cls_b, name_b) = classes[a], classes[b]
+            black = cls_a(f"{name_a}-{game_id}")
+            white = cls_b(f"{name_b}-{game_id}")
+            return await play_game(game_id, black, white, (name_a, name_b), board_size, time_limit)
+
+    return await asyncio.gather(*(one(i) for i in range(games)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many games concurrently in one event loop.")
+    parser.add_argument("agents", nargs=2, help="two agent directories (with agent.json)")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16, help="games in progress at once")
+    parser.add_argument("--llm-limit", type=int, default=8, help="LLM requests in flight at once (0: no limit)")
+    parser.add_argument("--board-size", type=int, default=8)
+    parser.add_argument("--time-limit", type=float, default=30.0)
+    parser.add_argument("--out", default=None, help="directory for runs-style JSON logs")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute per model (0: no pacing)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute per model")
+    args = parser.parse_args(argv)
+    if args.rpm or args.tpm:
+        set_scheduler(RateLimitScheduler({}, default=(args.rpm or 10 ** 6, args.tpm or 10 ** 9)))
+
+    start = time.perf_counter()
+    records = asyncio.run(run_match(tuple(args.agents), args.games, args.concurrency,
+                                    args.llm_limit or None, args.board_size, args.time_limit))
+    elapsed = time.perf_counter() - start
+
+    wins = {}
+    for record in records:
+        wins[record.winner] = wins.get(record.winner, 0) + 1
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            path = os.path.join(args.out, f"game-{record.game_id:04d}_{record.black}_{record.white}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(record.to_log(args.board_size, args.time_limit), f, indent=2)
+    moves = sum(len(r.moves) for r in records)
+    print(f"{len(records)} games, {moves} moves in {elapsed:.1f}s ({len(records) / elapsed * 60:.1f} games/min)")
+    print("Results: " + ", ".join(f"{k or 'draw'} {v}" for k, v in sorted(wins.items(), key=lambda kv: str(kv[0]))))
+    print(f"Thinking {sum(r.thinking for r in records):.1f}s, queued for LLM {sum(r.queued for r in records):.1f}s")
+    print(shared_flight().summary())
+    if get_scheduler() is not None:
+        print(get_scheduler().summary())
+
+
+if __name__ == "__main__":
+    main()
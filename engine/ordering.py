@@ -0,0 +1,87 @@
+"""
+Move ordering for alpha-beta search.
+
+Candidates are ranked in this order:
+  1. the transposition-table move,
+  2. immediate wins, then forced blocks (from the tactical scanners),
+  3. killer moves for the current ply,
+  4. the policy network's prior, when the caller passes priors (root only),
+  5. the history-heuristic score, which persists across the moves of a game,
+and finally by adjacency / centre distance, as in YSV7._sort_moves.
+"""
+from typing import Dict, List, Optional
+
+from .board import SearchBoard
+
+TT_SCORE = 1 << 40
+WIN_SCORE = 1 << 36
+BLOCK_SCORE = 1 << 32
+KILLER_SCORE = 1 << 28
+PRIOR_SCALE = 1 << 27
+HISTORY_CAP = 1 << 18
+
+
+class MoveOrderer:
+    """Orders flat move indices on a SearchBoard."""
+
+    def __init__(self, board_size: int = 8, max_ply: int = 64, killers_per_ply: int = 2):
+        self.board_size = board_size
+        self.max_ply = max_ply
+        self.killers_per_ply = killers_per_ply
+        self.killers: List[List[Optional[int]]] = []
+        self.history: List[int] = []
+        self.reset()
+
+    # Forget everything (call when a new game starts)
+    def reset(self, board_size: Optional[int] = None):
+        if board_size is not None:
+            self.board_size = board_size
+        n = self.board_size
+        self.killers = [[None] * self.killers_per_ply for _ in range(self.max_ply)]
+        self.history = [0] * (n * n)
+
+    # Called at the start of every search: killers are per search, history is
+    # kept but aged so that old cutoffs slowly lose their weight
+    def new_search(self):
+        self.killers = [[None] * self.killers_per_ply for _ in range(self.max_ply)]
+        history = self.history
+        for i in range(len(history)):
+            history[i] >>= 1
+
+    # Record a move that caused a beta cutoff
+    def record_cutoff(self, move: int, ply: int, depth: int):
+        if ply < self.max_ply:
+            slots = self.killers[ply]
+            if slots[0] != move:
+                slots.pop()
+                slots.insert(0, move)
+        self.history[move] = min(HISTORY_CAP, self.history[move] + depth * depth)
+
+    def order(self, board: SearchBoard, moves: List[int], ply: int,
+              tt_move: Optional[int] = None, priors: Optional[Dict[int, float]] = None) -> List[int]:
+        colour = board.side
+        rival = 3 - colour
+        n = board.n
+        center = n // 2
+        killers = self.killers[ply] if ply < self.max_ply else []
+        history = self.history
+
+        def score(move: int) -> int:
+            if move == tt_move:
+                return TT_SCORE
+            if board.makes_five(move, colour):
+                return WIN_SCORE
+            if board.makes_five(move, rival):
+                return BLOCK_SCORE
+            s = 0
+            if move in killers:
+                s += KILLER_SCORE - killers.index(move)
+            if priors:
+                s += int(priors.get(move, 0.0) * PRIOR_SCALE)
+            s += history[move] * 256
+            # Tie-break like YSV7._sort_moves: own neighbours, then centre distance
+            r, c = divmod(move, n)
+            s += board.own_neighbours(move, colour) * 16 - ((r - center) ** 2 + (c - center) ** 2)
+            return s
+
+        return sorted(moves, key=score, reverse=True)
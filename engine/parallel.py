@@ -0,0 +1,314 @@
+"""
+Lazy SMP: parallel root search over a shared transposition table.
+
+Every worker process searches the same root position with its own
+Searcher; they only cooperate through one transposition table held in
+multiprocessing.shared_memory, so a line refuted by one worker is cut
+short for the others. Odd workers start one ply deeper than even ones,
+which spreads them over different parts of the tree.
+
+The table is lock-free: each slot holds (key ^ data, data) as two 64-bit
+words and a reader only trusts the data when the XOR gives back its key,
+so a slot torn by two concurrent writers reads as a miss.
+
+Workers are spawned (not forked: the searcher runs next to executor
+threads and locks that a fork would copy mid-use) by start(), which
+agents call while setting up, on the main thread; search() starts them
+itself if needed. They are reused for every move after that (and across
+games), and search() returns the deepest completed iteration reported by
+any worker before the deadline.
+
+Every ParallelSearcher owns its pool and its shared table: N agents with
+W workers each (N concurrent games in engine.match) run N * W processes
+and N tables of 16 * 2**tt_bits bytes. Keep W * N near the core count.
+
+    searcher = ParallelSearcher(workers=4)
+    result = searcher.search(board, 'X', max_depth=8, time_limit=2.0)
+    searcher.close()
+
+search() blocks while the workers run; async agents call it through
+engine.timeman.TimeManager.search_async(), which waits on a thread.
+
+The benchmark searches positions from game logs with a single Searcher
+and with the pool, at the same time limit, and reports the depth reached,
+the nodes per second and the longest stall of an event loop awaiting the
+search (the workers only help with more cores than processes):
+
+    python -m engine.parallel --logs runs --workers 4 --time-limit 2
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+from .search import Searcher, SearchResult, SearchStats
+
+_SCORE_BITS = 24
+_SCORE_OFFSET = 1 << (_SCORE_BITS - 1)
+_VALID = 1 << 50
+_MASK64 = (1 << 64) - 1
+
+
+class SharedTT:
+    """Fixed-size, lock-free transposition table in shared memory (2**bits slots).
+
+    Entries are the Searcher's (depth, score, flag, move) tuples; a newer entry
+    for the same slot always replaces the old one.
+    """
+
+    def __init__(self, bits: int = 18, name: Optional[str] = None):
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        nbytes = (1 << bits) * 16
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.shm.buf[:nbytes] = bytes(nbytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.nbytes = nbytes
+        self.slots = self.shm.buf[:nbytes].cast('Q')
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @staticmethod
+    def _pack(entry) -> int:
+        depth, score, flag, move = entry
+        return ((score + _SCORE_OFFSET) | (depth & 0xFF) << 24 | flag << 32
+                | (0 if move is None else move + 1) << 34 | _VALID)
+
+    @staticmethod
+    def _unpack(data: int):
+        move = (data >> 34) & 0xFFFF
+        return ((data >> 24) & 0xFF, (data & 0xFFFFFF) - _SCORE_OFFSET,
+                (data >> 32) & 0x3, move - 1 if move else None)
+
+    def get(self, key: int, default=None):
+        i = (key & self.mask) << 1
+        check = self.slots[i]
+        data = self.slots[i + 1]
+        if data and check ^ data == key:
+            return self._unpack(data)
+        return default
+
+    def __setitem__(self, key: int, entry):
+        i = (key & self.mask) << 1
+        data = self._pack(entry)
+        self.slots[i] = (key ^ data) & _MASK64
+        self.slots[i + 1] = data
+
+    def __len__(self) -> int:
+        return 1 << self.bits
+
+    def clear(self):
+        self.shm.buf[:self.nbytes] = bytes(self.nbytes)
+
+    def close(self):
+        self.slots.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(worker_id: int, shm_name: str, bits: int, tasks, results):
+    table = SharedTT(bits, name=shm_name)
+    searcher = Searcher(tt=table)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task == "new_game":
+            searcher.orderer.reset(searcher.board_size)
+            continue
+        search_id, board, ch, max_depth, time_limit = task
+        start_depth = 1 + worker_id % 2
+
+        def report(depth, move, score):
+            results.put((search_id, worker_id, depth, move, score, searcher._stats.nodes, False))
+
+        try:
+            result = searcher.search(board, ch, max_depth=max(max_depth, start_depth),
+                                     time_limit=time_limit, start_depth=start_depth, on_depth=report)
+            results.put((search_id, worker_id, result.stats.depth, result.move, result.score,
+                         result.stats.nodes, True))
+        except Exception as e:
+            print(f"🚫 Search worker {worker_id} error: {e}")
+            results.put((search_id, worker_id, 0, None, 0, 0, True))
+    table.close()
+
+
+class ParallelSearcher:
+    """Drop-in replacement for Searcher.search() backed by a pool of worker processes."""
+
+    def __init__(self, workers: Optional[int] = None, tt_bits: int = 18):
+        self.workers = workers or os.cpu_count() or 1
+        self.tt_bits = tt_bits
+        self.last_stats: Optional[SearchStats] = None
+        self._table: Optional[SharedTT] = None
+        self._procs = []
+        self._tasks = []
+        self._results = None
+        self._search_id = 0
+
+    # Spawn the worker processes and the shared table (once)
+    def start(self):
+        if self._procs:
+            return
+        ctx = mp.get_context("spawn")
+        self._table = SharedTT(self.tt_bits)
+        self._results = ctx.Queue()
+        for i in range(self.workers):
+            tasks = ctx.Queue()
+            proc = ctx.Process(target=_worker_main, daemon=True,
+                               args=(i, self._table.name, self.tt_bits, tasks, self._results))
+            proc.start()
+            self._procs.append(proc)
+            self._tasks.append(tasks)
+
+    # Reset per-game state: the shared table and every worker's history
+    def new_game(self):
+        if not self._procs:
+            return
+        self._table.clear()
+        for tasks in self._tasks:
+            tasks.put("new_game")
+
+    def search(self, board, ch: str, max_depth: int = 8, time_limit: Optional[float] = 2.0,
+               on_depth: Optional[Callable[[int, Optional[Tuple[int, int]], int], None]] = None) -> SearchResult:
+        """Deepest result before the deadline; `on_depth` sees every new deepest iteration."""
+        self.start()
+        start = time.perf_counter()
+        limit = time_limit or 3600.0
+        deadline = start + limit
+        self._search_id += 1
+        search_id = self._search_id
+        for tasks in self._tasks:
+            tasks.put((search_id, board, ch, max_depth, limit))
+
+        best: Tuple[int, Optional[Tuple[int, int]], int] = (0, None, 0)
+        nodes = [0] * self.workers
+        finished = 0
+        while finished < self.workers:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                sid, worker, depth, move, score, worker_nodes, done = self._results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if sid != search_id:
+                continue  # late report from an earlier move
+            nodes[worker] = worker_nodes
+            finished += done
+            if move is not None and depth > best[0]:
+                best = (depth, move, score)
+                if on_depth is not None:
+                    on_depth(depth, move, score)
+
+        depth, move, score = best
+        stats = SearchStats(nodes=sum(nodes), depth=depth, elapsed=time.perf_counter() - start)
+        self.last_stats = stats
+        return SearchResult(move, score, stats)
+
+    def close(self):
+        for tasks in self._tasks:
+            tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=2.0)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs, self._tasks = [], []
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# ===== Benchmark =====
+
+async def _loop_stall(search) -> float:
+    """Longest gap of a 10ms ticker while `search` is awaited on a thread."""
+    loop = asyncio.get_running_loop()
+    stall, done = 0.0, False
+
+    async def tick():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            stall = max(stall, now - last - 0.01)
+            last = now
+
+    ticker = asyncio.ensure_future(tick())
+    await loop.run_in_executor(None, search)
+    done = True
+    await ticker
+    return stall
+
+
+def benchmark(positions, workers: int, time_limit: float, max_depth: int = 8) -> dict:
+    """Mean depth, nodes per second and event-loop stall per search, single against the pool."""
+    from .search import Searcher
+    results = {}
+    for name, searcher in (("single", Searcher()), (f"{workers} workers", ParallelSearcher(workers))):
+        if isinstance(searcher, ParallelSearcher):
+            searcher.start()
+        depth = nodes = elapsed = stall = 0.0
+        for board, ch in positions:
+            searcher.new_game()
+            found = []
+            stall = max(stall, asyncio.run(_loop_stall(
+                lambda: found.append(searcher.search(board, ch, max_depth=max_depth, time_limit=time_limit)))))
+            stats = found[0].stats
+            depth += stats.depth
+            nodes += stats.nodes
+            elapsed += stats.elapsed
+        if isinstance(searcher, ParallelSearcher):
+            searcher.close()
+        results[name] = {"depth": depth / len(positions), "nps": nodes / max(elapsed, 1e-9), "stall": stall}
+    return results
+
+
+def main(argv=None):
+    from .records import decode_board, iter_game_logs, log_records
+
+    parser = argparse.ArgumentParser(description="Benchmark Lazy SMP against a single-threaded search.")
+    parser.add_argument("--logs", action="append", default=[])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--time-limit", type=float, default=2.0)
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--min-ply", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    positions = []
+    for path in args.logs or ["runs"]:
+        for log in iter_game_logs(path):
+            for record in log_records(log):
+                if record["ply"] >= args.min_ply and len(positions) < args.positions:
+                    positions.append((decode_board(record["board"]), record["to_move"]))
+    if not positions:
+        raise SystemExit("No positions found")
+
+    print(f"{len(positions)} positions, {args.time_limit}s per search, {os.cpu_count()} CPUs")
+    results = benchmark(positions, args.workers, args.time_limit)
+    for name, row in results.items():
+        print(f"{name:<12} depth {row['depth']:.2f}, {row['nps']:.0f} nps, event loop stalled {row['stall']:.2f}s")
+    single, pool = results["single"], results[f"{args.workers} workers"]
+    print(f"✅ {pool['nps'] / max(single['nps'], 1):.2f}x nodes per second, "
+          f"{pool['depth'] - single['depth']:+.2f} plies")
+
+
+if __name__ == "__main__":
+    main()
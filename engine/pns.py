@@ -0,0 +1,382 @@
+"""
+Depth-first proof-number (df-pn) solver.
+
+The solver tries to prove that `attacker` can force five in a row from a
+position. OR nodes have the attacker to move, AND nodes the defender.
+Moves come from the line-code threat flags:
+
+  vcf   the attacker only plays fours; the defender must block the five
+  vct   the attacker also plays open / split threes; the defender answers
+        on the attacker's threat cells or with a four of its own
+  full  every empty cell on both sides (exact, for late positions)
+
+"proven" means the attacker wins by force, "disproven" that no forced win
+exists within the mode (for full, that the attacker cannot win at all).
+
+Proof and disproof numbers live in a ProofCache: a bounded in-memory LRU
+keyed by the position hash (side to move, attacker and mode included).
+The hash is the Zobrist hash of the position's canonical image
+(engine.symmetry), so mirrored and rotated positions share entries.
+Solved entries are also written to an SQLite file, so entries evicted
+from memory, and results from earlier games, are found again on disk.
+
+shared_solver() gives every thread its own Solver over one shared,
+locked ProofCache, so agents can solve on worker threads
+(engine.timeman.offload) while other games play in the event loop.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .board import COLOUR, SearchBoard
+from .linecodes import FIVE, FOUR, OPEN_FOUR, OPEN_THREE, SPLIT_THREE
+
+INF = 1 << 30
+MODES = ("vcf", "vct", "full")
+FULL_WIDTH_EMPTIES = 12
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "proofs.sqlite")
+
+# Mixed into the position hash so that different questions never share entries
+_MODE_KEYS = {"vcf": 0x5BD1E9955BD1E995, "vct": 0x9E3779B97F4A7C15, "full": 0xC2B2AE3D27D4EB4F}
+_ATTACKER_KEYS = {1: 0x165667B19E3779F9, 2: 0x27D4EB2F165667C5}
+
+PROVEN, DISPROVEN, UNKNOWN = "proven", "disproven", "unknown"
+
+# Memory of one cached entry: the key, the (pn, dn, depth) tuple and its ints,
+# and the OrderedDict slot (measured with tracemalloc)
+ENTRY_BYTES = 270
+
+
+class _Budget(Exception):
+    pass
+
+
+def _signed(key: int) -> int:
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class ProofCache:
+    """Bounded proof / disproof number store with solved entries spilled to disk."""
+
+    def __init__(self, max_entries: int = 200_000, path: Optional[str] = DEFAULT_CACHE,
+                 max_bytes: Optional[int] = None):
+        self.max_entries = min(max_entries, max_bytes // ENTRY_BYTES) if max_bytes else max_entries
+        self.path = path
+        self.mem: "OrderedDict[int, Tuple[int, int, int]]" = OrderedDict()
+        self.pending: List[Tuple[int, int, int, int]] = []
+        self.disk_hits = 0
+        self.evictions = 0
+        self._db = None
+        self._db_failed = False
+        self._lock = threading.RLock()   # solvers on several threads share the cache
+
+    def _conn(self):
+        if self._db is None and self.path and not self._db_failed:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("CREATE TABLE IF NOT EXISTS proofs "
+                                 "(key INTEGER PRIMARY KEY, pn INTEGER, dn INTEGER, depth INTEGER)")
+            except sqlite3.Error as e:
+                print(f"⚠️ Proof cache on disk disabled: {e}")
+                self._db_failed = True
+                self._db = None
+        return self._db
+
+    def get(self, key: int) -> Optional[Tuple[int, int, int]]:
+        entry = self.mem.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute("SELECT pn, dn, depth FROM proofs WHERE key = ?", (_signed(key),)).fetchone()
+            if row is None:
+                return None
+            self.disk_hits += 1
+            entry = (row[0], row[1], row[2])
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key: int, pn: int, dn: int, depth: int):
+        entry = (pn, dn, depth)
+        with self._lock:
+            if (pn == 0 or dn == 0) and self.mem.get(key) != entry:
+                self.pending.append((_signed(key), pn, dn, depth))
+            self._remember(key, entry)
+
+    def _remember(self, key: int, entry: Tuple[int, int, int]):
+        mem = self.mem
+        mem[key] = entry
+        mem.move_to_end(key)
+        while len(mem) > self.max_entries:
+            mem.popitem(last=False)
+            self.evictions += 1
+
+    # Write solved entries to disk
+    def flush(self):
+        with self._lock:
+            if not self.pending:
+                return
+            db = self._conn()
+            if db is not None:
+                try:
+                    with db:
+                        db.executemany("INSERT OR REPLACE INTO proofs VALUES (?, ?, ?, ?)", self.pending)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Proof cache write failed: {e}")
+            self.pending = []
+
+    def clear_memory(self):
+        with self._lock:
+            self.mem.clear()
+
+    def __len__(self) -> int:
+        return len(self.mem)
+
+    def nbytes(self) -> int:
+        return len(self.mem) * ENTRY_BYTES
+
+    # Evict least recently used entries until the cache fits in `max_bytes`
+    def trim(self, max_bytes: int) -> int:
+        with self._lock:
+            before = len(self.mem)
+            self.flush()
+            while len(self.mem) > max_bytes // ENTRY_BYTES:
+                self.mem.popitem(last=False)
+                self.evictions += 1
+            return (before - len(self.mem)) * ENTRY_BYTES
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+@dataclass
+class SolveResult:
+    status: str
+    move: Optional[Tuple[int, int]]  # best move for the side to move, if solved
+    depth: int                       # plies to the attacker's five, if proven
+    nodes: int
+    elapsed: float
+
+
+class Solver:
+
+    def __init__(self, cache: Optional[ProofCache] = None, max_nodes: int = 100_000):
+        self.cache = cache if cache is not None else ProofCache()
+        self.max_nodes = max_nodes
+        self.nodes = 0
+
+    def solve(self, board, to_move: str, attacker: Optional[str] = None, mode: str = "vct",
+              time_limit: Optional[float] = None, max_nodes: Optional[int] = None) -> SolveResult:
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        start = time.perf_counter()
+        self._sb = SearchBoard.from_rows(board, to_move)
+        self._sb.track_symmetry()
+        self._attacker = COLOUR[attacker or to_move]
+        self._mode = mode
+        self._salt = _MODE_KEYS[mode] ^ _ATTACKER_KEYS[self._attacker]
+        self._deadline = start + time_limit if time_limit else None
+        self._limit = max_nodes or self.max_nodes
+        self.nodes = 0
+
+        try:
+            self._mid(INF - 1, INF - 1)
+        except _Budget:
+            pass
+        finally:
+            self.cache.flush()
+
+        pn, dn, depth = self._lookup(self._key())
+        if pn == 0:
+            status = PROVEN
+        elif dn == 0:
+            status = DISPROVEN
+        else:
+            status = UNKNOWN
+        move = self._best_root_move(status)
+        return SolveResult(status, move, depth if status == PROVEN else 0, self.nodes, time.perf_counter() - start)
+
+    # ===== Tree =====
+    # Proof numbers are the same in the eight images of a position: they share one key
+    def _key(self, child: Optional[int] = None) -> int:
+        sb = self._sb
+        side = sb.side if child is None else 3 - sb.side
+        h = sb.canonical_hash(child)
+        if side == 2:
+            h ^= sb.geo.side_key
+        return h ^ self._salt
+
+    def _lookup(self, key: int) -> Tuple[int, int, int]:
+        entry = self.cache.get(key)
+        return entry if entry is not None else (1, 1, 0)
+
+    # (moves, None) for an interior node, or ([], (pn, dn, depth)) for a solved one
+    def _expand(self) -> Tuple[List[int], Optional[Tuple[int, int, int]]]:
+        sb = self._sb
+        me = sb.side
+        other = 3 - me
+        is_or = me == self._attacker
+        empties = [i for i, v in enumerate(sb.cells) if v == 0]
+        if not empties:
+            return [], (INF, 0, 0)
+
+        mine, theirs = {}, {}
+        for i in empties:
+            mine[i] = sb.flags(i, me)
+            theirs[i] = sb.flags(i, other)
+
+        # The side to move wins on the spot
+        if any(f & FIVE for f in mine.values()):
+            return [], ((0, INF, 1) if is_or else (INF, 0, 0))
+        threats = [i for i in empties if theirs[i] & FIVE]
+        if len(threats) >= 2:
+            return [], ((INF, 0, 0) if is_or else (0, INF, 2))
+        if threats:
+            return threats, None
+
+        mode = self._mode
+        if mode == "full":
+            moves = empties
+        elif is_or:
+            wanted = FOUR if mode == "vcf" else FOUR | OPEN_THREE | SPLIT_THREE
+            moves = [i for i in empties if mine[i] & wanted]
+        else:
+            # The attacker has no five threat: only an open three keeps the initiative
+            if mode == "vcf" or not any(f & OPEN_FOUR for f in theirs.values()):
+                return [], (INF, 0, 0)
+            moves = [i for i in empties if theirs[i] & (OPEN_FOUR | FOUR) or mine[i] & FOUR]
+        if not moves:
+            return [], ((INF, 0, 0) if is_or else (0, INF, 0))
+
+        # Strongest threats first: this only breaks ties between equal numbers
+        weight = mine if is_or else theirs
+        moves.sort(key=lambda i: -(weight[i] & ~1))
+        return moves, None
+
+    def _mid(self, thpn: int, thdn: int):
+        self.nodes += 1
+        if self.nodes > self._limit or (self._deadline is not None and (self.nodes & 255) == 0
+                                        and time.perf_counter() > self._deadline):
+            raise _Budget()
+
+        sb = self._sb
+        key = self._key()
+        moves, solved = self._expand()
+        if solved is not None:
+            self.cache.put(key, *solved)
+            return
+
+        is_or = sb.side == self._attacker
+        while True:
+            children = [(m,) + self._lookup(self._key(m)) for m in moves]
+            pn, dn, depth = self._combine(children, is_or)
+            if pn >= thpn or dn >= thdn:
+                break
+            best, second = self._select(children, is_or)
+            _, c_pn, c_dn, _ = best
+            if is_or:
+                child_thpn = min(thpn, second + 1)
+                child_thdn = min(INF - 1, thdn - dn + c_dn)
+            else:
+                child_thdn = min(thdn, second + 1)
+                child_thpn = min(INF - 1, thpn - pn + c_pn)
+            sb.make(best[0])
+            try:
+                self._mid(child_thpn, child_thdn)
+            finally:
+                sb.unmake()
+        self.cache.put(key, pn, dn, depth)
+
+    @staticmethod
+    def _combine(children, is_or: bool) -> Tuple[int, int, int]:
+        if is_or:
+            pn = min(c[1] for c in children)
+            dn = min(INF, sum(c[2] for c in children))
+            depth = 1 + min(c[3] for c in children if c[1] == 0) if pn == 0 else 0
+        else:
+            pn = min(INF, sum(c[1] for c in children))
+            dn = min(c[2] for c in children)
+            depth = 1 + max(c[3] for c in children) if pn == 0 else 0
+        return pn, dn, depth
+
+    # Most-proving child and the runner-up's number
+    @staticmethod
+    def _select(children, is_or: bool):
+        index = 1 if is_or else 2
+        ranked = sorted(children, key=lambda c: c[index])
+        second = ranked[1][index] if len(ranked) > 1 else INF
+        return ranked[0], second
+
+    def _best_root_move(self, status: str) -> Optional[Tuple[int, int]]:
+        if status != PROVEN:
+            return None
+        sb = self._sb
+        moves, solved = self._expand()
+        if solved is not None:
+            # Solved on the spot: the attacker completes five, or the defender
+            # faces two fives and can only block one of them
+            colour = self._attacker
+            for i, v in enumerate(sb.cells):
+                if v == 0 and sb.makes_five(i, colour):
+                    return sb.coords(i)
+            return None
+        children = [(m,) + self._lookup(self._key(m)) for m in moves]
+        if sb.side == self._attacker:
+            # Fastest win
+            proven = [c for c in children if c[1] == 0]
+            best = min(proven, key=lambda c: c[3]) if proven else None
+        else:
+            # Lost anyway: resist as long as possible
+            best = max(children, key=lambda c: c[3]) if children else None
+        return sb.coords(best[0]) if best else None
+
+
+_solver: Optional[Solver] = None
+_solver_lock = threading.Lock()
+_local = threading.local()
+
+
+# The calling thread's solver over the process-wide proof cache (_solver's)
+def shared_solver() -> Solver:
+    global _solver
+    with _solver_lock:
+        if _solver is None:
+            from .lifecycle import CACHE_LIMITS, register_cache
+            _solver = Solver(ProofCache(max_bytes=CACHE_LIMITS["proofs"]))
+            register_cache("proofs", _solver.cache)
+        shared = _solver
+    if threading.current_thread() is threading.main_thread():
+        return shared
+    solver = getattr(_local, "solver", None)
+    if solver is None or solver.cache is not shared.cache:
+        solver = _local.solver = Solver(shared.cache, shared.max_nodes)
+    return solver
+
+
+def solve_position(board, me: str, time_limit: float = 1.0,
+                   solver: Optional[Solver] = None) -> Optional[Tuple[str, Tuple[int, int], SolveResult]]:
+    """('win', move, result) or ('loss', defence, result) for the side `me` to move, else None."""
+    solver = solver or shared_solver()
+    rival = 'O' if me == 'X' else 'X'
+    empties = sum(1 for row in board for cell in row if cell == '.')
+    mode = "full" if empties <= FULL_WIDTH_EMPTIES else "vct"
+
+    win = solver.solve(board, me, attacker=me, mode=mode, time_limit=time_limit / 2)
+    if win.status == PROVEN and win.move is not None:
+        return "win", win.move, win
+    loss = solver.solve(board, me, attacker=rival, mode=mode, time_limit=time_limit / 2)
+    if loss.status == PROVEN and loss.move is not None:
+        return "loss", loss.move, loss
+    return None
@@ -0,0 +1,189 @@
+"""
+LLM-free move policies for self-play and benchmarking.
+
+Each policy mirrors the rule-based part of an agent (everything it does
+before it would ask the LLM) and then falls back to a deterministic
+heuristic, so games can be played at CPU speed.
+"""
+import random
+from typing import Optional, Tuple
+
+from .search import Searcher
+from .tactics import (EMPTY, DIRECTIONS, critical_moves, empty_cells, makes_five,
+                      opponent_of)
+
+Move = Tuple[int, int]
+
+
+# YSV7._sort_moves on a raw board: own neighbours first, then centre distance
+def sort_moves(board, moves, me: str):
+    n = len(board)
+    center = n // 2
+
+    def key(move):
+        r, c = move
+        adjacent = 0
+        for rr in range(max(0, r - 1), min(n, r + 2)):
+            for cc in range(max(0, c - 1), min(n, c + 2)):
+                if (rr, cc) != (r, c) and board[rr][cc] == me:
+                    adjacent += 1
+        return (-adjacent, (r - center) ** 2 + (c - center) ** 2)
+
+    return sorted(moves, key=key)
+
+
+class Policy:
+    name = "policy"
+
+    # Called before every game
+    def new_game(self):
+        pass
+
+    def __call__(self, board, me: str) -> Move:
+        raise NotImplementedError
+
+
+class YSV7Rules(Policy):
+    """YSV7's critical-move buckets, then its adjacency / centre fallback."""
+    name = "ysv7"
+
+    def __call__(self, board, me: str) -> Move:
+        analysis = critical_moves(board, me)
+        for bucket in ('to_win', 'to_defend'):
+            if analysis[bucket]:
+                return analysis[bucket][0]
+        for bucket in ('to_defuse', 'to_attack', 'to_fork'):
+            if analysis[bucket]:
+                return sort_moves(board, analysis[bucket], me)[0]
+        return sort_moves(board, empty_cells(board), me)[0]
+
+
+class SZT4Rules(Policy):
+    """SZT4's priority chain (win, block, block open three, make open three, fallback).
+
+    The opening formation is left out: self-play randomizes openings instead.
+    """
+    name = "szt4"
+
+    RULES = ("win", "block five", "block open three", "make open three", "fallback")
+
+    def __call__(self, board, me: str) -> Move:
+        return self.decide(board, me)[1]
+
+    # (rule of the chain that fired, its move)
+    def decide(self, board, me: str) -> Tuple[str, Move]:
+        rival = opponent_of(me)
+        moves = empty_cells(board)
+        for rule, ch in (("win", me), ("block five", rival)):
+            for r, c in moves:
+                if makes_five(board, r, c, ch):
+                    return rule, (r, c)
+        block = self._block_open_three(board, rival)
+        if block is not None:
+            return "block open three", block
+        for r, c in moves:
+            if self._makes_open_three(board, r, c, me):
+                return "make open three", (r, c)
+        return "fallback", self._fallback(board, moves)
+
+    @staticmethod
+    def _line(board, r: int, c: int, dr: int, dc: int):
+        n = len(board)
+        cells = []
+        for step in range(-4, 5):
+            rr, cc = r + dr * step, c + dc * step
+            cells.append(board[rr][cc] if 0 <= rr < n and 0 <= cc < n else '#')
+        return cells
+
+    def _makes_open_three(self, board, r: int, c: int, ch: str) -> bool:
+        target = EMPTY + ch * 3 + EMPTY
+        for dr, dc in DIRECTIONS:
+            line = self._line(board, r, c, dr, dc)
+            line[4] = ch
+            s = "".join(line)
+            for i in range(len(s) - 4):
+                if s[i:i + 5] == target:
+                    return True
+        return False
+
+    def _block_open_three(self, board, rival: str) -> Optional[Move]:
+        n = len(board)
+        patterns = (
+            (EMPTY + rival * 3 + EMPTY, (0, 4)),
+            (EMPTY + rival * 2 + EMPTY + rival, (0, 3)),
+            (EMPTY + rival + EMPTY + rival * 2, (0, 2)),
+        )
+        # Every in-bounds five-cell window is visited once; SZT4 scans the same
+        # windows from each cell of the board
+        blocks = set()
+        for r in range(n):
+            for c in range(n):
+                for dr, dc in DIRECTIONS:
+                    er, ec = r + 4 * dr, c + 4 * dc
+                    if not (0 <= er < n and 0 <= ec < n):
+                        continue
+                    s = "".join(board[r + k * dr][c + k * dc] for k in range(5))
+                    for pattern, ends in patterns:
+                        if s == pattern:
+                            for k in ends:
+                                blocks.add((r + k * dr, c + k * dc))
+        if not blocks:
+            return None
+        center = n // 2
+        return sorted(blocks, key=lambda m: (m[0] - center) ** 2 + (m[1] - center) ** 2)[0]
+
+    @staticmethod
+    def _fallback(board, moves) -> Move:
+        n = len(board)
+        center = n // 2
+
+        def score(m):
+            r, c = m
+            s = 0.0 if r in (0, n - 1) or c in (0, n - 1) else 5.0
+            return s - (abs(r - center) + abs(c - center)) * 0.3
+
+        return max(moves, key=score)
+
+
+class SearchPolicy(Policy):
+    """Fixed-depth alpha-beta search, optionally time-limited."""
+    name = "search"
+
+    def __init__(self, depth: int = 2, time_limit: Optional[float] = None):
+        self.depth = depth
+        self.time_limit = time_limit
+        self.searcher = Searcher()
+
+    def new_game(self):
+        self.searcher.new_game()
+
+    def __call__(self, board, me: str) -> Move:
+        result = self.searcher.search(board, me, max_depth=self.depth, time_limit=self.time_limit)
+        if result.move is not None:
+            return result.move
+        return empty_cells(board)[0]
+
+
+class RandomPolicy(Policy):
+    """Uniformly random legal move (used for opening randomization)."""
+    name = "random"
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, board, me: str) -> Move:
+        return self.rng.choice(empty_cells(board))
+
+
+POLICIES = {
+    "ysv7": YSV7Rules,
+    "szt4": SZT4Rules,
+    "search": SearchPolicy,
+    "random": RandomPolicy,
+}
+
+
+def make_policy(name: str) -> Policy:
+    if name not in POLICIES:
+        raise ValueError(f"Unknown policy '{name}', expected one of {sorted(POLICIES)}")
+    return POLICIES[name]()
@@ -0,0 +1,160 @@
+"""
+Tiny convolutional policy / value network, inference in plain NumPy.
+
+Input: four planes per position, seen from the side to move
+
+    own stones, opponent stones, empty cells, ones (marks the board edge under zero padding)
+
+Network (3x3 convolutions, zero padding, ReLU):
+
+    conv 4 -> C, conv C -> C, then
+      policy: 1x1 conv C -> 1, softmax over the empty cells
+      value:  mean over the board, dense C -> 1, tanh (outcome for the side to move)
+
+Convolutions are im2col + one matmul, so a whole batch is a handful of
+array operations: a single 8x8 position takes well under a millisecond.
+Weights are stored as .npz (engine/weights/policy_net.npz by default) and
+fitted offline by engine.train_policy.
+
+    net = PolicyNet.load()
+    probs, values = net.predict(boards, players)   # (N, n*n), (N,)
+"""
+import json
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import stack_boards
+
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "policy_net.npz")
+PLANES = 4
+PARAMS = ("w1", "b1", "w2", "b2", "wp", "bp", "wv", "bv")
+
+
+# (N, n, n) int8 boards (0 empty, 1 'X', 2 'O') -> (N, PLANES, n, n) float32 planes
+def to_planes(arr: np.ndarray, players: Sequence[str]) -> np.ndarray:
+    me = np.array([1 if p == 'X' else 2 for p in players], dtype=np.int8)[:, None, None]
+    planes = np.empty((arr.shape[0], PLANES) + arr.shape[1:], dtype=np.float32)
+    planes[:, 0] = arr == me
+    planes[:, 1] = (arr != me) & (arr != 0)
+    planes[:, 2] = arr == 0
+    planes[:, 3] = 1.0
+    return planes
+
+
+# (N, C, n, n) -> (N * n * n, C * 9) patches of a 3x3 convolution with zero padding
+def im2col(x: np.ndarray) -> np.ndarray:
+    n_batch, channels, h, w = x.shape
+    padded = np.zeros((n_batch, channels, h + 2, w + 2), dtype=x.dtype)
+    padded[:, :, 1:-1, 1:-1] = x
+    cols = np.empty((n_batch, h, w, channels, 3, 3), dtype=x.dtype)
+    for dy in range(3):
+        for dx in range(3):
+            cols[..., dy, dx] = padded[:, :, dy:dy + h, dx:dx + w].transpose(0, 2, 3, 1)
+    return cols.reshape(n_batch * h * w, channels * 9)
+
+
+# Inverse of im2col for gradients: (N * n * n, C * 9) -> (N, C, n, n)
+def col2im(cols: np.ndarray, shape: Tuple[int, int, int, int]) -> np.ndarray:
+    n_batch, channels, h, w = shape
+    cols = cols.reshape(n_batch, h, w, channels, 3, 3)
+    padded = np.zeros((n_batch, channels, h + 2, w + 2), dtype=cols.dtype)
+    for dy in range(3):
+        for dx in range(3):
+            padded[:, :, dy:dy + h, dx:dx + w] += cols[..., dy, dx].transpose(0, 3, 1, 2)
+    return padded[:, :, 1:-1, 1:-1]
+
+
+# 3x3 convolution: x (N, C, n, n), w (C * 9, K) -> (N, K, n, n), plus the im2col patches
+def conv3x3(x: np.ndarray, w: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n_batch, _, h, wd = x.shape
+    cols = im2col(x)
+    out = cols @ w + b
+    return out.reshape(n_batch, h, wd, -1).transpose(0, 3, 1, 2), cols
+
+
+# Row-wise softmax of masked logits; a row with no legal cell stays all zero
+def softmax(logits: np.ndarray) -> np.ndarray:
+    top = logits.max(axis=1, keepdims=True)
+    top[~np.isfinite(top)] = 0.0
+    probs = np.exp(logits - top)
+    total = probs.sum(axis=1, keepdims=True)
+    return probs / np.where(total > 0, total, 1.0)
+
+
+class PolicyNet:
+
+    def __init__(self, params: Dict[str, np.ndarray], meta: Optional[dict] = None):
+        self.params = {k: np.asarray(params[k], dtype=np.float32) for k in PARAMS}
+        self.meta = meta or {}
+
+    @classmethod
+    def init(cls, channels: int = 16, seed: int = 0) -> "PolicyNet":
+        """Random weights (He initialisation)."""
+        rng = np.random.default_rng(seed)
+        return cls({
+            "w1": rng.normal(0, np.sqrt(2 / (PLANES * 9)), (PLANES * 9, channels)),
+            "b1": np.zeros(channels),
+            "w2": rng.normal(0, np.sqrt(2 / (channels * 9)), (channels * 9, channels)),
+            "b2": np.zeros(channels),
+            "wp": rng.normal(0, np.sqrt(1 / channels), (channels, 1)),
+            "bp": np.zeros(1),
+            "wv": rng.normal(0, np.sqrt(1 / channels), (channels, 1)),
+            "bv": np.zeros(1),
+        }, {"channels": channels})
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_WEIGHTS) -> "PolicyNet":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"])) if "meta" in data else {}
+            return cls({k: data[k] for k in PARAMS}, meta)
+
+    def save(self, path: str = DEFAULT_WEIGHTS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, meta=json.dumps(self.meta), **self.params)
+
+    def forward(self, planes: np.ndarray, cache: bool = False):
+        """Policy logits (N, n*n) with illegal cells at -inf, values (N,), and the
+        activations needed for backpropagation when `cache` is set."""
+        p = self.params
+        n_batch, _, h, w = planes.shape
+        z1, cols1 = conv3x3(planes, p["w1"], p["b1"])
+        a1 = np.maximum(z1, 0)
+        z2, cols2 = conv3x3(a1, p["w2"], p["b2"])
+        a2 = np.maximum(z2, 0)
+        feats = a2.transpose(0, 2, 3, 1).reshape(n_batch * h * w, -1)
+        logits = (feats @ p["wp"] + p["bp"]).reshape(n_batch, h * w)
+        logits = np.where(planes[:, 2].reshape(n_batch, h * w) > 0, logits, -np.inf)
+        pooled = a2.mean(axis=(2, 3))
+        values = np.tanh(pooled @ p["wv"] + p["bv"]).reshape(n_batch)
+        if not cache:
+            return logits, values
+        return logits, values, {"cols1": cols1, "z1": z1, "a1": a1, "cols2": cols2, "z2": z2,
+                                "feats": feats, "pooled": pooled}
+
+    def predict_planes(self, planes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        logits, values = self.forward(planes)
+        return softmax(logits), values
+
+    def predict(self, boards, players: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Move probabilities (N, n*n) over empty cells and values (N,) for a batch of
+        GameStates, raw boards or board strings, with `players` to move."""
+        return self.predict_planes(to_planes(stack_boards(boards), players))
+
+    # Probabilities of one position as {(row, col): p}
+    def priors(self, board, me: str) -> Dict[Tuple[int, int], float]:
+        probs, _ = self.predict([board], [me])
+        n = len(board)
+        return {divmod(i, n): float(p) for i, p in enumerate(probs[0]) if p > 0}
+
+
+_default: Optional[PolicyNet] = None
+
+
+def default_policy_net() -> Optional[PolicyNet]:
+    """The shipped network, or None when the weight file is missing."""
+    global _default
+    if _default is None and os.path.exists(DEFAULT_WEIGHTS):
+        _default = PolicyNet.load()
+    return _default
@@ -0,0 +1,242 @@
+"""
+Incremental board rendering and memoized LLM prompts.
+
+Building a prompt used to render the whole board with
+game_state.format_board("standard"), rebuild the list of empty cells with
+two nested loops and concatenate the prompt from scratch on every LLM
+move, and again for every retry of the same position. BoardRenderer
+keeps the rendered rows and the free cells of each row, and sync() only
+re-renders the rows that received a stone since the last call (the new
+moves are read from game_state.move_history; anything else, such as a
+new game, renders the board again). The first full render of a renderer
+is compared with game_state.format_board(): if the framework lays the
+board out differently, the renderer falls back to calling it.
+
+PromptCache keeps the message lists already built, keyed by the prompt
+version and whatever the prompt depends on (the rendered board, the
+player, hints), so asking again about a position returns the same list:
+
+    renderer.sync(game_state)
+    messages = prompts.get(("ysv7-1", player, renderer.board_text()), lambda: build(renderer))
+
+The message lists are shared: callers must not modify them.
+
+The benchmark replays random games and compares the old construction
+with the renderer, in time and allocated bytes per prompt (tracemalloc):
+
+    python -m engine.prompts --games 200 --repeats 3
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple
+
+EMPTY = '.'
+
+
+class BoardRenderer:
+    """The "standard" board text and the free cells, updated one stone at a time."""
+
+    def __init__(self):
+        self.n = 0
+        self.rows: List[str] = []
+        self.free: List[List[int]] = []
+        self.native: Optional[bool] = None   # our layout matches format_board (None: not checked yet)
+        self.rebuilds = 0
+        self.updates = 0
+        self._moves: List[Tuple[int, int]] = []
+        self._text: Optional[str] = None
+        self._free_text: Optional[str] = None
+        self._state = None
+
+    def sync(self, game_state):
+        """Bring the buffer up to date with `game_state` (new stones from its move history)."""
+        self._state = game_state
+        history = game_state.move_history
+        known = len(self._moves)
+        if (game_state.board_size != self.n or not history or len(history) < known
+                or (known and (history[known - 1].row, history[known - 1].col) != self._moves[-1])):
+            self._render(game_state)
+            return
+        for move in history[known:]:
+            self._place(move.row, move.col, move.player.value)
+
+    def _render(self, game_state):
+        n = self.n = game_state.board_size
+        board = game_state.board
+        self.rows = [f"{r:2d}" + "".join(f"  {cell}" for cell in board[r]) + " " for r in range(n)]
+        self.free = [[c for c in range(n) if board[r][c] == EMPTY] for r in range(n)]
+        self._moves = [(m.row, m.col) for m in game_state.move_history]
+        self._text = self._free_text = None
+        self.rebuilds += 1
+        if self.native is None:
+            self.native = self.board_text() == game_state.format_board(formatter="standard")
+
+    def _place(self, r: int, c: int, stone: str):
+        row = self.rows[r]
+        at = 2 + 3 * c + 2
+        self.rows[r] = row[:at] + stone + row[at + 1:]
+        free = self.free[r]
+        if c in free:
+            free.remove(c)
+        self._moves.append((r, c))
+        self._text = self._free_text = None
+        self.updates += 1
+
+    def board_text(self) -> str:
+        if self._text is None:
+            if self.native is False:
+                self._text = self._state.format_board(formatter="standard")
+            else:
+                header = "  " + "".join(f"{c:3d}" for c in range(self.n)) + " "
+                self._text = header + "\n" + "\n".join(self.rows) + "\n"
+        return self._text
+
+    def free_cells(self) -> List[Tuple[int, int]]:
+        return [(r, c) for r, cols in enumerate(self.free) for c in cols]
+
+    # "(r,c), (r,c), ..." of the free cells, in row-major order
+    def free_text(self) -> str:
+        if self._free_text is None:
+            self._free_text = ", ".join(f"({r},{c})" for r, cols in enumerate(self.free) for c in cols)
+        return self._free_text
+
+
+class PromptCache:
+    """Bounded LRU of built message lists."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, list]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], list]) -> list:
+        messages = self.entries.get(key)
+        if messages is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return messages
+        self.misses += 1
+        messages = self.entries[key] = build()
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return messages
+
+    def clear(self):
+        self.entries.clear()
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        return f"Prompt cache: {self.hits}/{total} hits ({self.hits / max(total, 1):.0%}), {len(self.entries)} entries"
+
+
+# ===== Benchmark =====
+
+SYSTEM = "You are an expert Gomoku player. Respond with a move in JSON."
+
+
+def _naive(game_state, player: str) -> list:
+    """The construction the agents used before: full render, nested loops, string concatenation."""
+    board_str = game_state.format_board(formatter="standard")
+    unoccupied = []
+    for row in range(game_state.board_size):
+        for col in range(game_state.board_size):
+            if game_state.board[row][col] == EMPTY:
+                unoccupied.append((row, col))
+    prompt = f"Current board state:\n{board_str}\n"
+    prompt += f"You are playing as: {player}\n"
+    if game_state.move_history:
+        last = game_state.move_history[-1]
+        prompt += f"Your last move was: ({last.row}, {last.col})\n"
+    prompt += f"You can make moves at: {', '.join(f'({r},{c})' for r, c in unoccupied)}\n"
+    return [{"role": "system", "content": SYSTEM}, {"role": "user", "content": f"{prompt}Best move in JSON: "}]
+
+
+def _incremental(game_state, player: str, renderer: BoardRenderer, cache: PromptCache) -> list:
+    renderer.sync(game_state)
+    last = game_state.move_history[-1] if game_state.move_history else None
+    last_text = f"Your last move was: ({last.row}, {last.col})\n" if last else ""
+
+    def build():
+        prompt = (f"Current board state:\n{renderer.board_text()}\nYou are playing as: {player}\n{last_text}"
+                  f"You can make moves at: {renderer.free_text()}\n")
+        return [{"role": "system", "content": SYSTEM}, {"role": "user", "content": f"{prompt}Best move in JSON: "}]
+
+    return cache.get(("bench", player, renderer.board_text(), last_text), build)
+
+
+def _positions(games: int, board_size: int, seed: int):
+    from .match import MatchState
+    rng = random.Random(seed)
+    for _ in range(games):
+        state = MatchState(board_size)
+        while True:
+            legal = state.get_legal_moves()
+            if not legal or len(state.move_history) > board_size * board_size * 3 // 4:
+                break
+            yield state
+            state.play(*rng.choice(legal))
+
+
+def benchmark(games: int = 200, repeats: int = 3, board_size: int = 8, seed: int = 0) -> dict:
+    """Microseconds and peak allocated bytes per prompt, old construction against the renderer.
+
+    Every position is asked `repeats` times, as retries and repeated queries do. Time and
+    memory are measured in separate passes, since tracemalloc slows every allocation down."""
+    results = {}
+    for name in ("naive", "incremental"):
+        row = results[name] = {"prompts": 0, "us": 0.0, "bytes": 0.0}
+        for traced in (False, True):
+            renderer, cache = BoardRenderer(), PromptCache()
+            if traced:
+                tracemalloc.start()
+            elapsed, allocated, prompts = 0.0, 0, 0
+            for state in _positions(games, board_size, seed):
+                player = state.current_player.value
+                for _ in range(repeats):
+                    if traced:
+                        before = tracemalloc.get_traced_memory()[0]
+                        tracemalloc.reset_peak()
+                    t0 = time.perf_counter()
+                    if name == "naive":
+                        messages = _naive(state, player)
+                    else:
+                        messages = _incremental(state, player, renderer, cache)
+                    elapsed += time.perf_counter() - t0
+                    if traced:
+                        allocated += tracemalloc.get_traced_memory()[1] - before
+                    prompts += 1
+                if name == "incremental" and not traced and messages != _naive(state, player):
+                    raise AssertionError(f"prompts differ after {len(state.move_history)} moves")
+            if traced:
+                tracemalloc.stop()
+                row["bytes"] = allocated / prompts
+            else:
+                row["prompts"], row["us"] = prompts, elapsed / prompts * 1e6
+        if name == "incremental":
+            row["hits"], row["rebuilds"] = cache.hits, renderer.rebuilds
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prompt construction: full rebuild against incremental.")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3, help="times each position is asked (retries)")
+    parser.add_argument("--board-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    results = benchmark(args.games, args.repeats, args.board_size, args.seed)
+    for name, row in results.items():
+        extra = f", {row['hits']} cache hits, {row['rebuilds']} full renders" if "hits" in row else ""
+        print(f"{name:<12} {row['prompts']} prompts: {row['us']:.1f} us and {row['bytes'] / 1024:.1f} KiB "
+              f"allocated per prompt{extra}")
+    naive, incremental = results["naive"], results["incremental"]
+    print(f"✅ {naive['us'] / incremental['us']:.1f}x faster, "
+          f"{naive['bytes'] / max(incremental['bytes'], 1):.1f}x fewer bytes allocated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Tactical puzzle suite: solve rate and time-to-solution of each agent.
+
+A puzzle is a position, the side to move and the set of moves that solve
+it. Positions come from game logs, self-play datasets and games generated
+on the spot between the rule policies, and are classified (first match
+wins) by the tactical scanners and the proof-number solver:
+
+  win in 1            a five can be completed; solutions are the fives
+  must block          the opponent threatens exactly one five; the block
+  vcf                 a win by continuous fours exists; the fours after
+                      which the solver still proves it
+  open three defence  the opponent wins by VCT if we pass; the moves after
+                      which the solver disproves that win
+  fork                a win by VCT exists and every threat that keeps it
+                      (per the solver) makes threats in two lines at once
+
+Positions with more than `max_solutions` solutions are dropped, so every
+puzzle has few right answers. The suite is a JSON-lines file:
+
+    python -m engine.puzzles build --logs runs --data data/selfplay --generate 300 --per-category 40
+
+Each agent's own `get_move` is then run on every puzzle, with the LLM
+stubbed (every request fails at once, so the agent's engine path answers)
+or live. The report gives the solve rate, the median time-to-solution of
+the solved puzzles and the nodes per second of the searches and solves
+the agent ran:
+
+    python -m engine.puzzles run agent1 agent2 --llm stub
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .linecodes import FOUR, OPEN_FOUR, OPEN_THREE, SPLIT_THREE, encode_at, line_flags
+from .records import decode_board, iter_game_logs, iter_records, log_records
+from .tactics import DIRECTIONS, EMPTY, Move, critical_moves, frontier, opponent_of
+
+CATEGORIES = ("win in 1", "must block", "vcf", "open three defence", "fork")
+THREATS = FOUR | OPEN_FOUR | OPEN_THREE | SPLIT_THREE
+
+DEFAULT_SUITE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "puzzles.jsonl")
+
+
+@dataclass
+class Puzzle:
+    id: str
+    category: str
+    board: str
+    to_move: str
+    solutions: List[List[int]]
+    source: str = ""
+
+
+# Directions in which placing `ch` at (r, c) makes a four or a three
+def threat_lines(board, r: int, c: int, ch: str) -> int:
+    flags = line_flags()
+    return sum(1 for dr, dc in DIRECTIONS if flags[encode_at(board, r, c, ch, dr, dc)] & THREATS)
+
+
+def _after(board, move: Move, ch: str, solve):
+    r, c = move
+    board[r][c] = ch
+    try:
+        return solve()
+    finally:
+        board[r][c] = EMPTY
+
+
+def classify(board, me: str, solver, solve_time: float = 0.1,
+             max_solutions: int = 4) -> Optional[Tuple[str, List[Move]]]:
+    """(category, solutions) of the position for `me` to move, or None if it is no puzzle."""
+    from .pns import DISPROVEN, PROVEN
+
+    rival = opponent_of(me)
+    analysis = critical_moves(board, me)
+    if analysis["to_win"]:
+        category, solutions = "win in 1", analysis["to_win"]
+    elif analysis["to_defend"]:
+        if len(analysis["to_defend"]) > 1:  # two fives threatened: lost, not a puzzle
+            return None
+        category, solutions = "must block", analysis["to_defend"]
+    elif solver.solve(board, me, attacker=me, mode="vcf", time_limit=solve_time).status == PROVEN:
+        category = "vcf"
+        fours = [(r, c) for r, c in frontier(board, radius=4) if _makes_four(board, r, c, me)]
+        solutions = [m for m in fours if _after(
+            board, m, me, lambda: solver.solve(board, rival, attacker=me, mode="vcf", time_limit=solve_time)
+        ).status == PROVEN]
+    elif analysis["to_defuse"] and solver.solve(board, rival, attacker=rival, mode="vct",
+                                                time_limit=solve_time).status == PROVEN:
+        category, solutions = "open three defence", []
+        for move in frontier(board, radius=2):
+            status = _after(board, move, me, lambda: solver.solve(board, rival, attacker=rival, mode="vct",
+                                                                  time_limit=solve_time)).status
+            if status == DISPROVEN:
+                solutions.append(move)
+            elif status != PROVEN:  # undecided: the answer set would be a guess
+                return None
+    elif solver.solve(board, me, attacker=me, mode="vct", time_limit=solve_time).status == PROVEN:
+        # Every threat that keeps the VCT win must be a fork, or the fork is not the answer
+        category, solutions = "fork", []
+        for r, c in frontier(board, radius=2):
+            lines = threat_lines(board, r, c, me)
+            if not lines:
+                continue
+            status = _after(board, (r, c), me, lambda: solver.solve(board, rival, attacker=me, mode="vct",
+                                                                    time_limit=solve_time)).status
+            if status == PROVEN:
+                if lines < 2:
+                    return None
+                solutions.append((r, c))
+            elif status != DISPROVEN:
+                return None
+    else:
+        return None
+    if not solutions or len(solutions) > max_solutions:
+        return None
+    return category, solutions
+
+
+def _makes_four(board, r: int, c: int, ch: str) -> bool:
+    flags = line_flags()
+    return any(flags[encode_at(board, r, c, ch, dr, dc)] & (FOUR | OPEN_FOUR) for dr, dc in DIRECTIONS)
+
+
+# Mirrored and rotated positions are the same puzzle
+def puzzle_id(board_str: str, to_move: str) -> str:
+    from .symmetry import canonical_text
+    return hashlib.sha1(f"{canonical_text(board_str)[0]}{to_move}".encode()).hexdigest()[:12]
+
+
+# Positions of games played on the spot between the rule policies (random openings)
+def generated_records(games: int, seed: int = 0) -> Iterable[Dict]:
+    from .policies import make_policy
+    from .selfplay import play_game
+
+    rng = random.Random(seed)
+    players = [make_policy("ysv7"), make_policy("szt4")]
+    for g in range(games):
+        black, white = (players[0], players[1]) if g % 2 == 0 else (players[1], players[0])
+        records, _ = play_game(black, white, opening_plies=rng.randint(2, 10), rng=rng)
+        yield from records
+
+
+def build(sources: Iterable[Tuple[str, Iterable[Dict]]], per_category: int = 40, min_ply: int = 4,
+          solve_time: float = 0.1, max_solutions: int = 4) -> List[Puzzle]:
+    """Classify the positions of every (source name, records) until each category is full."""
+    from .pns import ProofCache, Solver
+
+    solver = Solver(ProofCache(path=None))
+    puzzles: Dict[str, List[Puzzle]] = {name: [] for name in CATEGORIES}
+    seen = set()
+    for source, records in sources:
+        for record in records:
+            if all(len(found) >= per_category for found in puzzles.values()):
+                return [p for name in CATEGORIES for p in puzzles[name]]
+            key = puzzle_id(record["board"], record["to_move"])
+            if record.get("ply", 0) < min_ply or key in seen:
+                continue
+            seen.add(key)
+            found = classify(decode_board(record["board"]), record["to_move"], solver, solve_time, max_solutions)
+            if found is None or len(puzzles[found[0]]) >= per_category:
+                continue
+            category, solutions = found
+            puzzles[category].append(Puzzle(key, category, record["board"], record["to_move"],
+                                            sorted([list(m) for m in solutions]), source))
+    return [p for name in CATEGORIES for p in puzzles[name]]
+
+
+def save_suite(puzzles: List[Puzzle], path: str = DEFAULT_SUITE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for puzzle in puzzles:
+            f.write(json.dumps(asdict(puzzle)) + "\n")
+
+
+def load_suite(path: str = DEFAULT_SUITE) -> List[Puzzle]:
+    with open(path, encoding="utf-8") as f:
+        return [Puzzle(**json.loads(line)) for line in f if line.strip()]
+
+
+# ===== Running agents =====
+
+class StubLLM:
+    """Stands in for the LLM client: every request fails at once."""
+
+    async def complete(self, messages) -> str:
+        raise RuntimeError("LLM stubbed out for the puzzle suite")
+
+
+# Placeholder credentials for clients that are built but never called
+STUB_ENV = {"OPENAI_API_KEY": "stub", "OPENAI_BASE_URL": "http://localhost"}
+
+
+# Set the missing STUB_ENV variables while agents are constructed or prepared
+@contextmanager
+def stub_env():
+    missing = [k for k in STUB_ENV if k not in os.environ]
+    os.environ.update({k: STUB_ENV[k] for k in missing})
+    try:
+        yield
+    finally:
+        for k in missing:
+            os.environ.pop(k, None)
+
+
+def prepare_stubbed(agent):
+    """Run the agent's set-up, then replace its LLM with StubLLM (no API key needed)."""
+    with stub_env():
+        if hasattr(agent, "_prepare"):
+            agent._prepare()
+    agent.llm_client = StubLLM()
+    agent.cascade = None
+
+
+class NodeCounter:
+    """Nodes searched / solved while it is installed (see count_nodes)."""
+
+    def __init__(self):
+        self.nodes = 0
+
+
+# Add the nodes of every search and solve to a counter while the block runs
+@contextmanager
+def count_nodes():
+    from .pns import Solver
+    from .search import Searcher
+
+    counter = NodeCounter()
+    patched = []
+
+    def wrap(cls, name, nodes_of):
+        original = getattr(cls, name)
+
+        def counted(self, *args, **kwargs):
+            result = original(self, *args, **kwargs)
+            counter.nodes += nodes_of(result)
+            return result
+        setattr(cls, name, counted)
+        patched.append((cls, name, original))
+
+    wrap(Searcher, "search", lambda result: result.stats.nodes)
+    wrap(Solver, "solve", lambda result: result.nodes)
+    if "engine.parallel" in sys.modules:
+        wrap(sys.modules["engine.parallel"].ParallelSearcher, "search", lambda result: result.stats.nodes)
+    tablebase = sys.modules.get("engine.tablebase")
+    tb_nodes = sum(t.stats.nodes for t in tablebase._default.values()) if tablebase else 0
+    try:
+        yield counter
+    finally:
+        for cls, name, original in reversed(patched):
+            setattr(cls, name, original)
+        tablebase = sys.modules.get("engine.tablebase")
+        if tablebase is not None:
+            counter.nodes += sum(t.stats.nodes for t in tablebase._default.values()) - tb_nodes
+
+
+@dataclass
+class PuzzleResult:
+    id: str
+    category: str
+    move: Optional[List[int]]
+    solved: bool
+    elapsed: float
+    nodes: int
+    error: str = ""
+
+
+def game_state_for(puzzle: Puzzle):
+    """A MatchState of the puzzle position (move history rebuilt in alternating order)."""
+    from .match import MatchState, Player, PlayedMove
+
+    board = decode_board(puzzle.board)
+    state = MatchState(len(board))
+    state.board = board
+    state.current_player = Player(puzzle.to_move)
+    stones = {ch: [(r, c) for r, row in enumerate(board) for c, cell in enumerate(row) if cell == ch]
+              for ch in ('X', 'O')}
+    for i in range(len(stones['X']) + len(stones['O'])):
+        ch = 'X' if i % 2 == 0 else 'O'
+        if stones[ch]:
+            r, c = stones[ch].pop()
+            state.move_history.append(PlayedMove(r, c, Player(ch)))
+    return state
+
+
+async def solve_puzzle(cls, name: str, puzzle: Puzzle, llm: str = "stub", time_limit: float = 30.0) -> PuzzleResult:
+    """Run a fresh agent's get_move on the puzzle; set-up happens before the clock starts."""
+    state = game_state_for(puzzle)
+    with stub_env() if llm == "stub" else nullcontext():
+        agent = cls(f"{name}-puzzle-{puzzle.id}")
+    agent.player = state.current_player
+    if llm == "stub":
+        prepare_stubbed(agent)
+    elif hasattr(agent, "_prepare"):
+        agent._prepare()
+    move, error = None, ""
+    with count_nodes() as counter:
+        start = time.perf_counter()
+        try:
+            move = list(await asyncio.wait_for(agent.get_move(state), time_limit))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        elapsed = time.perf_counter() - start
+    return PuzzleResult(puzzle.id, puzzle.category, move, move in puzzle.solutions, elapsed, counter.nodes, error)
+
+
+@dataclass
+class SuiteReport:
+    agent: str
+    results: List[PuzzleResult] = field(default_factory=list)
+
+    def rows(self) -> List[Tuple[str, int, int, float, float]]:
+        """(category, puzzles, solved, median seconds to solution, nodes per second)"""
+        rows = []
+        for category in CATEGORIES + ("all",):
+            results = [r for r in self.results if category in ("all", r.category)]
+            if not results:
+                continue
+            solved = [r.elapsed for r in results if r.solved]
+            elapsed = sum(r.elapsed for r in results)
+            rows.append((category, len(results), len(solved), statistics.median(solved) if solved else 0.0,
+                         sum(r.nodes for r in results) / elapsed if elapsed else 0.0))
+        return rows
+
+    def summary(self) -> str:
+        lines = [f"{self.agent}:", f"  {'':<20}{'puzzles':>8}{'solved':>8}{'rate':>7}{'median s':>10}{'nodes/s':>10}"]
+        for category, total, solved, median, nps in self.rows():
+            lines.append(f"  {category:<20}{total:>8}{solved:>8}{solved / total:>7.0%}{median:>10.3f}{nps:>10.0f}")
+        errors = sum(1 for r in self.results if r.error)
+        if errors:
+            lines.append(f"  {errors} puzzles raised or timed out")
+        return "\n".join(lines)
+
+
+def run_suite(agent_dir: str, puzzles: List[Puzzle], llm: str = "stub", time_limit: float = 30.0,
+              fresh_proofs: bool = True) -> SuiteReport:
+    """Every puzzle with a fresh instance of the agent in `agent_dir`, one at a time."""
+    from . import pns
+    from .match import load_agent_class
+
+    cls, name = load_agent_class(agent_dir)
+    if fresh_proofs:
+        # Proofs stored on disk by earlier runs would turn solves into lookups
+        pns._solver = pns.Solver(pns.ProofCache(path=None))
+    report = SuiteReport(name)
+
+    async def run():
+        for puzzle in puzzles:
+            report.results.append(await solve_puzzle(cls, name, puzzle, llm, time_limit))
+
+    asyncio.run(run())
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the tactical puzzle suite or run agents on it.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    b = commands.add_parser("build", help="collect puzzles from logs, datasets and generated games")
+    b.add_argument("--logs", action="append", default=[], help="directory of framework game logs")
+    b.add_argument("--data", action="append", default=[], help="self-play dataset directory or shard")
+    b.add_argument("--generate", type=int, default=300, help="games to play between the rule policies")
+    b.add_argument("--per-category", type=int, default=40)
+    b.add_argument("--max-solutions", type=int, default=4)
+    b.add_argument("--solve-time", type=float, default=0.1, help="seconds per solver call")
+    b.add_argument("--seed", type=int, default=0)
+    b.add_argument("--out", default=DEFAULT_SUITE)
+    r = commands.add_parser("run", help="run agents' get_move on every puzzle")
+    r.add_argument("agents", nargs="*", default=["agent1", "agent2"])
+    r.add_argument("--suite", default=DEFAULT_SUITE)
+    r.add_argument("--llm", choices=("stub", "live"), default="stub")
+    r.add_argument("--category", action="append", choices=CATEGORIES, help="only these categories")
+    r.add_argument("--time-limit", type=float, default=30.0, help="seconds per puzzle")
+    r.add_argument("--keep-proofs", action="store_true", help="reuse the solver's on-disk proofs")
+    r.add_argument("--json", default=None, help="write every result to this file")
+    r.add_argument("--quiet", action="store_true", help="hide the agents' own output")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        sources = [(path, (rec for log in iter_game_logs(path) for rec in log_records(log))) for path in args.logs]
+        sources += [(path, iter_records(path)) for path in args.data]
+        sources.append(("generated", generated_records(args.generate, args.seed)))
+        puzzles = build(sources, args.per_category, solve_time=args.solve_time, max_solutions=args.max_solutions)
+        save_suite(puzzles, args.out)
+        counts = {name: sum(1 for p in puzzles if p.category == name) for name in CATEGORIES}
+        print(f"✅ {len(puzzles)} puzzles in {time.perf_counter() - start:.1f}s -> {args.out}")
+        print("   " + ", ".join(f"{name} {n}" for name, n in counts.items()))
+        return
+
+    puzzles = [p for p in load_suite(args.suite) if not args.category or p.category in args.category]
+    reports = []
+    for agent_dir in args.agents:
+        if args.quiet:
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    reports.append(run_suite(agent_dir, puzzles, args.llm, args.time_limit, not args.keep_proofs))
+                finally:
+                    sys.stdout = stdout
+        else:
+            reports.append(run_suite(agent_dir, puzzles, args.llm, args.time_limit, not args.keep_proofs))
+    print(f"{len(puzzles)} puzzles, LLM {args.llm}")
+    for report in reports:
+        print(report.summary())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({report.agent: [asdict(r) for r in report.results] for report in reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Token-bucket scheduling of LLM requests under RPM / TPM limits.
+
+Every model gets two buckets, one for requests and one for tokens, that
+refill continuously up to one minute's worth. A request first estimates
+its token cost from the prompt (estimate_tokens), then waits in the
+model's queue until both buckets can pay for it, so calls are paced
+instead of failing with rate-limit errors.
+
+Waiting requests are served by urgency: the one whose game clock runs
+out first goes first. The clock is read from the `move_deadline` context
+variable (a time.monotonic() deadline) that the match runner sets before
+every move; requests without one are served last, in arrival order.
+
+RateLimitedClient is a local stand-in for the endpoint: it enforces the
+same limits and raises RateLimitError when they are exceeded, so the
+scheduler can be checked without the network:
+
+    python -m engine.ratelimit --requests 60 --rpm 30 --tpm 20000 --window 2
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+move_deadline: ContextVar[Optional[float]] = ContextVar("move_deadline", default=None)
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+DEFAULT_COMPLETION_TOKENS = 200
+
+
+class RateLimitError(Exception):
+    pass
+
+
+# Rough token cost of a chat request: prompt characters / 4, plus the reply
+def estimate_tokens(messages, completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    chars = 0
+    for message in messages:
+        content = message.get("content", "") if isinstance(message, dict) else str(message)
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD * len(messages) + completion_tokens
+
+
+class TokenBucket:
+    """Holds up to `capacity` units and refills at `capacity` per `window` seconds."""
+
+    def __init__(self, capacity: float, window: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / window
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    # Seconds until `amount` units are available (0 if they are now)
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+@dataclass
+class ModelStats:
+    granted: int = 0
+    tokens: int = 0
+    waited: float = 0.0
+    max_wait: float = 0.0
+    max_queue: int = 0
+
+
+class RateLimitScheduler:
+    """Per-model request and token buckets with an earliest-deadline-first queue."""
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], window: float = 60.0,
+                 default: Optional[Tuple[int, int]] = None):
+        self.window = window
+        self.limits = dict(limits)
+        self.default = default
+        self.buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self.queues: Dict[str, List] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.stats: Dict[str, ModelStats] = {}
+        self._seq = itertools.count()
+
+    def _buckets(self, model: str) -> Optional[Tuple[TokenBucket, TokenBucket]]:
+        buckets = self.buckets.get(model)
+        if buckets is None:
+            limit = self.limits.get(model, self.default)
+            if limit is None:
+                return None
+            rpm, tpm = limit
+            buckets = self.buckets[model] = (TokenBucket(rpm, self.window), TokenBucket(tpm, self.window))
+        return buckets
+
+    async def acquire(self, model: str, tokens: int, deadline: Optional[float] = None):
+        """Wait until `model` can take a request of `tokens` tokens."""
+        if self._buckets(model) is None:
+            return
+        if deadline is None:
+            deadline = move_deadline.get()
+        priority = deadline if deadline is not None else float("inf")
+        future = asyncio.get_running_loop().create_future()
+        queue = self.queues.setdefault(model, [])
+        heapq.heappush(queue, (priority, next(self._seq), tokens, time.monotonic(), future))
+        stats = self.stats.setdefault(model, ModelStats())
+        stats.max_queue = max(stats.max_queue, len(queue))
+        self._pump(model)
+        await future
+
+    def _pump(self, model: str):
+        timer = self.timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        requests, tokens_bucket = self._buckets(model)
+        queue = self.queues.get(model, [])
+        stats = self.stats.setdefault(model, ModelStats())
+        while queue:
+            if queue[0][4].cancelled():
+                heapq.heappop(queue)
+                continue
+            _, _, tokens, queued_at, future = queue[0]
+            now = time.monotonic()
+            wait = max(requests.wait_time(1, now), tokens_bucket.wait_time(tokens, now))
+            if wait > 0:
+                loop = asyncio.get_running_loop()
+                self.timers[model] = loop.call_later(wait, self._pump, model)
+                return
+            heapq.heappop(queue)
+            requests.take(1)
+            tokens_bucket.take(tokens)
+            waited = now - queued_at
+            stats.granted += 1
+            stats.tokens += tokens
+            stats.waited += waited
+            stats.max_wait = max(stats.max_wait, waited)
+            future.set_result(None)
+
+    def summary(self) -> str:
+        parts = []
+        for model, s in self.stats.items():
+            mean = s.waited / s.granted if s.granted else 0.0
+            parts.append(f"{model}: {s.granted} requests, {s.tokens} tokens, "
+                         f"wait mean {mean:.2f}s max {s.max_wait:.2f}s, queue max {s.max_queue}")
+        return "Rate limits: " + ("; ".join(parts) or "no requests")
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+
+
+def set_scheduler(scheduler: Optional[RateLimitScheduler]):
+    global _scheduler
+    _scheduler = scheduler
+
+
+def get_scheduler() -> Optional[RateLimitScheduler]:
+    return _scheduler
+
+
+class RateLimitedClient:
+    """Stand-in endpoint enforcing RPM / TPM with continuously refilled buckets."""
+
+    def __init__(self, model: str = "simulated", rpm: int = 30, tpm: int = 20000,
+                 window: float = 60.0, latency: float = 0.05):
+        self.model = model
+        self.requests = TokenBucket(rpm, window)
+        self.tokens = TokenBucket(tpm, window)
+        self.latency = latency
+        self.calls = 0
+        self.rejected = 0
+
+    async def complete(self, messages) -> str:
+        now = time.monotonic()
+        tokens = estimate_tokens(messages)
+        self.calls += 1
+        if self.requests.wait_time(1, now) > 0 or self.tokens.wait_time(tokens, now) > 0:
+            self.rejected += 1
+            raise RateLimitError(f"{self.model}: rate limit exceeded")
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        await asyncio.sleep(self.latency)
+        return '```json\n{"move": {"row": 3, "col": 4}}\n```'
+
+
+async def _simulate(requests: int, rpm: int, tpm: int, window: float, scheduled: bool) -> Tuple[int, int, float]:
+    # Under `python -m` this file runs as __main__; engine.llm reads the scheduler
+    # and the deadline from the imported engine.ratelimit module
+    from . import ratelimit
+    from .llm import coalesce, set_concurrency_limit
+
+    set_concurrency_limit(None)
+    scheduler = ratelimit.RateLimitScheduler({"simulated": (rpm, tpm)}, window=window) if scheduled else None
+    ratelimit.set_scheduler(scheduler)
+    client = coalesce(ratelimit.RateLimitedClient(rpm=rpm, tpm=tpm, window=window))
+    rng = random.Random(0)
+    start = time.monotonic()
+
+    async def one(i: int) -> bool:
+        ratelimit.move_deadline.set(start + rng.uniform(1.0, 30.0))
+        messages = [{"role": "user", "content": f"game {i}\n" + "." * rng.randint(500, 3000)}]
+        try:
+            await client.complete(messages)
+            return True
+        except ratelimit.RateLimitError:
+            return False
+
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    ratelimit.set_scheduler(None)
+    if scheduler is not None:
+        print(scheduler.summary())
+    return sum(results), requests - sum(results), time.monotonic() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the rate-limit scheduler against a simulated endpoint.")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--rpm", type=int, default=30, help="requests per window")
+    parser.add_argument("--tpm", type=int, default=20000, help="tokens per window")
+    parser.add_argument("--window", type=float, default=2.0, help="seconds standing in for one minute")
+    args = parser.parse_args(argv)
+
+    for scheduled in (False, True):
+        ok, failed, elapsed = asyncio.run(_simulate(args.requests, args.rpm, args.tpm, args.window, scheduled))
+        label = "scheduled" if scheduled else "unscheduled"
+        print(f"{label:>11}: {ok} ok, {failed} rate-limited, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+On-disk position datasets.
+
+A dataset is a directory of gzip-compressed JSON-lines shards
+(`shard-00000.jsonl.gz`, ...). Each line is one training record:
+
+    {"game": 17, "ply": 5, "board": "<n*n chars, row-major>",
+     "to_move": "X", "move": [3, 4], "outcome": 1}
+
+`outcome` is from the point of view of `to_move`: 1 win, 0 draw, -1 loss.
+"""
+import glob
+import gzip
+import json
+import os
+from typing import Dict, Iterator, List
+
+from .tactics import EMPTY
+
+
+def encode_board(board) -> str:
+    return "".join("".join(row) for row in board)
+
+
+def decode_board(text: str) -> List[List[str]]:
+    n = int(round(len(text) ** 0.5))
+    return [list(text[r * n:(r + 1) * n]) for r in range(n)]
+
+
+def empty_board(n: int = 8) -> List[List[str]]:
+    return [[EMPTY] * n for _ in range(n)]
+
+
+class ShardWriter:
+    """Append records to a sharded dataset, rolling over every `shard_size` records."""
+
+    def __init__(self, out_dir: str, shard_size: int = 50_000):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        os.makedirs(out_dir, exist_ok=True)
+        self.shard_index = len(glob.glob(os.path.join(out_dir, "shard-*.jsonl.gz")))
+        self.records_written = 0
+        self._in_shard = 0
+        self._fh = None
+
+    def _open(self):
+        path = os.path.join(self.out_dir, f"shard-{self.shard_index:05d}.jsonl.gz")
+        self._fh = gzip.open(path, "wt", encoding="utf-8")
+        self._in_shard = 0
+
+    def write(self, record: Dict):
+        if self._fh is None:
+            self._open()
+        self._fh.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._in_shard += 1
+        self.records_written += 1
+        if self._in_shard >= self.shard_size:
+            self._fh.close()
+            self._fh = None
+            self.shard_index += 1
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self.shard_index += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Yield records from a shard file or from every shard in a directory."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "shard-*.jsonl.gz")))
+    else:
+        files = [path]
+    for file in files:
+        with gzip.open(file, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_game_logs(path: str) -> Iterator[Dict]:
+    """Yield framework game logs (`play --log` JSON files) from a file or directory."""
+    files = sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+    for file in files:
+        with open(file, encoding="utf-8") as fh:
+            try:
+                data = json.load(fh)
+            except json.JSONDecodeError:
+                continue
+        if "game_result" in data:
+            data["_file"] = file
+            yield data
+
+
+def log_records(log: Dict, board_size: int = 0) -> List[Dict]:
+    """Turn one framework game log into records, in the same format as self-play."""
+    result = log["game_result"]
+    n = board_size or log.get("game_metadata", {}).get("board_size", 8)
+    winner = {"black_win": 'X', "white_win": 'O'}.get(result.get("result"), '')
+    board = empty_board(n)
+    records = []
+    for ply, entry in enumerate(result.get("game_log", [])):
+        ch = 'X' if ply % 2 == 0 else 'O'
+        r, c = entry["position"]
+        if entry.get("illegal") or not (0 <= r < n and 0 <= c < n) or board[r][c] != EMPTY:
+            break
+        records.append({
+            "ply": ply,
+            "board": encode_board(board),
+            "to_move": ch,
+            "move": [r, c],
+            "outcome": 0 if not winner else (1 if winner == ch else -1),
+            "agent": entry.get("player", ""),
+            "time": entry.get("time", 0.0),
+        })
+        board[r][c] = ch
+    return records
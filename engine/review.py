@@ -0,0 +1,290 @@
+"""
+Blunder analysis over a directory of game logs.
+
+Every position of every game (runs/*.json, framework or engine.match
+layout) is replayed and the move played there is checked against the
+tactical scanners, the proof-number solver and a fixed-depth search:
+
+  missed win          a five was available and not played
+  missed defence      the opponent threatened five and the move did not block it
+  ignored open three  the opponent had an open three, the move neither blocked
+                      it nor made a four
+  missed forced win   the solver proved a forced win (VCT) and the move does not
+                      continue one
+  search blunder      the search scores the move at least `blunder_loss` below
+                      the best one, or the move walks into a forced loss
+
+Games are analysed in a process pool (one game per task, with at most
+`max_pending` tasks in flight) and every finished game is written to its
+own JSON file in the output directory. A game whose log is unchanged
+(same size and modification time) and that was analysed with the same
+settings is not analysed again, so re-running after a tournament only
+analyses the new games.
+
+The report aggregates positions and blunders per agent (the name in the
+log, which carries the version, e.g. YSv7), per phase of the game and per
+rule of SZT4's priority chain (engine.policies.SZT4Rules.decide) that
+applies to the position.
+
+    python -m engine.review runs --out data/review --depth 3 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .linecodes import FIVE, FOUR, OPEN_FOUR, flags_at
+from .records import decode_board, log_records
+from .search import MATE_BOUND, WIN, Searcher
+from .tactics import critical_moves, opponent_of
+
+FLAGS = ("missed win", "missed defence", "ignored open three", "missed forced win", "search blunder")
+PHASES = ((8, "opening"), (24, "middlegame"), (10 ** 9, "endgame"))
+VERSION = 1  # bump when the analysis changes, so old results are redone
+INDEX = "index.json"
+
+
+def phase_of(ply: int) -> str:
+    for limit, name in PHASES:
+        if ply < limit:
+            return name
+    return PHASES[-1][1]
+
+
+# Per-process engines, created on the first task of each worker
+_engines = {}
+
+
+def _engine():
+    if "searcher" not in _engines:
+        from .pns import ProofCache, Solver
+        from .policies import SZT4Rules
+        _engines["searcher"] = Searcher()
+        # In-memory proofs only: many workers writing one SQLite file would contend for it
+        _engines["solver"] = Solver(ProofCache(path=None))
+        _engines["rules"] = SZT4Rules()
+    return _engines["searcher"], _engines["solver"], _engines["rules"]
+
+
+def analyse_position(board, me: str, move: Tuple[int, int], settings: Dict) -> Dict:
+    """Flags and search scores of playing `move` for `me` on `board`."""
+    from .pns import DISPROVEN, PROVEN
+
+    searcher, solver, rules = _engine()
+    rival = opponent_of(me)
+    r, c = move
+    analysis = critical_moves(board, me)
+    own = flags_at(board, r, c, me)
+    flags = []
+    if analysis["to_win"] and move not in analysis["to_win"]:
+        flags.append("missed win")
+    elif not analysis["to_win"] and analysis["to_defend"] and move not in analysis["to_defend"]:
+        flags.append("missed defence")
+    elif (not analysis["to_win"] and not analysis["to_defend"] and analysis["to_defuse"]
+          and move not in analysis["to_defuse"] and not own & (FOUR | OPEN_FOUR | FIVE)):
+        flags.append("ignored open three")
+
+    # Proven wins that the move gave away
+    if not flags and not own & FIVE:
+        proof = solver.solve(board, me, attacker=me, mode="vct", time_limit=settings["solve_time"])
+        if proof.status == PROVEN:
+            board[r][c] = me
+            kept = solver.solve(board, rival, attacker=me, mode="vct", time_limit=settings["solve_time"])
+            board[r][c] = '.'
+            if kept.status == DISPROVEN:
+                flags.append("missed forced win")
+
+    # Search score of the best move against the played one
+    depth = settings["depth"]
+    best = searcher.search(board, me, max_depth=depth, time_limit=settings["search_time"])
+    if own & FIVE:
+        played = WIN
+    else:
+        board[r][c] = me
+        played = -searcher.search(board, rival, max_depth=max(1, depth - 1),
+                                  time_limit=settings["search_time"]).score
+        board[r][c] = '.'
+    loss = max(0, best.score - played)
+    if not flags and (loss >= settings["blunder_loss"] or (played <= -MATE_BOUND < best.score)):
+        flags.append("search blunder")
+
+    rule, rule_move = rules.decide(board, me)
+    return {"flags": flags, "best": list(best.move) if best.move else None, "best_score": best.score,
+            "played_score": played, "loss": loss, "rule": rule, "rule_agrees": tuple(rule_move) == tuple(move)}
+
+
+def analyse_game(task: Tuple[str, Dict]) -> Dict:
+    """Analyse every move of one game log; the result is what gets stored per game."""
+    path, settings = task
+    start = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        log = json.load(f)
+    positions = []
+    if "game_result" not in log:  # not a game log; stored empty so it is skipped next time
+        return {"file": path, "positions": positions, "elapsed": 0.0}
+    searcher, _, _ = _engine()
+    searcher.new_game()
+    for record in log_records(log):
+        board = decode_board(record["board"])
+        result = analyse_position(board, record["to_move"], tuple(record["move"]), settings)
+        result.update({"ply": record["ply"], "agent": record["agent"], "move": record["move"],
+                       "phase": phase_of(record["ply"])})
+        positions.append(result)
+    return {"file": path, "positions": positions, "elapsed": time.perf_counter() - start}
+
+
+def settings_key(settings: Dict) -> str:
+    return hashlib.sha1(json.dumps([VERSION, settings], sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _result_path(out_dir: str, log_path: str) -> str:
+    name = hashlib.sha1(os.path.abspath(log_path).encode()).hexdigest()[:16]
+    return os.path.join(out_dir, f"{name}.json")
+
+
+def _load_index(out_dir: str) -> Dict[str, list]:
+    try:
+        with open(os.path.join(out_dir, INDEX), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(out_dir: str, index: Dict[str, list]):
+    tmp = os.path.join(out_dir, INDEX + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, os.path.join(out_dir, INDEX))
+
+
+# Logs that have no up-to-date result in `out_dir` (the index keeps size, mtime and settings per log)
+def stale_logs(paths: Iterable[str], out_dir: str, settings: Dict) -> List[str]:
+    key = settings_key(settings)
+    index = _load_index(out_dir)
+    stale = []
+    for path in paths:
+        st = os.stat(path)
+        if index.get(os.path.abspath(path)) != [st.st_size, st.st_mtime, key]:
+            stale.append(path)
+    return stale
+
+
+def log_files(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in names if n.endswith(".json"))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def analyse(paths: Iterable[str], out_dir: str, settings: Dict, workers: Optional[int] = None,
+            max_pending: Optional[int] = None, force: bool = False) -> Dict:
+    """Analyse the game logs under `paths` that are new or changed since the last run."""
+    files = log_files(paths)
+    todo = files if force else stale_logs(files, out_dir, settings)
+    os.makedirs(out_dir, exist_ok=True)
+    key = settings_key(settings)
+    index = _load_index(out_dir)
+    summary = {"files": len(files), "analysed": 0, "skipped": len(files) - len(todo), "positions": 0, "elapsed": 0.0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        limit = max_pending or 2 * (workers or os.cpu_count() or 1)
+        todo_iter = iter(todo)
+        pending = set()
+        while True:
+            while len(pending) < limit:
+                path = next(todo_iter, None)
+                if path is None:
+                    break
+                pending.add(pool.submit(analyse_game, (path, settings)))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"🚫 Analysis failed: {e}")
+                    continue
+                with open(_result_path(out_dir, result["file"]), "w", encoding="utf-8") as f:
+                    json.dump(result, f)
+                st = os.stat(result["file"])
+                index[os.path.abspath(result["file"])] = [st.st_size, st.st_mtime, key]
+                summary["analysed"] += 1
+                summary["positions"] += len(result["positions"])
+                if summary["analysed"] % 50 == 0:
+                    _save_index(out_dir, index)
+                    rate = summary["analysed"] / (time.perf_counter() - start)
+                    print(f"   {summary['analysed']}/{len(todo)} games, {rate:.2f} games/s")
+    _save_index(out_dir, index)
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+def report(out_dir: str) -> Dict[str, Dict[str, Dict]]:
+    """Aggregate every stored game: {"agent" | "phase" | "rule": {name: counters}}."""
+    tables: Dict[str, Dict[str, Dict]] = {"agent": {}, "phase": {}, "rule": {}}
+    for name in sorted(os.listdir(out_dir)) if os.path.isdir(out_dir) else []:
+        if not name.endswith(".json") or name == INDEX:
+            continue
+        with open(os.path.join(out_dir, name), encoding="utf-8") as f:
+            game = json.load(f)
+        for pos in game.get("positions", []):
+            for table, key in (("agent", pos["agent"]), ("phase", f"{pos['agent']} {pos['phase']}"),
+                               ("rule", f"{pos['agent']} {pos['rule']}")):
+                row = tables[table].setdefault(key, defaultdict(int))
+                row["positions"] += 1
+                row["loss"] += min(pos["loss"], 10_000)
+                row["agrees"] += pos["rule_agrees"]
+                for flag in pos["flags"]:
+                    row[flag] += 1
+                row["blunders"] += bool(pos["flags"])
+    return tables
+
+
+def format_report(tables: Dict[str, Dict[str, Dict]]) -> str:
+    short = {"missed win": "win", "missed defence": "defence", "ignored open three": "open3",
+             "missed forced win": "forced", "search blunder": "search"}
+    lines = []
+    for title, table in (("Per agent", "agent"), ("Per phase", "phase"), ("Per SZT4 rule", "rule")):
+        lines.append(f"{title}:")
+        lines.append(f"  {'':<28}{'moves':>7}{'blunders':>10}" + "".join(f"{short[f]:>9}" for f in FLAGS)
+                     + f"{'avg loss':>10}{'rule %':>8}")
+        for key, row in sorted(tables[table].items()):
+            n = row["positions"]
+            lines.append(f"  {key:<28}{n:>7}{row['blunders']:>10}" + "".join(f"{row[f]:>9}" for f in FLAGS)
+                         + f"{row['loss'] / n:>10.0f}{row['agrees'] / n:>8.0%}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find blunders in a directory of game logs.")
+    parser.add_argument("logs", nargs="+", help="game log files or directories (runs/*.json)")
+    parser.add_argument("--out", default="data/review", help="directory for per-game results")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--search-time", type=float, default=0.5, help="seconds per search")
+    parser.add_argument("--solve-time", type=float, default=0.2, help="seconds per solver call")
+    parser.add_argument("--blunder-loss", type=int, default=1500, help="search score loss flagged as a blunder")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-analyse games that are up to date")
+    args = parser.parse_args(argv)
+
+    settings = {"depth": args.depth, "search_time": args.search_time, "solve_time": args.solve_time,
+                "blunder_loss": args.blunder_loss}
+    summary = analyse(args.logs, args.out, settings, args.workers, args.max_pending, args.force)
+    rate = summary["analysed"] / summary["elapsed"] if summary["elapsed"] else 0.0
+    print(f"✅ {summary['analysed']} games analysed ({summary['positions']} positions, {rate:.2f} games/s), "
+          f"{summary['skipped']} up to date")
+    print(format_report(report(args.out)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Iterative-deepening alpha-beta (negamax) search with a transposition table.
+
+Move ordering is delegated to MoveOrderer, and every search reports its
+node counts in SearchStats, so the effect of ordering on pruning can be
+measured (run the same position with `use_ordering=False` to compare).
+
+Leaves are scored by the learned PatternEvaluator over incrementally
+maintained feature counts when its weight file is available, and by a
+simple five-cell window count otherwise.
+
+The root position is copied once into a SearchBoard; every node is then
+a make() / unmake() pair on that board (moves are flat indices inside
+the search and (row, col) tuples in SearchResult).
+
+The transposition table is a dict by default; any object with get(),
+__setitem__ and clear() can be passed instead (engine.parallel shares a
+fixed-size table between worker processes this way).
+
+With a `policy` (engine.policynet.PolicyNet) the root moves are also
+ordered by the network's priors, computed once per search.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .board import CHARS, SearchBoard
+from .evaluator import PatternEvaluator, default_evaluator
+from .ordering import MoveOrderer
+
+Move = Tuple[int, int]
+
+WIN = 1_000_000
+MATE_BOUND = WIN - 1000
+PATTERN_WEIGHTS = (0, 1, 10, 100, 1000)
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@dataclass
+class SearchStats:
+    nodes: int = 0
+    leaf_nodes: int = 0
+    tt_hits: int = 0
+    cutoffs: int = 0
+    first_move_cutoffs: int = 0
+    depth: int = 0
+    elapsed: float = 0.0
+    nodes_per_depth: List[int] = field(default_factory=list)
+
+    # Fraction of cutoffs produced by the first move tried (ordering quality)
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class SearchResult:
+    move: Optional[Move]
+    score: int
+    stats: SearchStats
+
+
+# All length-5 windows on an n x n board, as tuples of flat indices
+def _windows(n: int) -> List[Tuple[int, ...]]:
+    windows = []
+    for r in range(n):
+        for c in range(n):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                er, ec = r + 4 * dr, c + 4 * dc
+                if 0 <= er < n and 0 <= ec < n:
+                    windows.append(tuple((r + i * dr) * n + c + i * dc for i in range(5)))
+    return windows
+
+
+# Static evaluation from the point of view of `colour`: every five-cell window
+# holding stones of only one colour scores by how full it is
+def evaluate(cells, colour: int, windows: List[Tuple[int, ...]]) -> int:
+    score = 0
+    for window in windows:
+        mine = theirs = 0
+        for i in window:
+            cell = cells[i]
+            if cell == 0:
+                continue
+            if cell == colour:
+                mine += 1
+            else:
+                theirs += 1
+        if mine and not theirs:
+            score += PATTERN_WEIGHTS[mine]
+        elif theirs and not mine:
+            score -= PATTERN_WEIGHTS[theirs]
+    return score
+
+
+class Searcher:
+
+    def __init__(self, board_size: int = 8, tt_size: int = 1 << 18,
+                 use_ordering: bool = True, evaluator: Optional[PatternEvaluator] = None,
+                 use_evaluator: bool = True, tt=None, policy=None):
+        self.board_size = board_size
+        self.tt_size = tt_size
+        self.use_ordering = use_ordering
+        self.evaluator = (evaluator or default_evaluator()) if use_evaluator else None
+        self.orderer = MoveOrderer(board_size)
+        self.tt: Dict[int, Tuple[int, int, int, Optional[int]]] = tt if tt is not None else {}
+        self.windows = _windows(board_size)
+        self.policy = policy
+        self.last_stats: Optional[SearchStats] = None
+        self._board: Optional[SearchBoard] = None
+        self._priors: Optional[Dict[int, float]] = None
+
+    # Reset per-game state (history table, transposition table)
+    def new_game(self):
+        self.orderer.reset(self.board_size)
+        self.tt.clear()
+
+    def search(self, board, ch: str, max_depth: int = 4,
+               time_limit: Optional[float] = None, start_depth: int = 1,
+               on_depth: Optional[Callable[[int, Optional[Move], int], None]] = None) -> SearchResult:
+        """Iterative deepening from `start_depth`; `on_depth(depth, move, score)` is
+        called after every completed iteration."""
+        n = len(board)
+        if n != self.board_size:
+            self.board_size = n
+            self.windows = _windows(n)
+            self.new_game()
+        self._board = SearchBoard.from_rows(board, ch)
+        self._priors = None
+        if self.policy is not None and self.use_ordering:
+            probs, _ = self.policy.predict([board], [ch])
+            self._priors = {i: float(p) for i, p in enumerate(probs[0]) if p > 0}
+        self._stats = SearchStats()
+        self._deadline = time.perf_counter() + time_limit if time_limit else None
+        self.orderer.new_search()
+        # Fixed-size tables replace their own entries
+        if isinstance(self.tt, dict) and len(self.tt) > self.tt_size:
+            self.tt.clear()
+
+        start = time.perf_counter()
+        best_move, best_score = None, 0
+        for depth in range(start_depth, max_depth + 1):
+            before = self._stats.nodes
+            try:
+                score, move = self._root(depth)
+            except SearchTimeout:
+                break
+            self._stats.nodes_per_depth.append(self._stats.nodes - before)
+            self._stats.depth = depth
+            best_move, best_score = move, score
+            if on_depth is not None:
+                on_depth(depth, divmod(move, n) if move is not None else None, score)
+            if abs(score) >= MATE_BOUND:
+                break
+        self._stats.elapsed = time.perf_counter() - start
+        self.last_stats = self._stats
+        move = divmod(best_move, n) if best_move is not None else None
+        return SearchResult(move, best_score, self._stats)
+
+    def _candidates(self, ply: int, tt_move: Optional[int]) -> List[int]:
+        moves = self._board.moves()
+        if self.use_ordering:
+            return self.orderer.order(self._board, moves, ply, tt_move, self._priors if ply == 0 else None)
+        return sorted(moves)
+
+    def _root(self, depth: int) -> Tuple[int, Optional[int]]:
+        entry = self.tt.get(self._board.hash)
+        tt_move = entry[3] if entry else None
+        alpha, beta = -WIN - 1, WIN + 1
+        best_move, best_score = None, -WIN - 1
+        for move in self._candidates(0, tt_move):
+            score = self._child(move, depth, 0, alpha, beta)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+        self._store(depth, best_score, EXACT, best_move, 0)
+        return best_score, best_move
+
+    # Play `move` for the side to move, search the reply and undo; returns
+    # the score for the side to move
+    def _child(self, move: int, depth: int, ply: int, alpha: int, beta: int) -> int:
+        board = self._board
+        if board.makes_five(move, board.side):
+            self._stats.nodes += 1
+            return WIN - ply - 1
+        board.make(move)
+        try:
+            return -self._negamax(depth - 1, ply + 1, -beta, -alpha)
+        finally:
+            board.unmake()
+
+    def _negamax(self, depth: int, ply: int, alpha: int, beta: int) -> int:
+        stats = self._stats
+        stats.nodes += 1
+        if self._deadline is not None and (stats.nodes & 1023) == 0 \
+                and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        board = self._board
+        if depth <= 0:
+            stats.leaf_nodes += 1
+            if self.evaluator is not None:
+                return self.evaluator.evaluate(board.counts.totals, CHARS[board.side])
+            return evaluate(board.cells, board.side, self.windows)
+
+        entry = self.tt.get(board.hash)
+        tt_move = None
+        if entry is not None:
+            e_depth, e_score, e_flag, tt_move = entry
+            if e_depth >= depth:
+                e_score = self._from_tt(e_score, ply)
+                if e_flag == EXACT or (e_flag == LOWER and e_score >= beta) \
+                        or (e_flag == UPPER and e_score <= alpha):
+                    stats.tt_hits += 1
+                    return e_score
+
+        moves = self._candidates(ply, tt_move)
+        if not moves:
+            return 0
+
+        alpha_orig = alpha
+        best_score, best_move = -WIN - 1, None
+        for i, move in enumerate(moves):
+            score = self._child(move, depth, ply, alpha, beta)
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                stats.cutoffs += 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
+                self.orderer.record_cutoff(move, ply, depth)
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._store(depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def _store(self, depth: int, score: int, flag: int, move: Optional[int], ply: int):
+        self.tt[self._board.hash] = (depth, self._to_tt(score, ply), flag, move)
+
+    # Mate scores are stored relative to the node, not the root
+    @staticmethod
+    def _to_tt(score: int, ply: int) -> int:
+        if score >= MATE_BOUND:
+            return score + ply
+        if score <= -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _from_tt(score: int, ply: int) -> int:
+        if score >= MATE_BOUND:
+            return score - ply
+        if score <= -MATE_BOUND:
+            return score + ply
+        return score
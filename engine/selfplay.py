@@ -0,0 +1,172 @@
+"""
+Self-play data generation across CPU cores.
+
+Games between LLM-free policies (see engine.policies) are played in a
+process pool. Each task plays a small batch of games in memory and returns
+its records; the parent process is the only writer and streams them into
+a sharded dataset (engine.records). At most `max_pending` tasks are in
+flight at any time, so a slow disk holds back the workers instead of
+piling results up in memory.
+
+    python -m engine.selfplay --games 2000 --players ysv7,szt4,search --out data/selfplay
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .policies import make_policy
+from .records import ShardWriter, empty_board, encode_board
+from .tactics import EMPTY, empty_cells, frontier, makes_five, opponent_of
+
+BLACK, WHITE = 'X', 'O'
+
+
+def random_opening(board, plies: int, rng: random.Random):
+    """Play `plies` random stones near the centre / existing stones, never a win."""
+    ch = BLACK
+    played = []
+    for _ in range(plies):
+        candidates = [m for m in frontier(board, radius=1) if not makes_five(board, m[0], m[1], ch)]
+        if not candidates:
+            break
+        r, c = rng.choice(candidates)
+        board[r][c] = ch
+        played.append((r, c, ch))
+        ch = opponent_of(ch)
+    return played, ch
+
+
+def play_game(black, white, board_size: int = 8, opening_plies: int = 4,
+              rng: Optional[random.Random] = None) -> Tuple[List[Dict], str]:
+    """Play one game; returns (records, winner) where winner is 'X', 'O' or ''."""
+    rng = rng or random.Random()
+    board = empty_board(board_size)
+    black.new_game()
+    white.new_game()
+    _, ch = random_opening(board, opening_plies, rng)
+    policies = {BLACK: black, WHITE: white}
+    positions = []
+    winner = ''
+    ply = sum(1 for row in board for cell in row if cell != EMPTY)
+    while True:
+        if not empty_cells(board):
+            break
+        r, c = policies[ch](board, ch)
+        if board[r][c] != EMPTY:
+            # An illegal move loses, as in the framework
+            winner = opponent_of(ch)
+            break
+        positions.append((encode_board(board), ch, (r, c), ply))
+        won = makes_five(board, r, c, ch)
+        board[r][c] = ch
+        ply += 1
+        if won:
+            winner = ch
+            break
+        ch = opponent_of(ch)
+
+    records = []
+    for board_str, to_move, move, move_ply in positions:
+        outcome = 0 if not winner else (1 if winner == to_move else -1)
+        records.append({
+            "ply": move_ply,
+            "board": board_str,
+            "to_move": to_move,
+            "move": list(move),
+            "outcome": outcome,
+        })
+    return records, winner
+
+
+# Worker entry point: play a batch of games, no I/O
+def _play_batch(task: Tuple[int, str, str, int, int, int, Tuple[int, int]]):
+    seed, black_name, white_name, games, board_size, first_game, opening_range = task
+    rng = random.Random(seed)
+    black, white = make_policy(black_name), make_policy(white_name)
+    batch = []
+    for g in range(games):
+        opening = rng.randint(*opening_range)
+        records, winner = play_game(black, white, board_size, opening, rng)
+        for record in records:
+            record["game"] = first_game + g
+            record["black"] = black_name
+            record["white"] = white_name
+        batch.append((records, winner, black_name, white_name))
+    return batch
+
+
+def generate(out_dir: str, games: int, players: Sequence[str] = ("ysv7", "szt4"),
+             workers: Optional[int] = None, games_per_task: int = 16, max_pending: Optional[int] = None,
+             board_size: int = 8, opening_range: Tuple[int, int] = (2, 6), shard_size: int = 50_000,
+             seed: int = 0) -> Dict:
+    """Play `games` games between every ordered pairing of `players` and write the records."""
+    pairings = list(itertools.product(players, repeat=2)) if len(players) > 1 else [(players[0], players[0])]
+    tasks = []
+    first_game = 0
+    for i in itertools.count():
+        if first_game >= games:
+            break
+        count = min(games_per_task, games - first_game)
+        black_name, white_name = pairings[i % len(pairings)]
+        tasks.append((seed * 1_000_003 + i, black_name, white_name, count, board_size, first_game, opening_range))
+        first_game += count
+
+    summary = {"games": 0, "records": 0, "results": {}, "elapsed": 0.0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, ShardWriter(out_dir, shard_size) as writer:
+        limit = max_pending or 2 * (workers or os.cpu_count() or 1)
+        task_iter = iter(tasks)
+        pending = set()
+        while True:
+            # Back-pressure: only submit while fewer than `limit` batches are unwritten
+            while len(pending) < limit:
+                task = next(task_iter, None)
+                if task is None:
+                    break
+                pending.add(pool.submit(_play_batch, task))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for records, winner, black_name, white_name in future.result():
+                    for record in records:
+                        writer.write(record)
+                    summary["games"] += 1
+                    summary["records"] += len(records)
+                    key = f"{black_name} vs {white_name}"
+                    tally = summary["results"].setdefault(key, {"X": 0, "O": 0, "draw": 0})
+                    tally[winner or "draw"] += 1
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate self-play games without an LLM.")
+    parser.add_argument("--out", default="data/selfplay")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", default="ysv7,szt4", help="comma-separated: ysv7, szt4, search, random")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--games-per-task", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--board-size", type=int, default=8)
+    parser.add_argument("--opening", default="2,6", help="min,max random opening plies")
+    parser.add_argument("--shard-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    lo, hi = (int(x) for x in args.opening.split(","))
+    summary = generate(args.out, args.games, args.players.split(","), args.workers, args.games_per_task,
+                       args.max_pending, args.board_size, (lo, hi), args.shard_size, args.seed)
+    rate = summary["games"] / summary["elapsed"] if summary["elapsed"] else 0.0
+    print(f"✅ {summary['games']} games, {summary['records']} positions in {summary['elapsed']:.1f}s "
+          f"({rate:.1f} games/s) -> {args.out}")
+    for pairing, tally in summary["results"].items():
+        print(f"   {pairing}: X {tally['X']}  O {tally['O']}  draw {tally['draw']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Warm agent server over a local Unix socket.
+
+A fresh `python -m gomoku ... play` re-imports both agent modules, builds
+new LLM clients and reloads every table, weight file and proof cache
+before the first move. The server does all of that once: it loads the
+agent classes at startup, plays a throwaway opening move with each (so
+lazily built tables and weights are in memory), and then answers move
+requests until it is stopped. Module-level state (evaluator and policy
+weights, line-code tables, the proof cache, single-flight and rate-limit
+state) stays warm across every game it serves.
+
+Each game is a session with its own agent instance, since the agents
+keep per-game state. The server rebuilds the GameState for the agent
+from the board it receives: stones added since the previous request of
+the session are appended to move_history (the opponent's last), and a
+board that does not extend the previous one starts a new game in the
+same session.
+
+Protocol: one ASCII line per request and per reply.
+
+    M <session> <agent> <colour> <board>   ->  <row> <col> <milliseconds>
+    N <session>                            ->  OK          (game over, drop the session)
+    P                                      ->  OK <agent> <agent> ...
+    S                                      ->  OK <statistics>
+    any error                              ->  E <message>
+
+<board> is the n*n cells row by row ('.', 'X', 'O'), <colour> the side
+to move and <agent> the name from the agent's agent.json.
+
+    python -m engine.server agent1 agent2 --socket /tmp/gomoku-agents.sock
+    python -m engine.server agent1 agent2 --bench     # cold process vs warm worker
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .lifecycle import cache_report
+from .match import MatchState, PlayedMove, Player, load_agent_class
+
+DEFAULT_SOCKET = "/tmp/gomoku-agents.sock"
+COLOURS = {'X': Player.BLACK, 'O': Player.WHITE}
+
+
+def encode_board(board) -> str:
+    return "".join("".join(row) for row in board)
+
+
+# Request line for one move
+def move_request(session: str, agent: str, colour: str, board) -> bytes:
+    return f"M {session} {agent} {colour} {encode_board(board)}\n".encode("ascii")
+
+
+@dataclass
+class Session:
+    agent: object
+    name: str
+    state: MatchState
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    errors: int = 0
+    games: int = 0
+    think_time: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+
+
+class AgentServer:
+    """Keeps agent classes, their module state and one instance per live game."""
+
+    def __init__(self, agent_dirs: List[str], socket_path: str = DEFAULT_SOCKET, idle_timeout: float = 900.0):
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.classes: Dict[str, type] = {}
+        for agent_dir in agent_dirs:
+            cls, name = load_agent_class(agent_dir)
+            self.classes[name] = cls
+        self.sessions: Dict[str, Session] = {}
+        self.stats = ServerStats()
+
+    # One opening move per agent so that lazily loaded tables and weights are built now
+    async def warm_up(self):
+        for name, cls in self.classes.items():
+            t0 = time.perf_counter()
+            try:
+                agent = cls(f"{name}-warmup")
+                agent.player = Player.BLACK
+                await asyncio.wait_for(agent.get_move(MatchState()), timeout=10.0)
+            except Exception as e:
+                print(f"🚫 Warm-up of {name} failed: {e}")
+            print(f"🔥 {name} warm in {time.perf_counter() - t0:.2f}s")
+
+    def _session(self, key: str, name: str, colour: str, cells: str) -> Session:
+        cls = self.classes.get(name)
+        if cls is None:
+            raise ValueError(f"unknown agent {name}")
+        n = int(round(len(cells) ** 0.5))
+        if n * n != len(cells) or colour not in COLOURS or set(cells) - {'.', 'X', 'O'}:
+            raise ValueError("bad board")
+        session = self.sessions.get(key)
+        if session is None or session.name != name or not self._continues(session.state, cells):
+            self._close(session)
+            agent = cls(f"{name}-{key}")
+            agent.player = COLOURS[colour]
+            session = self.sessions[key] = Session(agent, name, MatchState(n))
+            self.stats.games += 1
+
+        # Replay the new stones into the session's history, the opponent's move last
+        state = session.state
+        added = []
+        for i, ch in enumerate(cells):
+            r, c = divmod(i, n)
+            if ch != state.board[r][c]:
+                added.append((ch != colour, r, c, ch))
+        for _, r, c, ch in sorted(added):
+            state.board[r][c] = ch
+            state.move_history.append(PlayedMove(r, c, COLOURS[ch]))
+        state.current_player = COLOURS[colour]
+        session.last_used = time.monotonic()
+        return session
+
+    # End-game hook of the session's agent: frees its per-game tables and trims the global caches
+    @staticmethod
+    def _close(session: Optional[Session]):
+        hook = getattr(session.agent, "end_game", None) if session is not None else None
+        if hook is None:
+            return
+        try:
+            hook()
+        except Exception as e:
+            print(f"🚫 end_game failed for {session.name}: {e}")
+
+    # Same game as the session's board: no stone removed or changed
+    @staticmethod
+    def _continues(state: MatchState, cells: str) -> bool:
+        n = state.board_size
+        if n * n != len(cells):
+            return False
+        return all(state.board[i // n][i % n] in ('.', ch) for i, ch in enumerate(cells))
+
+    async def handle_line(self, line: str) -> str:
+        parts = line.split()
+        if not parts:
+            return "E empty request"
+        verb = parts[0]
+        if verb == "M" and len(parts) == 5:
+            _, key, name, colour, cells = parts
+            session = self._session(key, name, colour, cells)
+            t0 = time.perf_counter()
+            row, col = await session.agent.get_move(session.state.snapshot())
+            elapsed = time.perf_counter() - t0
+            self.stats.requests += 1
+            self.stats.think_time += elapsed
+            return f"{row} {col} {elapsed * 1000:.0f}"
+        if verb == "N" and len(parts) == 2:
+            self._close(self.sessions.pop(parts[1], None))
+            return "OK"
+        if verb == "P":
+            return "OK " + " ".join(self.classes)
+        if verb == "S":
+            return "OK " + self.summary()
+        return f"E unknown request {verb}"
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.handle_line(line.decode("ascii").strip())
+                except Exception as e:
+                    self.stats.errors += 1
+                    reply = "E " + str(e).replace("\n", " ")
+                writer.write(reply.encode("ascii", "replace") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    # Drop sessions of games that were never closed with N
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_timeout))
+            cutoff = time.monotonic() - self.idle_timeout
+            for key in [k for k, s in self.sessions.items() if s.last_used < cutoff]:
+                self._close(self.sessions.pop(key))
+
+    def summary(self) -> str:
+        mean = self.stats.think_time / self.stats.requests * 1000 if self.stats.requests else 0.0
+        uptime = time.monotonic() - self.stats.started
+        caches = "; ".join(f"{c.name} {c.bytes / 2 ** 20:.1f} MiB" for c in cache_report())
+        return (f"{self.stats.requests} moves, {self.stats.games} games, {len(self.sessions)} live sessions, "
+                f"{self.stats.errors} errors, mean {mean:.1f}ms per move, up {uptime:.0f}s"
+                + (f", caches: {caches}" if caches else ""))
+
+    async def serve(self):
+        await self.warm_up()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._client, path=self.socket_path)
+        reaper = asyncio.create_task(self._reap())
+        print(f"🟢 Serving {', '.join(self.classes)} on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reaper.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+class AgentClient:
+    """Blocking client for one connection to the server."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: Optional[float] = 60.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.file = self.sock.makefile("rb")
+
+    def request(self, line: bytes) -> str:
+        self.sock.sendall(line)
+        reply = self.file.readline().decode("ascii").strip()
+        if not reply or reply.startswith("E "):
+            raise RuntimeError(f"agent server: {reply[2:] or 'connection closed'}")
+        return reply
+
+    def get_move(self, session: str, agent: str, colour: str, board) -> Tuple[int, int]:
+        row, col, _ = self.request(move_request(session, agent, colour, board)).split()
+        return int(row), int(col)
+
+    def end_game(self, session: str):
+        self.request(f"N {session}\n".encode("ascii"))
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class RemoteAgent:
+    """Agent-shaped proxy: get_move(game_state) is answered by the warm server."""
+
+    def __init__(self, agent_id: str, name: str, socket_path: str = DEFAULT_SOCKET):
+        self.agent_id = agent_id
+        self.name = name
+        self.player = None
+        self.socket_path = socket_path
+        self.session = f"{agent_id}-{os.getpid()}-{id(self)}"
+        self._conn: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+
+    async def get_move(self, game_state) -> Tuple[int, int]:
+        if self._conn is None:
+            self._conn = await asyncio.open_unix_connection(self.socket_path)
+        reader, writer = self._conn
+        writer.write(move_request(self.session, self.name, game_state.current_player.value, game_state.board))
+        await writer.drain()
+        reply = (await reader.readline()).decode("ascii").strip()
+        if not reply or reply.startswith("E "):
+            raise RuntimeError(f"agent server: {reply[2:] or 'connection closed'}")
+        row, col, _ = reply.split()
+        return int(row), int(col)
+
+    async def end_game(self):
+        if self._conn is not None:
+            reader, writer = self._conn
+            writer.write(f"N {self.session}\n".encode("ascii"))
+            await writer.drain()
+            await reader.readline()
+            writer.close()
+            self._conn = None
+
+
+# What a cold `play` pays before its first move: imports, _setup, one get_move
+def _cold_move(agent_dir: str):
+    t0 = time.perf_counter()
+    cls, name = load_agent_class(agent_dir)
+    agent = cls(f"{name}-cold")
+    agent.player = Player.BLACK
+    move = asyncio.run(agent.get_move(MatchState()))
+    print(f"COLD {move[0]} {move[1]} {time.perf_counter() - t0:.4f}")
+
+
+def _wait_for_socket(path: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            AgentClient(path, timeout=1.0).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def benchmark(agent_dirs: List[str], socket_path: str, rounds: int = 5):
+    """First-move latency of a fresh process vs a new game on a running server."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])))
+    for agent_dir in agent_dirs:
+        times = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "engine.server", "--cold", agent_dir],
+                           env=env, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - t0)
+        print(f"cold  {agent_dir}: median {statistics.median(times) * 1000:.0f}ms, "
+              f"min {min(times) * 1000:.0f}ms over {rounds} processes")
+
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "engine.server", *agent_dirs, "--socket", socket_path],
+                            env=env, stdout=subprocess.DEVNULL)
+    try:
+        if not _wait_for_socket(socket_path, 60.0):
+            raise SystemExit("agent server did not start")
+        print(f"server start (imports and warm-up, paid once): {(time.perf_counter() - t0) * 1000:.0f}ms")
+        client = AgentClient(socket_path)
+        names = client.request(b"P\n").split()[1:]
+        empty = [['.'] * 8 for _ in range(8)]
+        for name in names:
+            times = []
+            for i in range(rounds):
+                t0 = time.perf_counter()
+                client.get_move(f"bench-{i}", name, 'X', empty)
+                times.append(time.perf_counter() - t0)
+                client.end_game(f"bench-{i}")
+            print(f"warm  {name}: median {statistics.median(times) * 1000:.1f}ms, "
+                  f"min {min(times) * 1000:.1f}ms over {rounds} new games")
+        client.close()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve agents from one warm process over a Unix socket.")
+    parser.add_argument("agents", nargs="*", help="agent directories (with agent.json)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--idle-timeout", type=float, default=900.0, help="seconds before an idle game is dropped")
+    parser.add_argument("--bench", action="store_true", help="compare cold processes with the warm server")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--cold", metavar="AGENT_DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold:
+        _cold_move(args.cold)
+    elif args.bench:
+        benchmark(args.agents, args.socket + ".bench", args.rounds)
+    elif args.agents:
+        try:
+            asyncio.run(AgentServer(args.agents, args.socket, args.idle_timeout).serve())
+        except KeyboardInterrupt:
+            pass
+    else:
+        parser.error("no agent directories given")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Startup budget check for agent discovery and listing.
+
+`--discover-agents .` imports every agent module, and listing agents only
+needs their agent.json metadata, so neither should pay for the LLM client
+stack, the search engines or the line-code tables. Each agent is checked
+in fresh interpreters (the framework and asyncio are imported before the
+clock starts, since they are loaded for any command anyway):
+
+  listing    import the agent module and read its agent.json
+  discovery  the same, plus constructing the agent
+
+The median time of `--runs` processes must stay under the budget, and no
+module in HEAVY may have been imported (nor the line-code tables built).
+Exits with status 1 on any violation, so it can gate a change:
+
+    python -m engine.startup agent1 agent2 --listing-ms 40 --discovery-ms 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Modules that must wait for the first get_move
+HEAVY = (
+    "gomoku.llm.openai_client", "openai", "httpx",
+    "engine.search", "engine.parallel", "engine.pns", "engine.gating", "engine.cascade",
+    "engine.timeman", "engine.llm", "engine.evaluator", "engine.policynet", "engine.tablebase",
+    "multiprocessing", "sqlite3", "numpy",
+)
+
+_PROBE = r"""
+import asyncio, importlib.util, json, os, sys, time
+try:
+    import gomoku.agents.base, gomoku.core.models
+except ImportError:
+    pass
+agent_dir, construct = sys.argv[1], sys.argv[2] == "1"
+before = set(sys.modules)
+t0 = time.perf_counter()
+with open(os.path.join(agent_dir, "agent.json"), encoding="utf-8") as f:
+    config = json.load(f)
+module_name, class_name = config["agent_class"].rsplit(".", 1)
+spec = importlib.util.spec_from_file_location("_probe_" + module_name, os.path.join(agent_dir, module_name + ".py"))
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+cls = getattr(module, class_name)
+if construct:
+    cls("probe")
+elapsed = time.perf_counter() - t0
+tables = vars(sys.modules["engine.linecodes"]) if "engine.linecodes" in sys.modules else {}
+print(json.dumps({"elapsed": elapsed, "modules": sorted(set(sys.modules) - before),
+                  "tables": tables.get("_LINE_FLAGS", tables.get("LINE_FLAGS")) is not None}))
+"""
+
+
+# One fresh interpreter: seconds spent and the modules it pulled in
+def probe(agent_dir: str, construct: bool) -> Dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])))
+    env.setdefault("OPENAI_API_KEY", "startup-check")
+    env.setdefault("OPENAI_BASE_URL", "http://localhost")
+    out = subprocess.run([sys.executable, "-c", _PROBE, agent_dir, "1" if construct else "0"],
+                         env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def check(agent_dirs: List[str], listing_ms: float, discovery_ms: float, runs: int = 5) -> List[str]:
+    """Violations of the budgets, as messages (empty when everything passes)."""
+    problems = []
+    for agent_dir in agent_dirs:
+        for label, construct, budget in (("listing", False, listing_ms), ("discovery", True, discovery_ms)):
+            results = [probe(agent_dir, construct) for _ in range(runs)]
+            median = statistics.median(r["elapsed"] for r in results) * 1000
+            heavy = sorted({m for r in results for m in r["modules"] if m in HEAVY})
+            ok = median <= budget and not heavy and not any(r["tables"] for r in results)
+            print(f"{'ok ' if ok else 'FAIL'} {agent_dir:<10} {label:<10} {median:6.1f}ms (budget {budget:.0f}ms)"
+                  + (f", imports {', '.join(heavy)}" if heavy else "")
+                  + (", builds line-code tables" if any(r["tables"] for r in results) else ""))
+            if median > budget:
+                problems.append(f"{agent_dir} {label}: {median:.1f}ms over the {budget:.0f}ms budget")
+            if heavy:
+                problems.append(f"{agent_dir} {label}: imports {', '.join(heavy)}")
+            if any(r["tables"] for r in results):
+                problems.append(f"{agent_dir} {label}: builds the line-code tables")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import-time budget of agent discovery and listing.")
+    parser.add_argument("agents", nargs="*", default=["agent1", "agent2"])
+    parser.add_argument("--listing-ms", type=float, default=40.0)
+    parser.add_argument("--discovery-ms", type=float, default=50.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    problems = check(args.agents, args.listing_ms, args.discovery_ms, args.runs)
+    for problem in problems:
+        print(f"🚫 {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
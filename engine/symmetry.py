@@ -0,0 +1,167 @@
+"""
+Board symmetry: canonical keys over the eight rotations and reflections.
+
+A position and its seven images under the dihedral group of the square
+have the same game value, so a store keyed by position (solved results,
+proof numbers, puzzle sets) needs only one entry for all eight. The
+canonical image is the one with the smallest (X, O) bitboards; its
+transform is returned with the key, so a move stored in canonical
+coordinates can be mapped back to the board it was asked about:
+
+    sym = symmetry(8)
+    key, t = sym.canonical(x_bits, o_bits)
+    stored = sym.to_canonical(t, row * 8 + col)     # move -> canonical cell
+    idx = sym.from_canonical(t, stored)              # canonical cell -> move
+
+Bitboards are transformed a byte at a time through lookup tables (eight
+lookups per 64-bit board), and only the images that tie on the X stones
+transform the O stones as well, so canonical() costs about ten
+microseconds. Searches that need a canonical key at every node keep one
+Zobrist hash per transform up to date instead
+(engine.board.SearchBoard.track_symmetry): the key is then the smallest
+of the eight hashes, the same for every image of the position, found
+with eight XORs per move.
+
+canonical_text() does the same for the row-major board strings of
+datasets (engine.records.encode_board).
+"""
+from typing import Dict, List, Sequence, Tuple
+
+MASK64 = (1 << 64) - 1
+
+
+# The eight symmetries of an n x n board as cell permutations: perm[t][idx] -> idx
+def symmetries(n: int) -> List[Tuple[int, ...]]:
+    perms = []
+    for k in range(4):
+        for flip in (False, True):
+            perm = []
+            for idx in range(n * n):
+                r, c = divmod(idx, n)
+                for _ in range(k):
+                    r, c = c, n - 1 - r
+                if flip:
+                    c = n - 1 - c
+                perm.append(r * n + c)
+            perms.append(tuple(perm))
+    return perms
+
+
+def mix(x: int, o: int) -> int:
+    """64-bit hash of a pair of bitboards."""
+    h = (x ^ ((o * 0x9E3779B97F4A7C15) & MASK64)) & MASK64
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & MASK64
+    return h ^ (h >> 31)
+
+
+class Symmetry:
+    """Bitboard transforms for one board size, one byte of the board per lookup."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.perms = symmetries(n)
+        self.inverse = []
+        for perm in self.perms:
+            inv = [0] * (n * n)
+            for idx, target in enumerate(perm):
+                inv[target] = idx
+            self.inverse.append(tuple(inv))
+        self.chunks = (n * n + 7) // 8
+        # tables[t][k][byte]: image of the bits 8k .. 8k+7 under transform t
+        self.tables = []
+        for perm in self.perms:
+            per_chunk = []
+            for k in range(self.chunks):
+                table = []
+                for byte in range(256):
+                    bits = 0
+                    for j in range(8):
+                        idx = 8 * k + j
+                        if byte >> j & 1 and idx < n * n:
+                            bits |= 1 << perm[idx]
+                    table.append(bits)
+                per_chunk.append(table)
+            self.tables.append(per_chunk)
+
+    def transform(self, t: int, bits: int) -> int:
+        out = 0
+        for table, byte in zip(self.tables[t], bits.to_bytes(self.chunks, "little")):
+            if byte:
+                out |= table[byte]
+        return out
+
+    def image(self, x: int, o: int) -> Tuple[int, int, int]:
+        """(x, o, t): the smallest image of the bitboards and the transform giving it."""
+        chunks = self.chunks
+        xs = x.to_bytes(chunks, "little")
+        images = []
+        for per_chunk in self.tables:
+            out = 0
+            for table, byte in zip(per_chunk, xs):
+                if byte:
+                    out |= table[byte]
+            images.append(out)
+        best_x = min(images)
+        best_o, best_t = -1, 0
+        for t, image_x in enumerate(images):
+            if image_x == best_x:
+                image_o = self.transform(t, o)
+                if best_o < 0 or image_o < best_o:
+                    best_o, best_t = image_o, t
+        return best_x, best_o, best_t
+
+    # (key, transform) of the canonical image of (x, o)
+    def canonical(self, x: int, o: int) -> Tuple[int, int]:
+        cx, co, t = self.image(x, o)
+        return mix(cx, co), t
+
+    # A cell of the board under transform t, and back
+    def to_canonical(self, t: int, idx: int) -> int:
+        return self.perms[t][idx]
+
+    def from_canonical(self, t: int, idx: int) -> int:
+        return self.inverse[t][idx]
+
+    def transform_text(self, t: int, text: str) -> str:
+        """A row-major board string (one character per cell) under transform t."""
+        return "".join([text[i] for i in self.inverse[t]])
+
+    # (text, transform): the smallest of the eight images of a board string
+    def canonical_text(self, text: str) -> Tuple[str, int]:
+        return min((self.transform_text(t, text), t) for t in range(8))
+
+
+_SYMMETRY: Dict[int, Symmetry] = {}
+
+
+def symmetry(n: int) -> Symmetry:
+    sym = _SYMMETRY.get(n)
+    if sym is None:
+        sym = _SYMMETRY[n] = Symmetry(n)
+    return sym
+
+
+def board_bits(board: Sequence[Sequence[str]]) -> Tuple[int, int]:
+    """(x, o) bitboards of a raw board, bit r * n + c per cell."""
+    x = o = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell == 'X':
+                x |= bit
+            elif cell == 'O':
+                o |= bit
+            bit <<= 1
+    return x, o
+
+
+def canonical_board(board: Sequence[Sequence[str]]) -> Tuple[int, int]:
+    """(key, transform) of a raw board (rows of '.', 'X', 'O')."""
+    return symmetry(len(board)).canonical(*board_bits(board))
+
+
+def canonical_text(text: str) -> Tuple[str, int]:
+    """(text, transform) of a row-major board string (engine.records.encode_board)."""
+    n = int(round(len(text) ** 0.5))
+    return symmetry(n).canonical_text(text)
@@ -0,0 +1,383 @@
+"""
+Endgame tablebase: exact results for positions with few empty cells.
+
+Once at most `max_empties` cells are left (10 by default), the whole
+game tree can be enumerated. probe() looks the position up and, when it
+is missing, solves it on the spot: a full-width win / draw / loss
+negamax over every empty cell, with three exact shortcuts
+
+  - a cell completing five wins,
+  - two cells where the opponent completes five lose (only one can be blocked),
+  - a position where no five-cell window is free of the other colour's
+    stones, for either side, is a draw,
+
+and a memo of solved nodes. Every node solved on the way (not only the
+root) is added to the table, so later positions of the same game are
+found directly. A solve that runs out of time still keeps the nodes it
+finished.
+
+Positions are reduced by the eight symmetries of the board: the key is
+the hash of the canonical image of the (X, O) bitboards
+(engine.symmetry), and the stored move is in the coordinates of that
+image, mapped back on lookup. The side to move is implied by the
+stone counts (X moves first).
+
+On disk the table is a sorted array of 8-byte keys followed by one byte
+per entry (result in the low two bits, move cell above them), read
+through numpy.memmap and searched with searchsorted. Newly solved
+entries wait in a dict (looked up first) and are merged in by rewriting
+the file in flush(): at the end of every game, at exit, or once `batch`
+entries are queued, so a move never pays for rewriting the table. With
+`max_bytes` set, the table stops growing at that size (later solves are
+used but not stored); it is never trimmed back to it. Lookups, add()
+and flush() hold a lock, so agents on several threads can share one
+table (engine.timeman.offload).
+
+    tb = default_tablebase()
+    hit = tb.probe(board, 'X', time_limit=1.0)   # ('win' | 'draw' | 'loss', (row, col)) or None
+
+    python -m engine.tablebase --logs runs --data data/selfplay --max-empties 10
+"""
+import argparse
+import atexit
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .board import COLOUR, geometry
+from .symmetry import symmetry
+
+LOSS, DRAW, WIN = 0, 1, 2
+RESULTS = ("loss", "draw", "win")
+MAGIC = b"GTB2"   # GTB1 keys used another canonical image
+HEADER = struct.Struct("<4sHHQ")   # magic, board size, max empties, entries
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+UPPER_LOOKUPS = 3   # plies below the root that also consult the stored table
+ENTRY_BYTES = 9     # an 8-byte key and a value byte
+
+
+class _Timeout(Exception):
+    pass
+
+
+@dataclass
+class TablebaseStats:
+    probes: int = 0
+    hits: int = 0
+    solved: int = 0
+    timeouts: int = 0
+    nodes: int = 0
+    solve_time: float = 0.0
+    dropped: int = 0
+    flushes: int = 0
+
+
+class _Solver:
+    """Exact win / draw / loss negamax over every empty cell, memoised by Zobrist hash."""
+
+    def __init__(self, table: "Tablebase", cells: List[int], deadline: Optional[float]):
+        self.table = table
+        self.n = table.n
+        self.geo = geometry(self.n)
+        self.cells = cells
+        self.deadline = deadline
+        self.memo: Dict[int, Tuple[int, int, int, int]] = {}   # hash -> (value, move, x bits, o bits)
+        self.nodes = 0
+        self.windows = table.windows
+        self.root_empties = cells.count(0)
+
+    def makes_five(self, idx: int, colour: int) -> bool:
+        cells = self.cells
+        for fwd, bwd in self.geo.rays[idx]:
+            count = 1
+            for i in fwd:
+                if cells[i] != colour:
+                    break
+                count += 1
+            for i in bwd:
+                if cells[i] != colour:
+                    break
+                count += 1
+            if count >= 5:
+                return True
+        return False
+
+    def value(self, h: int, side: int, x: int, o: int) -> int:
+        hit = self.memo.get(h)
+        if hit is not None:
+            return hit[0]
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise _Timeout()
+        cells = self.cells
+        empties = [i for i, v in enumerate(cells) if v == 0]
+        if len(empties) > self.root_empties - UPPER_LOOKUPS:
+            stored = self.table.lookup_bits(x, o)
+            if stored is not None:
+                self.memo[h] = (stored[0], stored[1], x, o)
+                return stored[0]
+        value, move = self._evaluate(h, side, x, o, empties)
+        self.memo[h] = (value, move, x, o)
+        return value
+
+    def _evaluate(self, h: int, side: int, x: int, o: int, empties: List[int]) -> Tuple[int, int]:
+        if not empties:
+            return DRAW, -1
+        rival = 3 - side
+        for i in empties:
+            if self.makes_five(i, side):
+                return WIN, i
+        threats = [i for i in empties if self.makes_five(i, rival)]
+        if len(threats) >= 2:
+            return LOSS, threats[0]
+        if not threats and not any(not (w & o) or not (w & x) for w in self.windows):
+            return DRAW, empties[0]
+
+        cells, zobrist, side_key = self.cells, self.geo.zobrist, self.geo.side_key
+        best, best_move = -1, -1
+        for i in threats or empties:
+            bit = 1 << i
+            cells[i] = side
+            child = h ^ zobrist[i * 3 + side] ^ side_key
+            try:
+                if side == 1:
+                    v = 2 - self.value(child, rival, x | bit, o)
+                else:
+                    v = 2 - self.value(child, rival, x, o | bit)
+            finally:
+                cells[i] = 0
+            if v > best:
+                best, best_move = v, i
+                if best == WIN:
+                    break
+        return best, best_move
+
+
+class Tablebase:
+    """Memory-mapped table of exact results for one board size."""
+
+    def __init__(self, n: int = 8, max_empties: int = 10, path: Optional[str] = None,
+                 max_bytes: Optional[int] = None, batch: int = 100_000):
+        if n * n > 64:
+            raise ValueError("the tablebase keys positions by 64-bit bitboards")
+        self.n = n
+        self.max_empties = max_empties
+        self.max_bytes = max_bytes
+        self.batch = batch
+        self.pending: Dict[int, int] = {}   # solved entries not merged into the file yet
+        self._lock = threading.RLock()
+        self.path = path or os.path.join(DEFAULT_DIR, f"tablebase-{n}x{n}.bin")
+        self.symmetry = symmetry(n)
+        self.windows = self._windows(n)
+        self.stats = TablebaseStats()
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.values = np.zeros(0, dtype=np.uint8)
+        self._open()
+
+    @staticmethod
+    def _windows(n: int) -> List[int]:
+        masks = []
+        for r in range(n):
+            for c in range(n):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    cells = [(r + k * dr, c + k * dc) for k in range(5)]
+                    if all(0 <= rr < n and 0 <= cc < n for rr, cc in cells):
+                        masks.append(sum(1 << (rr * n + cc) for rr, cc in cells))
+        return masks
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            magic, n, _, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or n != self.n:
+            print(f"⚠️ Ignoring tablebase {self.path}: not a {self.n}x{self.n} table of this format")
+            return
+        if count:
+            self.keys = np.memmap(self.path, dtype="<u8", mode="r", offset=HEADER.size, shape=(count,))
+            self.values = np.memmap(self.path, dtype=np.uint8, mode="r", offset=HEADER.size + 8 * count,
+                                    shape=(count,))
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.pending)
+
+    # Size of the table once written (a key and a value byte per entry), queued entries included
+    def nbytes(self) -> int:
+        return int(self.keys.nbytes + self.values.nbytes) + ENTRY_BYTES * len(self.pending)
+
+    # Stored results are never dropped: add() stops growing the table at max_bytes instead
+    budget_note = "never trimmed; stops storing at the limit"
+
+    def trim(self, max_bytes: int) -> int:
+        return 0
+
+    # Stored (result, move cell) of the position with these bitboards
+    def lookup_bits(self, x: int, o: int) -> Optional[Tuple[int, int]]:
+        if not len(self.keys) and not self.pending:
+            return None
+        key, t = self.symmetry.canonical(x, o)
+        with self._lock:
+            value = self.pending.get(key)
+            if value is None:
+                i = int(np.searchsorted(self.keys, np.uint64(key)))
+                if i >= len(self.keys) or int(self.keys[i]) != key:
+                    return None
+                value = int(self.values[i])
+        move = value >> 2
+        return value & 3, self.symmetry.from_canonical(t, move)
+
+    @staticmethod
+    def _bits(board) -> Tuple[List[int], int, int]:
+        cells = [COLOUR[cell] for row in board for cell in row]
+        x = sum(1 << i for i, v in enumerate(cells) if v == 1)
+        o = sum(1 << i for i, v in enumerate(cells) if v == 2)
+        return cells, x, o
+
+    def probe(self, board, me: str, time_limit: Optional[float] = 1.0,
+              solve: bool = True) -> Optional[Tuple[str, Optional[Tuple[int, int]]]]:
+        """('win' | 'draw' | 'loss', move) for `me` to move, or None when the position has
+        too many empty cells, is not `me`'s turn, or could not be solved in time."""
+        if len(board) != self.n:
+            return None
+        cells, x, o = self._bits(board)
+        empties = cells.count(0)
+        side = 1 if bin(x).count("1") == bin(o).count("1") else 2
+        if empties > self.max_empties or side != COLOUR[me]:
+            return None
+        self.stats.probes += 1
+        stored = self.lookup_bits(x, o)
+        if stored is None and solve:
+            stored = self._solve(cells, side, x, o, time_limit)
+        if stored is None:
+            return None
+        self.stats.hits += 1
+        value, move = stored
+        return RESULTS[value], (divmod(move, self.n) if empties else None)
+
+    def _solve(self, cells: List[int], side: int, x: int, o: int,
+               time_limit: Optional[float]) -> Optional[Tuple[int, int]]:
+        start = time.perf_counter()
+        geo = geometry(self.n)
+        h = geo.side_key if side == 2 else 0
+        for i, v in enumerate(cells):
+            if v:
+                h ^= geo.zobrist[i * 3 + v]
+        solver = _Solver(self, cells, start + time_limit if time_limit else None)
+        result = None
+        try:
+            result = solver.value(h, side, x, o)
+        except _Timeout:
+            self.stats.timeouts += 1
+        self.stats.nodes += solver.nodes
+        self.stats.solve_time += time.perf_counter() - start
+        self.add(solver.memo.values())
+        if result is None:
+            return None
+        self.stats.solved += 1
+        return result, solver.memo[h][1]
+
+    def add(self, entries: Iterable[Tuple[int, int, int, int]]):
+        """Queue solved (value, move, x bits, o bits) entries; they reach the file on flush()."""
+        added = {}
+        for value, move, x, o in entries:
+            key, t = self.symmetry.canonical(x, o)
+            added[key] = value | (self.symmetry.to_canonical(t, move) if move >= 0 else 0) << 2
+        with self._lock:
+            added = {key: value for key, value in added.items() if key not in self.pending}
+            if not added:
+                return
+            if self.max_bytes is not None and self.nbytes() + ENTRY_BYTES * len(added) > self.max_bytes:
+                self.stats.dropped += len(added)
+                return
+            self.pending.update(added)
+            if len(self.pending) >= self.batch:
+                self.flush()
+
+    def flush(self):
+        """Merge the queued entries into the file (a sort and rewrite of the whole table)."""
+        with self._lock:
+            self._merge()
+
+    def _merge(self):
+        if not self.pending:
+            return
+        keys = np.concatenate([np.asarray(self.keys), np.fromiter(self.pending.keys(), dtype=np.uint64)])
+        values = np.concatenate([np.asarray(self.values), np.fromiter(self.pending.values(), dtype=np.uint8)])
+        keys, first = np.unique(keys, return_index=True)
+        values = values[first]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.n, self.max_empties, len(keys)))
+            f.write(keys.astype("<u8").tobytes())
+            f.write(values.tobytes())
+        # Release the old mapping before replacing the file under it
+        self.keys, self.values = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint8)
+        os.replace(tmp, self.path)
+        self.pending = {}
+        self.stats.flushes += 1
+        self._open()
+
+    def summary(self) -> str:
+        s = self.stats
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return (f"Tablebase: {len(self)} positions ({size / 1024:.0f} KiB), {s.hits}/{s.probes} probes answered, "
+                f"{s.solved} solved ({s.timeouts} timed out), {s.nodes} nodes in {s.solve_time:.1f}s"
+                + (f", {s.dropped} not stored (table full)" if s.dropped else ""))
+
+
+_default: Dict[int, Tablebase] = {}
+_default_lock = threading.Lock()
+
+
+def default_tablebase(n: int = 8) -> Tablebase:
+    """Shared tablebase for `n` x `n` boards, stored in data/."""
+    with _default_lock:
+        if n not in _default:
+            from .lifecycle import CACHE_LIMITS, register_cache
+            _default[n] = Tablebase(n, max_bytes=CACHE_LIMITS["tablebase"])
+            # Queued entries are merged at the end of every game (lifecycle.trim_caches) and at exit
+            atexit.register(_default[n].flush)
+            register_cache(f"tablebase {n}x{n}", _default[n], CACHE_LIMITS["tablebase"])
+        return _default[n]
+
+
+def main(argv=None):
+    from .records import decode_board, iter_game_logs, iter_records, log_records
+
+    parser = argparse.ArgumentParser(description="Build the endgame tablebase from late positions of game records.")
+    parser.add_argument("--data", action="append", default=[], help="self-play dataset directory or shard")
+    parser.add_argument("--logs", action="append", default=[], help="directory of framework game logs")
+    parser.add_argument("--max-empties", type=int, default=10)
+    parser.add_argument("--time-limit", type=float, default=10.0, help="seconds per position")
+    parser.add_argument("--board-size", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    def records():
+        for path in args.data:
+            yield from iter_records(path)
+        for path in args.logs:
+            for log in iter_game_logs(path):
+                yield from log_records(log)
+
+    table = Tablebase(args.board_size, args.max_empties)
+    start = time.perf_counter()
+    seen = 0
+    for record in records():
+        text = record["board"]
+        if text.count('.') > args.max_empties or len(text) != args.board_size ** 2:
+            continue
+        seen += 1
+        table.probe(decode_board(text), record["to_move"], time_limit=args.time_limit)
+    table.flush()
+    print(f"{seen} late positions in {time.perf_counter() - start:.1f}s")
+    print(table.summary())
+
+
+if __name__ == "__main__":
+    main()
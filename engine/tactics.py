@@ -0,0 +1,119 @@
+"""
+Tactical scanners on raw boards.
+
+These are the board-level equivalents of the checks in the agents
+(YSV7._check_lines / _check_threats, SZT4._has_five_if_place) so that
+search, self-play and analysis code can use them without a GameState.
+"""
+from typing import Dict, List, Tuple
+
+from .linecodes import DIRECTIONS, EMPTY, FIVE, OPEN_FOUR, flags_at, scan
+
+Move = Tuple[int, int]
+
+
+def opponent_of(ch: str) -> str:
+    return 'O' if ch == 'X' else 'X'
+
+
+# Number of consecutive `ch` stones through (row, col) along (dr, dc),
+# counting (row, col) itself as if `ch` was placed there
+def run_length(board, row: int, col: int, ch: str, dr: int, dc: int) -> int:
+    n = len(board)
+    count = 1
+    r, c = row + dr, col + dc
+    while 0 <= r < n and 0 <= c < n and board[r][c] == ch:
+        count += 1
+        r, c = r + dr, c + dc
+    r, c = row - dr, col - dc
+    while 0 <= r < n and 0 <= c < n and board[r][c] == ch:
+        count += 1
+        r, c = r - dr, c - dc
+    return count
+
+
+# Placing `ch` at (row, col) completes five (or more) in a row
+def makes_five(board, row: int, col: int, ch: str) -> bool:
+    for dr, dc in DIRECTIONS:
+        if run_length(board, row, col, ch, dr, dc) >= 5:
+            return True
+    return False
+
+
+# Placing `ch` at (row, col) creates an open four: .xxxx.
+# (same patterns as YSV7._check_threats: ._xxx. .xxx_. .xx_x. .x_xx.)
+def makes_open_four(board, row: int, col: int, ch: str) -> bool:
+    return bool(flags_at(board, row, col, ch) & OPEN_FOUR)
+
+
+# Placing `ch` at (row, col) extends two or more lines to length >= 2
+def makes_fork(board, row: int, col: int, ch: str) -> bool:
+    lines = 0
+    for dr, dc in DIRECTIONS:
+        if run_length(board, row, col, ch, dr, dc) >= 2:
+            lines += 1
+    return lines >= 2
+
+
+def empty_cells(board) -> List[Move]:
+    return [(r, c) for r, row in enumerate(board) for c, cell in enumerate(row) if cell == EMPTY]
+
+
+def winning_moves(board, ch: str) -> List[Move]:
+    return [(r, c) for r, c in empty_cells(board) if makes_five(board, r, c, ch)]
+
+
+# Cells where the opponent of `ch` would complete five next turn
+def forced_blocks(board, ch: str) -> List[Move]:
+    return winning_moves(board, opponent_of(ch))
+
+
+# Same buckets as YSV7._get_critical_moves, computed on a raw board
+# with one line-code scan per colour. Like YSV7, 'to_attack' holds the
+# opponent's open-four cells (YSV7 checks _check_threats(opponent) for
+# it), so it always equals 'to_defuse'
+def critical_moves(board, me: str) -> Dict[str, List[Move]]:
+    n = len(board)
+    mine = scan(board, me)
+    theirs = scan(board, opponent_of(me))
+    analysis = {
+        'to_win': [],
+        'to_defend': [],
+        'to_defuse': [],
+        'to_attack': [],
+        'to_fork': []
+    }
+    for r, c in empty_cells(board):
+        own, rival = mine[r * n + c], theirs[r * n + c]
+        if own & FIVE:
+            analysis['to_win'].append((r, c))
+        if rival & FIVE:
+            analysis['to_defend'].append((r, c))
+        if rival & OPEN_FOUR:
+            analysis['to_defuse'].append((r, c))
+        if rival & OPEN_FOUR:
+            analysis['to_attack'].append((r, c))
+        if makes_fork(board, r, c, me):
+            analysis['to_fork'].append((r, c))
+    return analysis
+
+
+# Empty cells within `radius` (Chebyshev) of any stone; the centre on an empty board
+def frontier(board, radius: int = 1) -> List[Move]:
+    n = len(board)
+    seen = [[False] * n for _ in range(n)]
+    moves = []
+    any_stone = False
+    for r in range(n):
+        for c in range(n):
+            if board[r][c] == EMPTY:
+                continue
+            any_stone = True
+            for rr in range(max(0, r - radius), min(n, r + radius + 1)):
+                for cc in range(max(0, c - radius), min(n, c + radius + 1)):
+                    if board[rr][cc] == EMPTY and not seen[rr][cc]:
+                        seen[rr][cc] = True
+                        moves.append((rr, cc))
+    if not any_stone:
+        return [(n // 2, n // 2)]
+    return moves
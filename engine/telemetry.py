@@ -0,0 +1,392 @@
+"""
+Live NDJSON telemetry: one JSON line per move, LLM call and fallback.
+
+Game logs are written when a game ends, so a crash loses the game and a
+running tournament cannot be watched. With GOMOKU_TELEMETRY set, events
+are streamed as they happen:
+
+  GOMOKU_TELEMETRY=runs/telemetry.ndjson          appended to a file
+  GOMOKU_TELEMETRY=unix:/tmp/gomoku-telemetry.sock  streamed to a listener
+
+Every line holds "ts" (time.time()), "pid", "event" and the event's fields:
+
+  move          agent, id, ply, move, seconds
+  fallback      agent, id, ply, reason (llm error, invalid move, ...)
+  llm_request   model, key, tokens (estimated prompt + completion)
+  llm_response  model, key, seconds, chars, or error
+  game          black, white, winner, reason, moves (engine.match)
+
+Independently of the stream, a runner can set the `move_stats` context
+variable before each get_move; fallbacks and LLM calls made by the move
+are counted there (engine.match stores them in its game logs).
+
+File writes go through a buffer that is flushed at most every
+`flush_interval` seconds (and at exit), so an event costs tens of
+microseconds. The socket is written without blocking: what the listener
+has not taken yet waits in a bounded buffer, and events are dropped (and
+counted) when nobody listens or the buffer is full, so telemetry never
+slows a game down. Without GOMOKU_TELEMETRY, emit() returns at once.
+
+The aggregator keeps a rolling window of the last moves per agent and
+prints move-latency percentiles, fallback and invalid-move rates, and LLM
+latency and errors per model, while the tournament runs:
+
+    python -m engine.telemetry tail runs/telemetry.ndjson --window 200
+    python -m engine.telemetry listen /tmp/gomoku-telemetry.sock
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import selectors
+import socket
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, List, Optional
+
+ENV = "GOMOKU_TELEMETRY"
+SOCKET_PREFIX = "unix:"
+PERCENTILES = (50, 90, 99)
+
+
+class Telemetry:
+    """Writes events as NDJSON lines to a file or a Unix socket."""
+
+    def __init__(self, target: str, flush_interval: float = 0.5, max_buffer: int = 1 << 20):
+        self.target = target
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.events = 0
+        self.dropped = 0
+        self._file = None
+        self._sock = None
+        self._address = None
+        self._unsent = b""
+        self._retry_at = 0.0
+        if target.startswith(SOCKET_PREFIX):
+            self._address = target[len(SOCKET_PREFIX):]
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            self._file = open(target, "a", encoding="utf-8", buffering=1 << 16)
+        self._flushed = time.monotonic()
+        atexit.register(self.close)
+
+    def emit(self, event: str, **fields):
+        fields["ts"] = time.time()
+        fields["pid"] = os.getpid()
+        fields["event"] = event
+        line = json.dumps(fields, separators=(",", ":"), default=str) + "\n"
+        self.events += 1
+        if self._address is not None:
+            self._send(line.encode("utf-8"))
+            return
+        self._file.write(line)
+        now = time.monotonic()
+        if now - self._flushed >= self.flush_interval:
+            self._file.flush()
+            self._flushed = now
+
+    # Non-blocking write to the listener; reconnects at most once a second
+    def _send(self, data: bytes):
+        if self._sock is None:
+            now = time.monotonic()
+            if now < self._retry_at:
+                self.dropped += 1
+                return
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                sock.connect(self._address)
+            except OSError:
+                sock.close()
+                self._retry_at = now + 1.0
+                self.dropped += 1
+                return
+            self._sock = sock
+        if len(self._unsent) + len(data) > self.max_buffer:
+            self.dropped += 1
+            data = b""
+        self._unsent += data
+        try:
+            sent = self._sock.send(self._unsent)
+        except BlockingIOError:
+            sent = 0
+        except OSError:  # the listener went away
+            self._sock.close()
+            self._sock, self._unsent = None, b""
+            self._retry_at = time.monotonic() + 1.0
+            self.dropped += 1
+            return
+        self._unsent = self._unsent[sent:]
+
+    def flush(self):
+        if self._file is not None and not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self._sock is not None:
+            if self._unsent:
+                self._sock.setblocking(True)
+                self._sock.settimeout(1.0)
+                try:
+                    self._sock.sendall(self._unsent)
+                except OSError:
+                    pass
+            self._sock.close()
+            self._sock = None
+
+
+_telemetry: Optional[Telemetry] = None
+_configured = False
+
+
+def get_telemetry() -> Optional[Telemetry]:
+    """The process-wide stream named by GOMOKU_TELEMETRY (None when it is not set)."""
+    global _telemetry, _configured
+    if not _configured:
+        _configured = True
+        target = os.environ.get(ENV)
+        if target:
+            try:
+                _telemetry = Telemetry(target)
+            except OSError as e:
+                print(f"⚠️ Telemetry disabled: {e}")
+    return _telemetry
+
+
+def set_telemetry(telemetry: Optional[Telemetry]):
+    global _telemetry, _configured
+    _telemetry, _configured = telemetry, True
+
+
+def emit(event: str, **fields):
+    telemetry = _telemetry if _configured else get_telemetry()
+    if telemetry is not None:
+        telemetry.emit(event, **fields)
+
+
+@dataclass
+class MoveStats:
+    """What one get_move call did, filled in for a runner that set `move_stats`."""
+    fallback: bool = False
+    llm_calls: int = 0
+    prompt_tokens: int = 0       # estimated, as for the rate limiter
+    completion_tokens: int = 0
+
+
+move_stats: ContextVar[Optional[MoveStats]] = ContextVar("move_stats", default=None)
+
+
+# A fallback move: marked on the current move's stats and emitted
+def fallback(**fields):
+    stats = move_stats.get()
+    if stats is not None:
+        stats.fallback = True
+    emit("fallback", **fields)
+
+
+# ===== Aggregation =====
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+class Aggregator:
+    """Rolling per-agent move latencies and rates, and per-model LLM latencies."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.moves: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        # 1 for a move that fell back (or was invalid), 0 otherwise, over the same window
+        self.fallbacks: Dict[str, Deque[int]] = defaultdict(lambda: deque(maxlen=window))
+        self.invalid: Dict[str, Deque[int]] = defaultdict(lambda: deque(maxlen=window))
+        self.llm: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self.llm_errors: Dict[str, int] = defaultdict(int)
+        self.llm_calls: Dict[str, int] = defaultdict(int)
+        self.totals: Dict[str, int] = defaultdict(int)
+        self.games = 0
+        self.illegal_games = 0
+        self._pending: Dict[tuple, set] = defaultdict(set)  # (pid, id, ply) -> fallback reasons
+
+    def add(self, event: Dict):
+        kind = event.get("event")
+        self.totals[kind] += 1
+        if kind == "fallback":
+            self._pending[(event.get("pid"), event.get("id"), event.get("ply"))].add(event.get("reason", ""))
+        elif kind == "move":
+            agent = event.get("agent", "?")
+            reasons = self._pending.pop((event.get("pid"), event.get("id"), event.get("ply")), set())
+            self.moves[agent].append(float(event.get("seconds", 0.0)))
+            self.fallbacks[agent].append(1 if reasons else 0)
+            self.invalid[agent].append(1 if "invalid move" in reasons else 0)
+        elif kind == "llm_response":
+            model = event.get("model", "?")
+            self.llm_calls[model] += 1
+            if event.get("error"):
+                self.llm_errors[model] += 1
+            else:
+                self.llm[model].append(float(event.get("seconds", 0.0)))
+        elif kind == "game":
+            self.games += 1
+            if str(event.get("reason", "")).startswith("Illegal move"):
+                self.illegal_games += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        agents = {}
+        for agent, window in self.moves.items():
+            values = sorted(window)
+            agents[agent] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+            agents[agent].update(moves=len(values), fallback_rate=sum(self.fallbacks[agent]) / len(values),
+                                 invalid_rate=sum(self.invalid[agent]) / len(values))
+        models = {}
+        for model, calls in self.llm_calls.items():
+            values = sorted(self.llm[model])
+            models[model] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+            models[model].update(calls=calls, error_rate=self.llm_errors[model] / calls)
+        return {"agents": agents, "models": models}
+
+    def format(self) -> str:
+        snap = self.snapshot()
+        lines = [f"{self.totals['move']} moves, {self.games} games ({self.illegal_games} lost on an illegal move), "
+                 f"{self.totals['llm_response']} LLM calls (rolling window of {self.window})"]
+        header = "".join(f"{'p' + str(p):>9}" for p in PERCENTILES)
+        lines.append(f"  {'agent':<26}{'moves':>7}{header}{'fallback':>10}{'invalid':>9}")
+        for agent, s in sorted(snap["agents"].items()):
+            lines.append(f"  {agent:<26}{s['moves']:>7}" + "".join(f"{s['p' + str(p)]:>8.2f}s" for p in PERCENTILES)
+                         + f"{s['fallback_rate']:>10.1%}{s['invalid_rate']:>9.1%}")
+        if snap["models"]:
+            lines.append(f"  {'model':<26}{'calls':>7}{header}{'errors':>10}")
+            for model, s in sorted(snap["models"].items()):
+                lines.append(f"  {model:<26}{s['calls']:>7}" + "".join(f"{s['p' + str(p)]:>8.2f}s" for p in PERCENTILES)
+                             + f"{s['error_rate']:>10.0%}")
+        return "\n".join(lines)
+
+
+def _parse(line: str) -> Optional[Dict]:
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) else None
+
+
+# Events of an NDJSON file; with `follow`, keep waiting for lines appended to it
+def follow_file(path: str, follow: bool = True, poll: float = 0.2) -> Iterator[Optional[Dict]]:
+    """Yields events, and None whenever the end of the file is reached (a good time to report)."""
+    with open(path, encoding="utf-8") as f:
+        partial = ""
+        while True:
+            line = f.readline()
+            if line.endswith("\n"):
+                event = _parse(partial + line)
+                partial = ""
+                if event is not None:
+                    yield event
+                continue
+            partial += line  # a line still being written
+            yield None
+            if not follow:
+                return
+            time.sleep(poll)
+
+
+# Events streamed by any number of processes to a Unix socket at `path`;
+# None after `timeout` seconds without one
+def listen_socket(path: str, timeout: float = 1.0) -> Iterator[Optional[Dict]]:
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(64)
+    server.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    partial: Dict[socket.socket, bytes] = {}
+    try:
+        while True:
+            ready = selector.select(timeout)
+            if not ready:
+                yield None
+                continue
+            for key, _ in ready:
+                if key.fileobj is server:
+                    conn, _ = server.accept()
+                    conn.setblocking(False)
+                    selector.register(conn, selectors.EVENT_READ)
+                    partial[conn] = b""
+                    continue
+                conn = key.fileobj
+                data = conn.recv(1 << 16)
+                if not data:
+                    selector.unregister(conn)
+                    conn.close()
+                    partial.pop(conn, None)
+                    continue
+                *lines, partial[conn] = (partial[conn] + data).split(b"\n")
+                for line in lines:
+                    event = _parse(line.decode("utf-8", "replace"))
+                    if event is not None:
+                        yield event
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+        os.unlink(path)
+
+
+def watch(events: Iterator[Optional[Dict]], window: int = 200, interval: float = 2.0,
+          out_path: Optional[str] = None) -> Aggregator:
+    """Aggregate `events`, printing the report every `interval` seconds (and at the end)."""
+    aggregator = Aggregator(window)
+    out = open(out_path, "a", encoding="utf-8") if out_path else None
+    reported = time.monotonic()
+    try:
+        for event in events:
+            if event is not None:
+                aggregator.add(event)
+                if out is not None:
+                    out.write(json.dumps(event, separators=(",", ":")) + "\n")
+            if time.monotonic() - reported >= interval and aggregator.totals:
+                print(aggregator.format(), flush=True)
+                reported = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not None:
+            out.close()
+    print(aggregator.format())
+    return aggregator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate the live telemetry stream of a tournament.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    t = commands.add_parser("tail", help="follow an NDJSON telemetry file")
+    t.add_argument("path")
+    t.add_argument("--once", action="store_true", help="read to the end of the file and stop")
+    l = commands.add_parser("listen", help="receive telemetry streamed to a Unix socket")
+    l.add_argument("path")
+    l.add_argument("--out", default=None, help="also append the events to this file")
+    for p in (t, l):
+        p.add_argument("--window", type=int, default=200, help="moves / calls per agent / model in the rolling window")
+        p.add_argument("--interval", type=float, default=2.0, help="seconds between reports")
+    args = parser.parse_args(argv)
+
+    if args.command == "tail":
+        watch(follow_file(args.path, follow=not args.once), args.window, args.interval)
+    else:
+        print(f"🟢 Listening on {args.path} (set {ENV}={SOCKET_PREFIX}{args.path})")
+        watch(listen_socket(args.path), args.window, args.interval, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Game-wide time bank.
+
+The agent starts a game with `game_time` seconds in the bank (and a hard
+`move_limit` per move). Every move is bracketed by start_move() and
+end_move(), which charge the time actually spent to the bank. Moves
+settled by the rule layers without asking for a budget (immediate wins,
+forced blocks, proven results, threat answers) are logged as "rule"
+moves, and book moves as "book"; both cost next to nothing.
+
+When the agent wants to think (search or ask the LLM) it calls
+allocate(), which splits the bank over the moves likely left and scales
+the share by how critical the position is:
+
+    criticality = 0.5 * threats + 0.3 * closeness + 0.2 * instability
+
+  threats      cells where either side makes a three or a four (capped)
+  closeness    how close the two best candidates score (engine.gating.rank_moves)
+  instability  how often the search changed its mind between iterations,
+               on the previous search of this game
+
+The LLM is skipped (use_llm False) when the moving average of its call
+times is over the budget. Each such refusal shrinks the average a little
+and every PROBE_EVERY-th one calls the LLM anyway, so a single slow or
+timed-out call cannot shut the LLM out for the rest of the session.
+
+Every decision is kept as an Allocation in `history` for logging, and
+search() runs a Searcher inside the budget, extending it once when the
+best move still changes in the last iteration (never past the per-move
+cap of move_limit * (1 - safety)). Async agents await search_async(),
+which runs the same search on a worker thread so the event loop keeps
+serving LLM calls and other games meanwhile; offload() does the same for
+any other blocking call.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .board import SearchBoard
+from .evaluator import default_evaluator
+from .gating import THREAT_FLAGS, rank_moves
+
+THREAT_CAP = 8
+RULE_BUDGET = 0.01
+LATENCY_DECAY = 0.9   # the LLM latency estimate shrinks by this on every move that refuses the LLM
+PROBE_EVERY = 5       # after this many refusals in a row, one move calls the LLM anyway
+
+
+@dataclass
+class Allocation:
+    ply: int
+    budget: float          # seconds granted to this move
+    criticality: float     # 0 (quiet) .. 1 (sharp)
+    reason: str            # "rule", "book", "quiet", "normal" or "critical"
+    bank: float            # seconds left in the bank before the move
+    threats: int = 0
+    closeness: float = 0.0
+    instability: float = 0.0
+    spent: float = 0.0
+    use_llm: bool = True   # the budget covers a typical LLM call
+
+    def __str__(self) -> str:
+        return (f"Move {self.ply}: {self.reason}, budget {self.budget:.2f}s, spent {self.spent:.2f}s, "
+                f"criticality {self.criticality:.2f} (threats {self.threats}, closeness {self.closeness:.2f}, "
+                f"instability {self.instability:.2f}), bank {self.bank:.1f}s")
+
+
+class TimeManager:
+
+    def __init__(self, game_time: float = 300.0, move_limit: float = 30.0, safety: float = 0.15,
+                 min_budget: float = 0.2, margin_scale: int = 300):
+        self.game_time = game_time
+        self.move_limit = move_limit
+        self.safety = safety
+        self.min_budget = min_budget
+        self.margin_scale = margin_scale
+        self.evaluator = None
+        self.history: List[Allocation] = []
+        self.llm_latency: Optional[float] = None  # moving average of LLM call times
+        self.refusals = 0                         # moves in a row refused the LLM
+        self.new_game()
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "TimeManager":
+        """Build from the "time" section of an agent.json."""
+        config = config or {}
+        return cls(game_time=float(config.get("game_time", 300.0)),
+                   move_limit=float(config.get("move_limit", 30.0)),
+                   safety=float(config.get("safety", 0.15)))
+
+    def new_game(self):
+        self.bank = self.game_time
+        self.history = []
+        self.instability = 0.0
+        self._ply = -1
+        self._start: Optional[float] = None
+        self._current: Optional[Allocation] = None
+
+    # Called at the start of get_move; a ply lower than the last one means a new game
+    def start_move(self, ply: int):
+        if ply < self._ply:
+            self.new_game()
+        self._ply = ply
+        self._start = time.perf_counter()
+        self._current = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start if self._start is not None else 0.0
+
+    # Seconds left of the current move's budget (allocating one if needed)
+    def remaining(self, board=None, me: Optional[str] = None) -> float:
+        if self._current is None:
+            if board is None:
+                return self.min_budget
+            self.allocate(board, me)
+        return max(0.0, self._current.budget - self.elapsed())
+
+    def allocate(self, board, me: str, book: bool = False) -> Allocation:
+        """Budget for thinking about this move, from the bank and the position."""
+        empties = sum(1 for row in board for cell in row if cell == '.')
+        moves_left = max(4, (empties + 1) // 2)
+        hard_cap = max(self.min_budget, min(self.move_limit * (1 - self.safety), self.bank * 0.5))
+        if book:
+            allocation = Allocation(self._ply, 0.0, 0.0, "book", self.bank, use_llm=False)
+        else:
+            threats, closeness = self._assess(board, me)
+            criticality = 0.5 * min(1.0, threats / THREAT_CAP) + 0.3 * closeness + 0.2 * self.instability
+            share = self.bank / moves_left
+            budget = min(hard_cap, max(self.min_budget, share * (0.5 + 1.5 * criticality)))
+            reason = "critical" if criticality >= 0.6 else "quiet" if criticality < 0.25 else "normal"
+            use_llm = self._llm_fits(budget)
+            allocation = Allocation(self._ply, budget, criticality, reason, self.bank, threats, closeness,
+                                    self.instability, use_llm=use_llm)
+        self._current = allocation
+        return allocation
+
+    # Whether an LLM call fits the budget. A refusal records no new latency, so the estimate
+    # decays on every refusal and every PROBE_EVERY-th refusal calls anyway to measure again
+    def _llm_fits(self, budget: float) -> bool:
+        if self.llm_latency is None or self.llm_latency <= budget:
+            self.refusals = 0
+            return True
+        self.refusals += 1
+        self.llm_latency *= LATENCY_DECAY
+        if self.refusals >= PROBE_EVERY:
+            self.refusals = 0
+            return True
+        return False
+
+    def _assess(self, board, me: str):
+        if self.evaluator is None:
+            self.evaluator = default_evaluator()
+        sb = SearchBoard.from_rows(board, me)
+        threats = sum(1 for i in range(len(sb.cells)) if sb.cells[i] == 0
+                      and (sb.flags(i, 1) | sb.flags(i, 2)) & THREAT_FLAGS)
+        ranked = rank_moves(board, me, self.evaluator)
+        if len(ranked) < 2:
+            return threats, 0.0
+        margin = ranked[0][0] - ranked[1][0]
+        return threats, 1.0 - margin / (margin + self.margin_scale)
+
+    # Called at the end of get_move: charge the bank and keep the decision
+    def end_move(self) -> Allocation:
+        spent = self.elapsed()
+        allocation = self._current or Allocation(self._ply, RULE_BUDGET, 0.0, "rule", self.bank, use_llm=False)
+        allocation.spent = spent
+        self.bank = max(0.0, self.bank - spent)
+        self.history.append(allocation)
+        self._start = None
+        self._current = None
+        return allocation
+
+    # Seconds an LLM call took (a timed-out call: the seconds it was given)
+    def record_llm_latency(self, seconds: float):
+        self.llm_latency = seconds if self.llm_latency is None else 0.7 * self.llm_latency + 0.3 * seconds
+
+    def search(self, searcher, board, me: str, max_depth: int = 8):
+        """Searcher.search inside the remaining budget, extended once if the best move is unstable."""
+        budget = max(self.min_budget, self.remaining(board, me))
+        moves = []
+        result = searcher.search(board, me, max_depth=max_depth, time_limit=budget,
+                                 on_depth=lambda depth, move, score: moves.append(move))
+        changes = sum(1 for a, b in zip(moves, moves[1:]) if a != b)
+        self.instability = changes / (len(moves) - 1) if len(moves) > 1 else 0.0
+        if self._current is not None:
+            self._current.instability = self.instability
+        # The extension must still fit under the hard per-move cap, counting the time already spent
+        extra = min(budget, self.bank * 0.1, self.move_limit * (1 - self.safety) - self.elapsed())
+        if len(moves) > 1 and moves[-1] != moves[-2] and extra > self.min_budget and result.stats.depth < max_depth:
+            # The transposition table makes the repeated shallow iterations cheap
+            again = searcher.search(board, me, max_depth=max_depth, time_limit=extra)
+            if again.stats.depth >= result.stats.depth:
+                result = again
+            if self._current is not None:
+                self._current.budget += extra
+        return result
+
+    async def search_async(self, searcher, board, me: str, max_depth: int = 8):
+        """search() on the default executor's thread, in the caller's context."""
+        return await offload(self.search, searcher, board, me, max_depth=max_depth)
+
+
+async def offload(fn, *args, **kwargs):
+    """fn(*args, **kwargs) on the default executor's thread, in the caller's context.
+
+    Agents run their CPU-bound thinking (searches, solver, tablebase) through this, so
+    several games in one event loop (engine.match) never wait for each other's thinking.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    return await loop.run_in_executor(None, contextvars.copy_context().run, call)
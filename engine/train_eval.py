@@ -0,0 +1,97 @@
+"""
+Fit the pattern evaluator weights from game records.
+
+Each record contributes the feature counts of its position, seen from the
+side to move, with the final outcome for that side as the target. Two
+fits are available, both in plain NumPy:
+
+  logistic  L2-regularized logistic regression (Newton / IRLS), draws = 0.5
+  lstsq     least squares on outcome in {-1, 0, 1}
+
+    python -m engine.train_eval --data data/selfplay --logs runs
+"""
+import argparse
+import time
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from .evaluator import DEFAULT_WEIGHTS, PatternEvaluator, feature_names
+from .features import board_features, relative
+from .records import decode_board, iter_game_logs, iter_records, log_records
+
+
+def load_dataset(records: Iterable[dict], min_ply: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    rows: List[List[int]] = []
+    targets: List[int] = []
+    for record in records:
+        if record.get("ply", 0) < min_ply:
+            continue
+        counts = board_features(decode_board(record["board"]))
+        rows.append(relative(counts, record["to_move"]))
+        targets.append(record["outcome"])
+    x = np.asarray(rows, dtype=np.float64).reshape(-1, len(feature_names()))
+    y = np.asarray(targets, dtype=np.float64)
+    return x, y
+
+
+def fit_logistic(x: np.ndarray, y: np.ndarray, l2: float = 1.0, iterations: int = 50) -> Tuple[np.ndarray, float]:
+    p = (y + 1.0) / 2.0  # -1/0/1 -> 0/0.5/1
+    xb = np.hstack([x, np.ones((len(x), 1))])
+    w = np.zeros(xb.shape[1])
+    reg = l2 * np.eye(xb.shape[1])
+    reg[-1, -1] = 0.0  # the bias is not regularized
+    for _ in range(iterations):
+        z = np.clip(xb @ w, -30, 30)
+        q = 1.0 / (1.0 + np.exp(-z))
+        grad = xb.T @ (q - p) + reg @ w
+        hess = (xb * (q * (1 - q))[:, None]).T @ xb + reg
+        step = np.linalg.solve(hess, grad)
+        w -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+    return w[:-1], float(w[-1])
+
+
+def fit_lstsq(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, float]:
+    xb = np.hstack([x, np.ones((len(x), 1))])
+    w, *_ = np.linalg.lstsq(xb, y, rcond=None)
+    return w[:-1], float(w[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit pattern evaluator weights from game records.")
+    parser.add_argument("--data", action="append", default=[], help="self-play dataset directory or shard")
+    parser.add_argument("--logs", action="append", default=[], help="directory of framework game logs")
+    parser.add_argument("--method", choices=("logistic", "lstsq"), default="logistic")
+    parser.add_argument("--l2", type=float, default=1.0)
+    parser.add_argument("--min-ply", type=int, default=0)
+    parser.add_argument("--out", default=DEFAULT_WEIGHTS)
+    args = parser.parse_args(argv)
+
+    def records():
+        for path in args.data:
+            yield from iter_records(path)
+        for path in args.logs:
+            for log in iter_game_logs(path):
+                yield from log_records(log)
+
+    start = time.perf_counter()
+    x, y = load_dataset(records(), args.min_ply)
+    if not len(x):
+        raise SystemExit("No records found")
+    if args.method == "logistic":
+        weights, bias = fit_logistic(x, y, args.l2)
+    else:
+        weights, bias = fit_lstsq(x, y)
+
+    meta = {"method": args.method, "positions": int(len(x)), "sources": args.data + args.logs}
+    PatternEvaluator(weights.tolist(), bias, meta).save(args.out)
+    print(f"✅ Fitted {args.method} on {len(x)} positions in {time.perf_counter() - start:.1f}s -> {args.out}")
+    for name, w in zip(feature_names(), weights):
+        print(f"   {name:<14} {w:+.4f}")
+    print(f"   {'bias':<14} {bias:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
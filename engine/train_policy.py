@@ -0,0 +1,179 @@
+"""
+Train the policy / value network from game records (plain NumPy).
+
+Every record gives a position, the move played (policy target) and the
+final outcome for the side to move (value target). Positions are
+augmented with the eight symmetries of the board. The loss is
+cross-entropy on the move plus `value_weight` times the squared value
+error; gradients are backpropagated by hand through the im2col
+convolutions and applied with Adam.
+
+    python -m engine.train_policy --data data/selfplay --logs runs --epochs 4
+"""
+import argparse
+import time
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from .policynet import DEFAULT_WEIGHTS, PARAMS, PolicyNet, col2im, softmax, to_planes
+from .records import iter_game_logs, iter_records, log_records
+
+CODES = {'.': 0, 'X': 1, 'O': 2}
+
+
+def load_dataset(records: Iterable[dict], min_ply: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(boards (N, n, n) int8, players (N,) str, moves (N,) flat index, outcomes (N,))"""
+    boards, players, moves, outcomes = [], [], [], []
+    for record in records:
+        if record.get("ply", 0) < min_ply or record.get("move") is None:
+            continue
+        text = record["board"]
+        n = int(round(len(text) ** 0.5))
+        boards.append([CODES[ch] for ch in text])
+        players.append(record["to_move"])
+        moves.append(record["move"][0] * n + record["move"][1])
+        outcomes.append(record["outcome"])
+    n = int(round(len(boards[0]) ** 0.5)) if boards else 0
+    return (np.asarray(boards, dtype=np.int8).reshape(-1, n, n), np.asarray(players),
+            np.asarray(moves, dtype=np.int64), np.asarray(outcomes, dtype=np.float32))
+
+
+# The eight symmetries of the square applied to boards and flat move indices
+def augment(boards: np.ndarray, players: np.ndarray, moves: np.ndarray, outcomes: np.ndarray):
+    n = boards.shape[1]
+    target = np.zeros(boards.shape, dtype=np.int8)
+    rows, cols = np.divmod(moves, n)
+    target[np.arange(len(moves)), rows, cols] = 1
+    out_boards, out_moves = [], []
+    for k in range(4):
+        for flip in (False, True):
+            b = np.rot90(boards, k, axes=(1, 2))
+            t = np.rot90(target, k, axes=(1, 2))
+            if flip:
+                b, t = b[:, :, ::-1], t[:, :, ::-1]
+            out_boards.append(np.ascontiguousarray(b))
+            out_moves.append(t.reshape(len(t), -1).argmax(axis=1))
+    return (np.concatenate(out_boards), np.tile(players, 8), np.concatenate(out_moves), np.tile(outcomes, 8))
+
+
+def loss_and_grads(net: PolicyNet, planes: np.ndarray, moves: np.ndarray, outcomes: np.ndarray,
+                   value_weight: float = 0.5) -> Tuple[float, float, Dict[str, np.ndarray]]:
+    p = net.params
+    n_batch, _, h, w = planes.shape
+    logits, values, c = net.forward(planes, cache=True)
+    probs = softmax(logits)
+    idx = np.arange(n_batch)
+    policy_loss = float(-np.log(probs[idx, moves] + 1e-12).mean())
+    value_loss = float(((values - outcomes) ** 2).mean())
+
+    grads = {}
+    dlogits = probs.copy()
+    dlogits[idx, moves] -= 1.0
+    dlogits /= n_batch
+    dflat = dlogits.reshape(-1, 1)
+    grads["wp"] = c["feats"].T @ dflat
+    grads["bp"] = dflat.sum(axis=0)
+    da2 = (dflat @ p["wp"].T).reshape(n_batch, h, w, -1).transpose(0, 3, 1, 2)
+
+    du = (value_weight * 2.0 * (values - outcomes) / n_batch * (1.0 - values ** 2)).reshape(-1, 1)
+    grads["wv"] = c["pooled"].T @ du
+    grads["bv"] = du.sum(axis=0)
+    da2 = da2 + (du @ p["wv"].T)[:, :, None, None] / (h * w)
+
+    dz2 = (da2 * (c["z2"] > 0)).transpose(0, 2, 3, 1).reshape(n_batch * h * w, -1)
+    grads["w2"] = c["cols2"].T @ dz2
+    grads["b2"] = dz2.sum(axis=0)
+    da1 = col2im(dz2 @ p["w2"].T, c["a1"].shape)
+    dz1 = (da1 * (c["z1"] > 0)).transpose(0, 2, 3, 1).reshape(n_batch * h * w, -1)
+    grads["w1"] = c["cols1"].T @ dz1
+    grads["b1"] = dz1.sum(axis=0)
+    return policy_loss, value_loss, grads
+
+
+class Adam:
+
+    def __init__(self, params: Dict[str, np.ndarray], lr: float = 1e-3, beta1: float = 0.9,
+                 beta2: float = 0.999, eps: float = 1e-8, l2: float = 1e-4):
+        self.lr, self.beta1, self.beta2, self.eps, self.l2 = lr, beta1, beta2, eps, l2
+        self.m = {k: np.zeros_like(v) for k, v in params.items()}
+        self.v = {k: np.zeros_like(v) for k, v in params.items()}
+        self.t = 0
+
+    def step(self, params: Dict[str, np.ndarray], grads: Dict[str, np.ndarray]):
+        self.t += 1
+        for k in PARAMS:
+            g = grads[k] + (self.l2 * params[k] if k.startswith("w") else 0.0)
+            self.m[k] = self.beta1 * self.m[k] + (1 - self.beta1) * g
+            self.v[k] = self.beta2 * self.v[k] + (1 - self.beta2) * g * g
+            m_hat = self.m[k] / (1 - self.beta1 ** self.t)
+            v_hat = self.v[k] / (1 - self.beta2 ** self.t)
+            params[k] -= (self.lr * m_hat / (np.sqrt(v_hat) + self.eps)).astype(params[k].dtype)
+
+
+def evaluate(net: PolicyNet, planes: np.ndarray, moves: np.ndarray, outcomes: np.ndarray) -> Tuple[float, float]:
+    """(top-1 move accuracy, value mean squared error)"""
+    probs, values = net.predict_planes(planes)
+    return float((probs.argmax(axis=1) == moves).mean()), float(((values - outcomes) ** 2).mean())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the NumPy policy / value network from game records.")
+    parser.add_argument("--data", action="append", default=[], help="self-play dataset directory or shard")
+    parser.add_argument("--logs", action="append", default=[], help="directory of framework game logs")
+    parser.add_argument("--min-ply", type=int, default=0)
+    parser.add_argument("--channels", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lr", type=float, default=2e-3)
+    parser.add_argument("--value-weight", type=float, default=0.5)
+    parser.add_argument("--holdout", type=float, default=0.1, help="fraction of positions kept for validation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=DEFAULT_WEIGHTS)
+    args = parser.parse_args(argv)
+
+    def records():
+        for path in args.data:
+            yield from iter_records(path)
+        for path in args.logs:
+            for log in iter_game_logs(path):
+                yield from log_records(log)
+
+    start = time.perf_counter()
+    boards, players, moves, outcomes = load_dataset(records(), args.min_ply)
+    if not len(boards):
+        raise SystemExit("No training positions found")
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(boards))
+    split = int(len(order) * (1 - args.holdout))
+    train, valid = order[:split], order[split:]
+    tb, tp, tm, to = augment(boards[train], players[train], moves[train], outcomes[train])
+    train_planes = to_planes(tb, tp)
+    valid_planes = to_planes(boards[valid], players[valid])
+    print(f"{len(boards)} positions ({len(train_planes)} augmented for training, {len(valid)} held out) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    net = PolicyNet.init(args.channels, args.seed)
+    optimizer = Adam(net.params, lr=args.lr)
+    for epoch in range(args.epochs):
+        t0 = time.perf_counter()
+        perm = rng.permutation(len(train_planes))
+        p_sum = v_sum = 0.0
+        batches = 0
+        for i in range(0, len(perm), args.batch_size):
+            batch = perm[i:i + args.batch_size]
+            p_loss, v_loss, grads = loss_and_grads(net, train_planes[batch], tm[batch], to[batch], args.value_weight)
+            optimizer.step(net.params, grads)
+            p_sum, v_sum, batches = p_sum + p_loss, v_sum + v_loss, batches + 1
+        accuracy, mse = evaluate(net, valid_planes, moves[valid], outcomes[valid]) if len(valid) else (0.0, 0.0)
+        print(f"epoch {epoch + 1}: policy loss {p_sum / batches:.3f}, value loss {v_sum / batches:.3f}, "
+              f"held-out move accuracy {accuracy:.1%}, value mse {mse:.3f} ({time.perf_counter() - t0:.1f}s)")
+
+    net.meta.update({"positions": int(len(boards)), "epochs": args.epochs,
+                     "holdout_accuracy": round(accuracy, 4), "holdout_value_mse": round(mse, 4)})
+    net.save(args.out)
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()